@@ -1,10 +1,19 @@
-import librosa
-import soundfile as sf
+import argparse
+import hashlib
+import json
+import os
+import pathlib
 import numpy as np
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from time_stretch import stretch_file
+
+INDEX_FILENAME = "tempo_index.json"
+HASH_BLOCK_SIZE = 1 << 20
 
 def load_audio(file_path):
     """Load an audio file."""
+    import librosa
     try:
         y, sr = librosa.load(file_path)
         return y, sr
@@ -14,6 +23,7 @@ def load_audio(file_path):
 
 def detect_tempo(y, sr):
     """Detect the tempo of the audio."""
+    import librosa
     try:
         tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
         if hasattr(tempo, '__len__'):
@@ -24,32 +34,142 @@ def detect_tempo(y, sr):
         print(f"Error detecting tempo: {e}")
         return None
 
-def correct_rhythm(y, sr, original_tempo, target_tempo):
-    """Correct the rhythm of the audio to match the target tempo."""
+def detect_beats(y, sr):
+    """Detect tempo and beat times (in seconds) in one pass."""
+    import librosa
+    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+    tempo = float(np.mean(tempo))
+    return tempo, librosa.frames_to_time(beat_frames, sr=sr).tolist()
+
+def content_hash(file_path):
+    """Hash of the file's bytes, so renamed or copied takes share one analysis."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+def analyze_file(file_path):
+    """Analyze one take. Runs in a worker process, so it returns plain data."""
+    # Imported here so that reading the index never loads librosa
+    import librosa
+    y, sr = librosa.load(file_path)
+    tempo, beats = detect_beats(y, sr)
+    return {"tempo": tempo, "beats": beats, "duration": len(y) / sr}
+
+class TempoIndex:
+    """
+    Sidecar index of tempo results for a directory of takes.
+
+    Results are keyed by content hash. A second table remembers each file's
+    (size, mtime_ns) and hash, so unchanged files are not even re-read.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = pathlib.Path(index_path)
+        self.results = {}
+        self.files = {}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    data = json.load(f)
+                self.results = data.get("results", {})
+                self.files = data.get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable tempo index {self.index_path}: {e}")
+
+    def hash_for(self, file_path):
+        stat = os.stat(file_path)
+        known = self.files.get(file_path.name)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["hash"]
+        file_hash = content_hash(file_path)
+        self.files[file_path.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash}
+        return file_hash
+
+    def lookup(self, file_path):
+        return self.results.get(self.hash_for(file_path))
+
+    def store(self, file_path, result):
+        self.results[self.hash_for(file_path)] = result
+
+    def prune(self, present_names):
+        """Forget files that are gone and results nothing points at any more."""
+        self.files = {name: entry for name, entry in self.files.items() if name in present_names}
+        live = {entry["hash"] for entry in self.files.values()}
+        self.results = {file_hash: result for file_hash, result in self.results.items() if file_hash in live}
+
+    def save(self):
+        temp_path = self.index_path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump({"files": self.files, "results": self.results}, f)
+        os.replace(temp_path, self.index_path)
+
+def analyze_directory(directory, workers=None, index_path=None):
+    """Analyze every WAV in `directory` over a process pool, reusing cached results."""
+    directory = pathlib.Path(directory)
+    index = TempoIndex(index_path or directory / INDEX_FILENAME)
+    files = sorted(directory.glob("*.wav"))
+
+    pending = {}
+    for file_path in files:
+        file_hash = index.hash_for(file_path)
+        if file_hash not in index.results:
+            # Identical takes are only analyzed once
+            pending.setdefault(file_hash, file_path)
+
+    if pending:
+        print(f"Analyzing {len(pending)} of {len(files)} files...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {file_hash: pool.submit(analyze_file, str(file_path)) for file_hash, file_path in pending.items()}
+            for file_hash, future in futures.items():
+                try:
+                    index.results[file_hash] = future.result()
+                except Exception as e:
+                    print(f"Error analyzing {pending[file_hash]}: {e}")
+
+    index.prune({file_path.name for file_path in files})
+    index.save()
+    return {file_path.name: index.lookup(file_path) for file_path in files}
+
+def correct_rhythm(input_file, output_file, original_tempo, target_tempo):
+    """
+    Stretch `input_file` so it plays at `target_tempo`, writing `output_file`.
+
+    Streams the file through StreamingTimeStretcher at its own sample rate, so
+    memory stays constant however long the take is.
+    """
     try:
-        # Calculate the time stretch factor
         stretch_factor = target_tempo / original_tempo
         print(f"Stretch factor: {stretch_factor}")
-        
-        # Use librosa's time_stretch function
-        y_stretched = librosa.effects.time_stretch(y, rate=stretch_factor)
-        
-        return y_stretched
+        return stretch_file(pathlib.Path(input_file), pathlib.Path(output_file), stretch_factor)
     except Exception as e:
         print(f"Error correcting rhythm: {e}")
         return None
 
-def save_audio(y, sr, file_path):
-    """Save the processed audio to a file."""
-    try:
-        sf.write(file_path, y, sr)
-    except Exception as e:
-        print(f"Error saving audio file: {e}")
-
 def main():
-    input_file = r"C:\projects\looper\recordings\output_5.wav"
-    output_file = "output_corrected.wav"
-    target_bpm = 300  # Set your desired BPM here
+    default_dir = pathlib.Path(__file__).resolve().parent.parent / "recordings"
+    parser = argparse.ArgumentParser(description="Detect tempo and correct the rhythm of takes")
+    parser.add_argument("input_file", nargs="?", help="Take to correct")
+    parser.add_argument("--output", default="output_corrected.wav")
+    parser.add_argument("--target-bpm", type=float, default=300)
+    parser.add_argument("--batch", nargs="?", const=default_dir, type=pathlib.Path,
+                        help="Analyze every WAV in this directory (default: recordings) instead")
+    parser.add_argument("--workers", type=int, default=None, help="Analysis processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.batch is not None:
+        results = analyze_directory(args.batch, workers=args.workers)
+        for name, result in results.items():
+            if result is not None:
+                print(f"{name}: {result['tempo']:.2f} BPM, {len(result['beats'])} beats")
+        return
+    if args.input_file is None:
+        parser.error("give a file to correct or --batch")
+
+    input_file = args.input_file
+    output_file = args.output
+    target_bpm = args.target_bpm
 
     # Load the audio
     y, sr = load_audio(input_file)
@@ -64,16 +184,10 @@ def main():
         return
     print(f"Original tempo: {original_tempo:.2f} BPM")
 
-    # Correct the rhythm
-    corrected_audio = correct_rhythm(y, sr, original_tempo, target_bpm)
-    if corrected_audio is None:
+    # Correct the rhythm straight from the file to the output
+    if correct_rhythm(input_file, output_file, original_tempo, target_bpm) is None:
         return
 
-    print(f"Corrected audio shape: {corrected_audio.shape}")
-
-    # Save the processed audio
-    save_audio(corrected_audio, sr, output_file)
-
     print(f"Processed audio saved to {output_file}")
     print(f"Target tempo: {target_bpm} BPM")
 
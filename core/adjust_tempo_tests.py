@@ -0,0 +1,77 @@
+import os
+import pathlib
+import subprocess
+import sys
+import pytest
+import adjust_tempo
+from adjust_tempo import INDEX_FILENAME, TempoIndex, analyze_directory
+
+
+def _fake_analysis(file_path):
+    # Stands in for librosa's beat tracking; runs in the pool's worker processes
+    data = pathlib.Path(file_path).read_bytes()
+    return {"tempo": float(len(data)), "beats": [], "duration": 0.0}
+
+
+def _stale_analysis(file_path):
+    return {"tempo": -1.0, "beats": [], "duration": 0.0}
+
+
+@pytest.fixture
+def takes(tmp_path, monkeypatch):
+    monkeypatch.setattr(adjust_tempo, "analyze_file", _fake_analysis)
+    (tmp_path / "output_0.wav").write_bytes(b"a" * 100)
+    (tmp_path / "output_1.wav").write_bytes(b"b" * 200)
+    return tmp_path
+
+
+def _tempos(results):
+    return {name: result["tempo"] for name, result in results.items()}
+
+
+def test_results_are_reused_without_rereading_unchanged_files(takes, monkeypatch):
+    assert _tempos(analyze_directory(takes, workers=1)) == {"output_0.wav": 100.0, "output_1.wav": 200.0}
+
+    # A second run neither analyzes nor hashes anything
+    monkeypatch.setattr(adjust_tempo, "analyze_file", _stale_analysis)
+    hashed = []
+    monkeypatch.setattr(adjust_tempo, "content_hash", lambda path: hashed.append(path))
+    assert _tempos(analyze_directory(takes, workers=1)) == {"output_0.wav": 100.0, "output_1.wav": 200.0}
+    assert hashed == []
+
+
+def test_changed_file_is_reanalyzed_and_copies_share_a_result(takes):
+    analyze_directory(takes, workers=1)
+    (takes / "output_0.wav").write_bytes(b"c" * 300)
+    stat = os.stat(takes / "output_0.wav")
+    os.utime(takes / "output_0.wav", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (takes / "output_2.wav").write_bytes(b"b" * 200)  # Same content as output_1
+
+    results = analyze_directory(takes, workers=1)
+    assert _tempos(results) == {"output_0.wav": 300.0, "output_1.wav": 200.0, "output_2.wav": 200.0}
+
+    # The old version's result is pruned; the copy adds no new one
+    index = TempoIndex(takes / INDEX_FILENAME)
+    assert len(index.results) == 2 and set(index.files) == set(results)
+
+
+def test_unreadable_index_is_rebuilt(takes, capsys):
+    (takes / INDEX_FILENAME).write_text("{not json")
+    assert TempoIndex(takes / INDEX_FILENAME).results == {}
+    assert "Ignoring unreadable tempo index" in capsys.readouterr().out
+
+    assert _tempos(analyze_directory(takes, workers=1)) == {"output_0.wav": 100.0, "output_1.wav": 200.0}
+    assert len(TempoIndex(takes / INDEX_FILENAME).results) == 2
+
+
+def test_reading_the_index_does_not_import_librosa(takes):
+    code = ("import sys, adjust_tempo; "
+            f"adjust_tempo.TempoIndex({str(takes / INDEX_FILENAME)!r}); "
+            "print('librosa' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=pathlib.Path(__file__).resolve().parent)
+    assert result.stdout.strip() == "False"
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,250 @@
+import abc
+import pathlib
+import threading
+import time
+import wave
+import logging
+from typing import Callable, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Same value as pyaudio.paContinue, so callbacks work unchanged on every backend
+CALLBACK_CONTINUE = 0
+
+StreamCallback = Callable[[Optional[bytes], int, dict, int], tuple]
+
+
+class AudioBackend(abc.ABC):
+    """
+    The device layer underneath AsyncAudioHandler.
+
+    `open` returns a stream with the PyAudio stream API (`read`, `write`,
+    `stop_stream`, `close`), so the handler does not care whether it is talking
+    to a sound card, a buffer in memory or a WAV file.
+    """
+
+    @abc.abstractmethod
+    def open(self, rate: int, channels: int, sample_width: int, frames_per_buffer: int,
+             input: bool = False, output: bool = False, stream_callback: Optional[StreamCallback] = None):
+        """Open an input and/or output stream; with `stream_callback` it pulls and pushes blocks itself."""
+
+    def describe(self) -> str:
+        """Names the devices behind this backend, for keying per-device settings such as latency."""
+        return type(self).__name__
+
+    def terminate(self):
+        pass
+
+
+class PyAudioBackend(AudioBackend):
+    """Real sound card I/O through PortAudio."""
+
+    def __init__(self):
+        # Imported here so headless backends never load PortAudio
+        import pyaudio
+        self.p = pyaudio.PyAudio()
+
+    def open(self, rate, channels, sample_width, frames_per_buffer,
+             input=False, output=False, stream_callback=None):
+        return self.p.open(format=self.p.get_format_from_width(sample_width),
+                           channels=channels,
+                           rate=rate,
+                           input=input,
+                           output=output,
+                           frames_per_buffer=frames_per_buffer,
+                           stream_callback=stream_callback)
+
+    def describe(self):
+        try:
+            host_api = self.p.get_default_host_api_info()["name"]
+            input_name = self.p.get_default_input_device_info()["name"]
+            output_name = self.p.get_default_output_device_info()["name"]
+        except (IOError, OSError):
+            return super().describe()
+        return f"{host_api}: {input_name} -> {output_name}"
+
+    def terminate(self):
+        self.p.terminate()
+
+
+class _DeviceClock:
+    """Paces a simulated stream so that N frames take N / rate seconds."""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.frames = 0
+        self.start = time.perf_counter()
+
+    def advance(self, frames: int):
+        self.frames += frames
+        delay = self.start + self.frames / self.rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _SimulatedStream:
+    def __init__(self, backend: "MemoryBackend", rate: int, channels: int, sample_width: int,
+                 frames_per_buffer: int, input: bool, output: bool, stream_callback: Optional[StreamCallback]):
+        self.backend = backend
+        self.frame_bytes = channels * sample_width
+        self.frames_per_buffer = frames_per_buffer
+        self.input = input
+        self.output = output
+        self.stream_callback = stream_callback
+        self._clock = _DeviceClock(rate) if backend.realtime else None
+        self._active = True
+        self._thread = None
+        if stream_callback is not None and backend.realtime:
+            self._thread = threading.Thread(target=self._run_callbacks, daemon=True)
+            self._thread.start()
+
+    def read(self, num_frames: int, exception_on_overflow: bool = True) -> bytes:
+        data = self.backend._read_input(num_frames * self.frame_bytes)
+        self._tick(num_frames)
+        return data
+
+    def write(self, frames: bytes):
+        self.backend._capture_output(bytes(frames))
+        self._tick(len(frames) // self.frame_bytes)
+
+    def process_block(self) -> int:
+        """Run one device period through the stream callback and return its flag."""
+        in_data = self.backend._read_input(self.frames_per_buffer * self.frame_bytes) if self.input else None
+        out_data, flag = self.stream_callback(in_data, self.frames_per_buffer, {}, 0)
+        if self.output and out_data is not None:
+            self.backend._capture_output(out_data)
+        return flag
+
+    def _run_callbacks(self):
+        while self._active:
+            if self.process_block() != CALLBACK_CONTINUE:
+                break
+            self._tick(self.frames_per_buffer)
+
+    def _tick(self, frames: int):
+        if self._clock is not None:
+            self._clock.advance(frames)
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def stop_stream(self):
+        self._active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+
+class MemoryBackend(AudioBackend):
+    """
+    Device-free backend for tests and benchmarks.
+
+    Input is read from `input_file` (or `input_data`) and is followed by
+    silence once it runs out. Output is captured in memory. With
+    `realtime=True` every stream is paced by a simulated device clock and
+    callback streams run on their own thread. Otherwise reads and writes return
+    immediately and callback streams are driven by calling `process_block`,
+    which keeps runs deterministic.
+
+    With `loopback_delay` (in frames), input is instead what the output played
+    that many frames before its most recent block, like a cable from the
+    output jack back to the input.
+    """
+
+    def __init__(self, input_file: Optional[pathlib.Path] = None, input_data: Optional[np.ndarray] = None,
+                 realtime: bool = False, loopback_delay: Optional[int] = None):
+        if input_file is not None:
+            with wave.open(str(input_file), "rb") as wf:
+                input_data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        self._input = b"" if input_data is None else np.asarray(input_data, dtype=np.int16).tobytes()
+        self._input_pos = 0
+        self.realtime = realtime
+        self.loopback_delay = loopback_delay
+        self._frame_bytes = 2
+        self.output = bytearray()
+        self.streams = []
+
+    def open(self, rate, channels, sample_width, frames_per_buffer,
+             input=False, output=False, stream_callback=None):
+        self._frame_bytes = channels * sample_width
+        stream = _SimulatedStream(self, rate, channels, sample_width, frames_per_buffer,
+                                  input, output, stream_callback)
+        self.streams.append(stream)
+        return stream
+
+    def _read_input(self, num_bytes: int) -> bytes:
+        if self.loopback_delay is not None:
+            end = max(len(self.output) - self.loopback_delay * self._frame_bytes, 0)
+            data = bytes(self.output[max(end - num_bytes, 0):end])
+            return bytes(num_bytes - len(data)) + data
+        data = self._input[self._input_pos:self._input_pos + num_bytes]
+        self._input_pos += len(data)
+        return data + bytes(num_bytes - len(data))
+
+    def _capture_output(self, data: bytes):
+        self.output += data
+
+    def output_audio(self) -> np.ndarray:
+        return np.frombuffer(bytes(self.output), dtype=np.int16)
+
+    def terminate(self):
+        for stream in self.streams:
+            stream.close()
+
+
+class WavFileBackend(MemoryBackend):
+    """
+    Like MemoryBackend, but output is streamed into a WAV file as it is written.
+
+    The file takes its format from the first output stream opened. Every output
+    stream of the backend must use that same format.
+    """
+
+    def __init__(self, output_file: pathlib.Path, input_file: Optional[pathlib.Path] = None, realtime: bool = False):
+        super().__init__(input_file=input_file, realtime=realtime)
+        self.output_file = pathlib.Path(output_file)
+        self._format = None
+        self._file = None
+        self._wave = None
+        self._data_offset = 0
+
+    def open(self, rate, channels, sample_width, frames_per_buffer,
+             input=False, output=False, stream_callback=None):
+        if output:
+            self._open_file(rate, channels, sample_width)
+        return super().open(rate, channels, sample_width, frames_per_buffer, input, output, stream_callback)
+
+    def _open_file(self, rate: int, channels: int, sample_width: int):
+        if self._format is not None:
+            if self._format != (rate, channels, sample_width):
+                raise ValueError(f"{self.output_file} is already being written as {self._format}, "
+                                 f"not {(rate, channels, sample_width)}")
+            return
+        self._format = (rate, channels, sample_width)
+        self._file = open(self.output_file, "wb")
+        self._wave = wave.open(self._file, "wb")
+        self._wave.setnchannels(channels)
+        self._wave.setsampwidth(sample_width)
+        self._wave.setframerate(rate)
+        self._wave.writeframes(b"")  # Writes the header, so the samples start at a known offset
+        self._data_offset = self._file.tell()
+
+    def _capture_output(self, data: bytes):
+        self._wave.writeframes(data)
+
+    def output_audio(self) -> np.ndarray:
+        """The samples written to the file so far, read back from it."""
+        if self._file is None:
+            return np.zeros(0, dtype=np.int16)
+        if not self._file.closed:
+            self._file.flush()
+        return np.fromfile(self.output_file, dtype="<i2", offset=self._data_offset)
+
+    def terminate(self):
+        super().terminate()
+        if self._wave is not None:
+            self._wave.close()
+            self._file.close()
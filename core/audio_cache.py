@@ -0,0 +1,138 @@
+import mmap
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+import numpy as np
+
+DEFAULT_BUDGET_BYTES = 256 * 1024 * 1024
+# Each mapping holds a file descriptor, so mapped entries are capped by count
+DEFAULT_MAX_MAPPED = 256
+
+
+def _is_mapped(value: Any) -> bool:
+    """Whether an array's memory is a file mapping, however many views deep."""
+    while value is not None:
+        if isinstance(value, (np.memmap, mmap.mmap)):
+            return True
+        value = getattr(value, "base", None)
+    return False
+
+
+def _entry_size(value: Any) -> int:
+    """Heap bytes an entry holds. File mappings live in the page cache, which the kernel reclaims, so they count 0."""
+    if isinstance(value, dict):
+        return sum(_entry_size(v) for v in value.values())
+    if _is_mapped(value):
+        return 0
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 0
+
+
+class AudioCache:
+    """
+    LRU cache for decoded audio with a budget in bytes.
+
+    Entries are keyed on (path, mtime, size), so overwriting a file (which happens
+    whenever recording_count restarts at 0) is a miss rather than stale audio.
+    An optional `variant` (such as a target sample format) keeps several
+    decodings of one file apart. The cache holds no reference to its callers.
+    Memory-mapped entries cost nothing against the byte budget. They have their
+    own cap, `max_mapped` entries, past which the least recently used mapping
+    is released.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_BYTES, max_mapped: int = DEFAULT_MAX_MAPPED):
+        self.max_bytes = max_bytes
+        self.max_mapped = max_mapped
+        self.current_bytes = 0
+        self.mapped_entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, int, int, Hashable], Tuple[Any, int, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(filename: pathlib.Path, variant: Hashable = None) -> Tuple[str, int, int, Hashable]:
+        stat = os.stat(filename)
+        return str(pathlib.Path(filename).resolve()), stat.st_mtime_ns, stat.st_size, variant
+
+    def get(self, filename: pathlib.Path, loader: Callable[[pathlib.Path], Any], variant: Hashable = None) -> Any:
+        """Return the cached value for `filename` and `variant`, calling `loader(filename)` on a miss."""
+        key = self.key_for(filename, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader(filename)
+        size = _entry_size(value)
+        mapped = _is_mapped(value)
+        with self._lock:
+            self._drop_stale(key)
+            if size <= self.max_bytes and (self.max_mapped > 0 or not mapped):
+                self._entries[key] = (value, size, mapped)
+                self.current_bytes += size
+                self.mapped_entries += mapped
+                self._evict()
+        return value
+
+    def _drop_stale(self, key: Tuple[str, int, int, Hashable]):
+        # Older versions of the same file can never be hit again, in any variant
+        for stale in [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+            self._remove(stale)
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        if self.mapped_entries > self.max_mapped:
+            for key in [key for key, (_, _, mapped) in self._entries.items() if mapped]:
+                self._remove(key)
+                self.evictions += 1
+                if self.mapped_entries <= self.max_mapped:
+                    break
+
+    def _remove(self, key: Tuple[str, int, int, Hashable]):
+        _, size, mapped = self._entries.pop(key)
+        self.current_bytes -= size
+        self.mapped_entries -= mapped
+
+    def set_budget(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.mapped_entries = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mapped": self.mapped_entries,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by every loader in the process so the budget covers all decoded audio
+audio_cache = AudioCache()
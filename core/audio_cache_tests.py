@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import pytest
+from audio_cache import AudioCache
+
+
+def _write(path, nbytes: int, mtime_ns: int):
+    path.write_bytes(b"\0" * nbytes)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _loader(calls):
+    def load(filename):
+        calls.append(filename)
+        return np.zeros(os.path.getsize(filename), dtype=np.uint8)
+    return load
+
+
+def test_evicts_least_recently_used_entries_over_budget(tmp_path):
+    cache = AudioCache(max_bytes=250)
+    calls = []
+    paths = [tmp_path / f"loop_{i}.wav" for i in range(3)]
+    for path in paths:
+        _write(path, 100, 10**9)
+
+    cache.get(paths[0], _loader(calls))
+    cache.get(paths[1], _loader(calls))
+    cache.get(paths[0], _loader(calls))  # paths[1] is now least recently used
+    cache.get(paths[2], _loader(calls))
+
+    assert cache.stats() == {"entries": 2, "mapped": 0, "bytes": 200, "max_bytes": 250,
+                             "hits": 1, "misses": 3, "evictions": 1}
+    cache.get(paths[1], _loader(calls))
+    assert calls.count(paths[1]) == 2
+
+
+def test_mapped_entries_do_not_push_heap_entries_out(tmp_path):
+    cache = AudioCache(max_bytes=250)
+    heap_calls, mapped_calls = [], []
+    heap_path, mapped_path = tmp_path / "decoded.wav", tmp_path / "mapped.wav"
+    _write(heap_path, 200, 10**9)
+    _write(mapped_path, 4096, 10**9)
+
+    cache.get(heap_path, _loader(heap_calls))
+    mapped = cache.get(mapped_path, lambda f: np.memmap(f, dtype=np.int16, mode="r")[16:])
+    assert cache.get(mapped_path, lambda f: mapped_calls.append(f)) is mapped
+    cache.get(heap_path, _loader(heap_calls))
+
+    assert (heap_calls, mapped_calls) == ([heap_path], [])
+    assert cache.stats()["bytes"] == 200 and cache.evictions == 0
+
+
+def test_least_recently_used_mappings_are_released_past_the_cap(tmp_path):
+    cache = AudioCache(max_bytes=250, max_mapped=2)
+    heap_calls, mapped_calls = [], []
+    heap_path = tmp_path / "decoded.wav"
+    _write(heap_path, 200, 10**9)
+    paths = [tmp_path / f"mapped_{i}.wav" for i in range(3)]
+    for path in paths:
+        _write(path, 4096, 10**9)
+
+    def map_file(filename):
+        mapped_calls.append(filename)
+        return np.memmap(filename, dtype=np.int16, mode="r")
+
+    cache.get(heap_path, _loader(heap_calls))
+    cache.get(paths[0], map_file)
+    cache.get(paths[1], map_file)
+    cache.get(paths[0], map_file)  # paths[1] is now the least recently used mapping
+    cache.get(paths[2], map_file)
+
+    assert cache.stats()["mapped"] == 2 and cache.evictions == 1
+    cache.get(paths[0], map_file)
+    cache.get(heap_path, _loader(heap_calls))
+    cache.get(paths[1], map_file)
+    assert mapped_calls == [paths[0], paths[1], paths[2], paths[1]]
+    assert heap_calls == [heap_path]
+
+
+def test_overwritten_file_is_reloaded(tmp_path):
+    cache = AudioCache()
+    calls = []
+    path = tmp_path / "output_0.wav"
+
+    _write(path, 10, 10**9)
+    first = cache.get(path, _loader(calls))
+    _write(path, 20, 2 * 10**9)
+    second = cache.get(path, _loader(calls))
+
+    assert len(first) == 10 and len(second) == 20
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_variants_are_cached_apart_and_expire_together(tmp_path):
+    cache = AudioCache()
+    calls = []
+    path = tmp_path / "imported.wav"
+
+    _write(path, 10, 10**9)
+    cache.get(path, _loader(calls), variant=(44100, 1))
+    cache.get(path, _loader(calls), variant=(48000, 2))
+    cache.get(path, _loader(calls), variant=(44100, 1))
+    assert len(calls) == 2 and len(cache) == 2
+
+    _write(path, 20, 2 * 10**9)
+    cache.get(path, _loader(calls), variant=(44100, 1))
+    assert len(calls) == 3 and len(cache) == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
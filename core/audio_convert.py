@@ -0,0 +1,96 @@
+"""
+Bring any WAV into the engine's format: int16 at the engine's rate and channel count.
+
+Files already in that format are memory-mapped as before. Anything else is
+decoded, mapped onto the engine's channels, resampled with resample.resample
+and written once to a cache directory. The cache is keyed by the source file
+(path, size, mtime) and the target format, so later loads just map the
+converted copy. Each cache name starts with the source's stem and a hash of
+its path, which is how a new conversion finds and removes the conversions of
+older versions of the same file and no other.
+"""
+import glob
+import hashlib
+import os
+import pathlib
+import wave
+from typing import Optional
+import numpy as np
+from resample import resample
+from wav_io import memmap_wav, read_pcm, read_wav_info
+
+CACHE_DIRNAME = ".converted"
+
+
+def convert_channels(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Map frames x N samples onto `channels`: mono is the mean, mono fans out, otherwise the first channels."""
+    source_channels = samples.shape[1]
+    if source_channels == channels:
+        return samples
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    if source_channels == 1:
+        return np.repeat(samples, channels, axis=1)
+    if source_channels > channels:
+        return samples[:, :channels]
+    raise ValueError(f"Cannot map {source_channels} channels onto {channels}")
+
+
+def convert_samples(samples: np.ndarray, from_rate: int, rate: int, channels: int) -> np.ndarray:
+    """Float frames x channels in [-1, 1) to int16 at `rate`; mono comes back one-dimensional."""
+    converted = resample(convert_channels(samples, channels), from_rate, rate)
+    pcm = np.clip(np.round(converted * 32768), -32768, 32767).astype(np.int16)
+    return pcm[:, 0] if channels == 1 else pcm
+
+
+def _source_prefix(filename: pathlib.Path) -> str:
+    """The part of a cache name shared by every version of the source at `filename`."""
+    path = str(pathlib.Path(filename).resolve()).encode()
+    return f"{pathlib.Path(filename).stem}.{hashlib.blake2b(path, digest_size=8).hexdigest()}"
+
+
+def converted_path(cache_dir: pathlib.Path, filename: pathlib.Path, rate: int, channels: int) -> pathlib.Path:
+    filename = pathlib.Path(filename)
+    stat = os.stat(filename)
+    version = hashlib.blake2b(f"{stat.st_size}|{stat.st_mtime_ns}".encode(), digest_size=8).hexdigest()
+    return pathlib.Path(cache_dir) / f"{_source_prefix(filename)}.{version}.{rate}Hz.{channels}ch.wav"
+
+
+def load_for_engine(filename: pathlib.Path, rate: int, channels: int = 1,
+                    cache_dir: Optional[pathlib.Path] = None) -> np.ndarray:
+    """
+    The take at `filename` as int16 at `rate` with `channels`, converting it if needed.
+
+    With `cache_dir`, a conversion is done once per source version and target
+    format and then mapped from disk.
+    """
+    info = read_wav_info(filename)
+    if (info.sample_width, info.rate, info.channels, info.is_float) == (2, rate, channels, False):
+        return memmap_wav(filename)[0]
+
+    cached = converted_path(cache_dir, filename, rate, channels) if cache_dir is not None else None
+    if cached is not None and cached.exists():
+        return memmap_wav(cached)[0]
+
+    samples, info = read_pcm(filename)
+    pcm = convert_samples(samples, info.rate, rate, channels)
+    if cached is None:
+        return pcm
+    _write_cached(cached, _source_prefix(filename), pcm, rate, channels)
+    # Mapped like any other take, so the conversion does not stay on the heap
+    return memmap_wav(cached)[0]
+
+
+def _write_cached(path: pathlib.Path, prefix: str, pcm: np.ndarray, rate: int, channels: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Conversions of older versions of this file can never be hit again
+    for stale in path.parent.glob(f"{glob.escape(prefix)}.*.{rate}Hz.{channels}ch.wav"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with wave.open(str(temp_path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+    os.replace(temp_path, path)
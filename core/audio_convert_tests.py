@@ -0,0 +1,96 @@
+import wave
+import numpy as np
+import pytest
+from audio_convert import CACHE_DIRNAME, load_for_engine
+from resample import resample, resampled_length
+from wav_io import read_pcm
+
+RATE = 44100
+
+
+def _write_wav(path, samples: np.ndarray, rate: int, sample_width: int):
+    frames = samples.reshape(len(samples), -1)
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(frames.shape[1])
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        if sample_width == 1:
+            data = (np.round(frames * 127) + 128).astype(np.uint8).tobytes()
+        elif sample_width == 3:
+            ints = np.round(frames * (2 ** 23 - 1)).astype("<i4")
+            data = ints.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        else:
+            dtype = {2: "<i2", 4: "<i4"}[sample_width]
+            data = np.round(frames * (2 ** (8 * sample_width - 1) - 1)).astype(dtype).tobytes()
+        wf.writeframes(data)
+
+
+def _tone(frequency: float, rate: int, seconds: float = 0.5, channels: int = 1) -> np.ndarray:
+    tone = 0.5 * np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate)
+    return np.repeat(tone[:, None], channels, axis=1) if channels > 1 else tone
+
+
+@pytest.mark.parametrize("sample_width", [1, 2, 3, 4])
+def test_every_pcm_width_decodes_to_the_same_signal(tmp_path, sample_width):
+    tone = _tone(440, RATE, channels=2)
+    _write_wav(tmp_path / "take.wav", tone, RATE, sample_width)
+    samples, info = read_pcm(tmp_path / "take.wav")
+    assert samples.shape == tone.shape and info.channels == 2
+    np.testing.assert_allclose(samples, tone, atol=1.5 / 2 ** (8 * sample_width - 1))
+
+
+def test_resampled_tone_keeps_its_pitch():
+    tone = _tone(1000, 48000, seconds=1.0)
+    converted = resample(tone, 48000, RATE)
+    assert len(converted) == resampled_length(len(tone), 48000, RATE) == RATE
+    expected = _tone(1000, RATE, seconds=1.0)
+    error = converted[100:-100] - expected[100:-100]
+    assert np.sqrt(np.mean(error ** 2)) < 1e-3
+
+
+def test_48k_stereo_take_is_converted_once_and_cached(tmp_path):
+    source = tmp_path / "imported.wav"
+    _write_wav(source, _tone(440, 48000, channels=2), 48000, 3)
+    cache_dir = tmp_path / CACHE_DIRNAME
+
+    first = load_for_engine(source, RATE, 1, cache_dir)
+    assert first.dtype == np.int16 and first.ndim == 1
+    assert len(first) == RATE // 2
+    np.testing.assert_allclose(first[100:-100] / 32768, _tone(440, RATE)[100:-100], atol=2e-3)
+
+    cached = list(cache_dir.iterdir())
+    assert len(cached) == 1
+    second = load_for_engine(source, RATE, 1, cache_dir)
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_engine_format_is_mapped_untouched(tmp_path):
+    source = tmp_path / "output_0.wav"
+    _write_wav(source, _tone(440, RATE), RATE, 2)
+    loaded = load_for_engine(source, RATE, 1, tmp_path / CACHE_DIRNAME)
+    assert isinstance(loaded, np.memmap)
+    assert not (tmp_path / CACHE_DIRNAME).exists()
+
+
+def test_new_version_replaces_only_its_own_conversion(tmp_path):
+    cache_dir = tmp_path / CACHE_DIRNAME
+    sources = [tmp_path / "a" / "take.wav", tmp_path / "b" / "take.wav",
+               tmp_path / "my.take.wav", tmp_path / "my.other.wav"]
+    for source in sources:
+        source.parent.mkdir(exist_ok=True)
+        _write_wav(source, _tone(440, 48000), 48000, 2)
+        load_for_engine(source, RATE, 1, cache_dir)
+    assert len(list(cache_dir.iterdir())) == len(sources)
+
+    for source in sources:
+        _write_wav(source, _tone(880, 48000, seconds=0.25), 48000, 2)
+        assert len(load_for_engine(source, RATE, 1, cache_dir)) == RATE // 4
+    # Each new version displaced only the conversion of its own older version
+    assert len(list(cache_dir.iterdir())) == len(sources)
+    for source in sources:
+        assert isinstance(load_for_engine(source, RATE, 1, cache_dir), np.memmap)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,15 +1,66 @@
 import asyncio
-import pyaudio
+import contextlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+from audio_backends import AudioBackend, PyAudioBackend, CALLBACK_CONTINUE
+from instrumentation import metrics, startup
+from ring_buffer import BlockRingBuffer, CaptureRing
+
+logger = logging.getLogger(__name__)
+
+# PortAudio status flags passed to stream callbacks
+INPUT_OVERFLOW = 0x2
+OUTPUT_UNDERFLOW = 0x4
+OUTPUT_OVERFLOW = 0x8
+
+CHANNELS = 1
+RATE = 44100
+CHUNK_SIZE = 1024
+SAMPLE_WIDTH = 2
+# Failed input reads in a row before blocking capture gives up on the device
+MAX_INPUT_FAILURES = 50
+
 
 class AsyncAudioHandler:
-    def __init__(self):
-        self.p = pyaudio.PyAudio()
+    def __init__(self, backend: Optional[AudioBackend] = None, use_callback: bool = True, ring_blocks: int = 4):
+        # Without a backend, the sound card is opened on first use, off the event loop:
+        # PortAudio's device scan takes long enough to hold up the first window
+        self.backend = backend
+        self._backend_ready: Optional[asyncio.Future] = None
+        self._output_lock = asyncio.Lock()
+        self._input_lock = asyncio.Lock()
         self.input_stream = None
         self.output_stream = None
-        self.format = pyaudio.paInt16
-        self.channels = 1
-        self.rate = 44100
-        self.chunk_size = 1024
+        self.sample_width = SAMPLE_WIDTH
+        self.channels = CHANNELS
+        self.rate = RATE
+        self.chunk_size = CHUNK_SIZE
+        # Frames handed to write_chunk so far: the output timeline input is measured against
+        self.output_frames = 0
+
+        # Set by start_capture: the input then runs into this ring until the handler closes
+        self.capture: Optional[CaptureRing] = None
+        self._capturing = False
+        self._capture_reader: Optional[asyncio.Future] = None
+        self._input_pos = 0
+        # Output-timeline frame at which the last chunk read_chunk returned was captured
+        self.input_time = 0
+
+        # Callback mode: PortAudio pulls pre-rendered blocks from a ring on its own
+        # thread, so the device deadline no longer depends on the asyncio loop.
+        self.use_callback = use_callback
+        self.ring_blocks = ring_blocks
+        self.output_ring = BlockRingBuffer(self.chunk_size * ring_blocks) if use_callback else None
+        if self.output_ring is not None:
+            metrics.register_gauge("output_ring_depth", lambda: self.output_ring.available)
+            metrics.register_gauge("output_ring_underruns", lambda: self.output_ring.underruns)
+
+        # Fallback blocking I/O gets its own threads instead of the default executor
+        self._input_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-in")
+        self._output_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-out")
 
     async def __aenter__(self):
         return self
@@ -17,46 +68,210 @@ class AsyncAudioHandler:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
+    async def start_backend(self) -> AudioBackend:
+        """Create the default PyAudio backend on the output thread, once. Safe to call early and often."""
+        if self.backend is not None:
+            return self.backend
+        if self._backend_ready is None:
+            loop = asyncio.get_running_loop()
+            self._backend_ready = loop.run_in_executor(self._output_executor, PyAudioBackend)
+        backend = await asyncio.shield(self._backend_ready)
+        if self.backend is None:
+            self.backend = backend
+            startup.mark("audio_backend_ready")
+        return self.backend
+
     async def open_input_stream(self):
+        """Get ready to read_chunk. While capturing, this only moves the read position up to now."""
+        if self.capture is not None:
+            self._input_pos = self.capture.written
+            return
+        backend = await self.start_backend()
         loop = asyncio.get_running_loop()
         self.input_stream = await loop.run_in_executor(
-            None, 
-            lambda: self.p.open(format=self.format,
-                                channels=self.channels,
-                                rate=self.rate,
-                                input=True,
-                                frames_per_buffer=self.chunk_size)
+            self._input_executor,
+            lambda: backend.open(rate=self.rate,
+                                      channels=self.channels,
+                                      sample_width=self.sample_width,
+                                      input=True,
+                                      frames_per_buffer=self.chunk_size)
         )
 
+    async def start_capture(self, seconds: float) -> CaptureRing:
+        """
+        Keep the input stream running into a ring of the last `seconds` of audio,
+        from now until the handler closes. Safe to call more than once.
+
+        In callback mode PortAudio writes each block into the ring on its own
+        thread. Otherwise a blocking read loop does the same on the input thread.
+        Every block is stamped with the output position it arrived at, one block
+        earlier, which is how read_chunk's callers have always placed input.
+        """
+        async with self._input_lock:
+            if self.capture is not None:
+                return self.capture
+            backend = await self.start_backend()
+            loop = asyncio.get_running_loop()
+            if self.input_stream:
+                # Left over from reading without capture; only one stream may own the device
+                await loop.run_in_executor(self._input_executor, self.input_stream.close)
+            block = self.chunk_size * self.channels
+            capture = CaptureRing(int(seconds * self.rate) * self.channels, block)
+            callback = self._input_callback if self.use_callback else None
+            self.capture = capture
+            try:
+                self.input_stream = await loop.run_in_executor(
+                    self._input_executor,
+                    lambda: backend.open(rate=self.rate,
+                                         channels=self.channels,
+                                         sample_width=self.sample_width,
+                                         input=True,
+                                         frames_per_buffer=self.chunk_size,
+                                         stream_callback=callback)
+                )
+            except BaseException:
+                self.capture = None
+                raise
+            if not self.use_callback:
+                self._capturing = True
+                self._capture_reader = loop.run_in_executor(self._input_executor, self._capture_blocking)
+            metrics.register_gauge("capture_position", lambda: capture.written)
+            startup.mark("capture_started")
+            return capture
+
+    def _input_callback(self, in_data, frame_count, time_info, status):
+        if status & INPUT_OVERFLOW:
+            metrics.count("input_overruns")
+        self.capture.write(np.frombuffer(in_data, dtype=np.int16), self.output_frames - frame_count)
+        return None, CALLBACK_CONTINUE
+
+    def _capture_blocking(self):
+        failures = 0
+        while self._capturing:
+            try:
+                data = self.input_stream.read(self.chunk_size, exception_on_overflow=False)
+            except OSError as e:
+                metrics.count("input_overruns")
+                failures += 1
+                if failures == 1:
+                    logger.warning(f"Input read failed, retrying: {e}")
+                if failures >= MAX_INPUT_FAILURES:
+                    logger.error(f"Input failed {failures} times in a row; capture stopped")
+                    self._capturing = False
+                    # Readers waiting on the ring fail now, and the next start_capture opens a new one
+                    capture, self.capture = self.capture, None
+                    capture.close(OSError(f"Input failed {failures} times in a row: {e}"))
+                    return
+                # A vanished device fails at once; wait up to a few blocks rather than spin
+                time.sleep(min(failures, 4) * self.chunk_size / self.rate)
+                continue
+            failures = 0
+            self.capture.write(np.frombuffer(data, dtype=np.int16), self.output_frames - self.chunk_size)
+
     async def open_output_stream(self):
-        loop = asyncio.get_running_loop()
-        self.output_stream = await loop.run_in_executor(
-            None, 
-            lambda: self.p.open(format=self.format,
-                                channels=self.channels,
-                                rate=self.rate,
-                                output=True,
-                                frames_per_buffer=self.chunk_size)
-        )
+        # Startup may open the stream early while the first write is already waiting for it
+        async with self._output_lock:
+            if self.output_stream:
+                return
+            backend = await self.start_backend()
+            loop = asyncio.get_running_loop()
+            callback = self._output_callback if self.use_callback else None
+            self.output_stream = await loop.run_in_executor(
+                self._output_executor,
+                lambda: backend.open(rate=self.rate,
+                                     channels=self.channels,
+                                     sample_width=self.sample_width,
+                                     output=True,
+                                     frames_per_buffer=self.chunk_size,
+                                     stream_callback=callback)
+            )
+        startup.mark("output_stream_open")
+
+    def device_config(self) -> str:
+        """
+        Everything that sets the round-trip latency: devices, format, block size
+        and output buffering. Only valid once the backend has started.
+        """
+        buffering = f"ring of {self.ring_blocks}" if self.use_callback else "blocking"
+        return (f"{self.backend.describe()} | {self.rate} Hz, {self.channels} ch, {8 * self.sample_width} bit | "
+                f"{self.chunk_size} frames, {buffering}")
+
+    def _output_callback(self, in_data, frame_count, time_info, status):
+        # Ring underruns mean the mixer fell behind; these flags mean the device itself starved
+        if status & OUTPUT_UNDERFLOW:
+            metrics.count("output_device_underflows")
+        if status & OUTPUT_OVERFLOW:
+            metrics.count("output_device_overflows")
+        out = np.empty(frame_count, dtype=np.int16)
+        self.output_ring.read_into(out)
+        return out.tobytes(), CALLBACK_CONTINUE
 
     async def read_chunk(self):
+        if self.capture is not None:
+            return await self._read_captured_chunk()
         if not self.input_stream:
             raise ValueError("Input stream is not open")
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self.input_stream.read, self.chunk_size)
+        with metrics.stage("read_chunk"):
+            try:
+                data = await loop.run_in_executor(self._input_executor, self.input_stream.read, self.chunk_size)
+            except OSError:
+                metrics.count("input_overruns")
+                raise
+        # Its first frame came in one block before the output position it returned at
+        self.input_time = self.output_frames - self.chunk_size
+        return data
+
+    async def _read_captured_chunk(self) -> bytes:
+        capture = self.capture
+        if self._input_pos < capture.oldest:
+            # Nobody read for longer than the ring holds
+            metrics.count("input_overruns")
+            self._input_pos = capture.oldest
+        with metrics.stage("read_chunk"):
+            end = self._input_pos + self.chunk_size * self.channels
+            await capture.wait_for(end)
+            data = b"".join(capture.views(self._input_pos, end))
+        self.input_time = capture.time_at(self._input_pos)
+        self._input_pos = end
+        return data
 
     async def write_chunk(self, chunk):
+        self.output_frames += len(chunk) // (self.sample_width * self.channels)
         if not self.output_stream:
             await self.open_output_stream()
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, self.output_stream.write, chunk)
+        with metrics.stage("write_chunk"):
+            if self.output_ring is not None:
+                await self._write_to_ring(np.frombuffer(chunk, dtype=np.int16))
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._output_executor, self.output_stream.write, chunk)
+
+    async def _write_to_ring(self, samples: np.ndarray):
+        # Wait for room rather than block: half a block is the finest useful wake-up
+        while len(samples):
+            written = self.output_ring.write(samples)
+            samples = samples[written:]
+            if len(samples):
+                metrics.count("output_ring_full_waits")
+                await asyncio.sleep(self.chunk_size / self.rate / 2)
 
     async def close(self):
         loop = asyncio.get_running_loop()
+        if self._capture_reader is not None:
+            # The read loop notices within a block
+            self._capturing = False
+            await self._capture_reader
         if self.input_stream:
-            await loop.run_in_executor(None, self.input_stream.stop_stream)
-            await loop.run_in_executor(None, self.input_stream.close)
+            await loop.run_in_executor(self._input_executor, self.input_stream.stop_stream)
+            await loop.run_in_executor(self._input_executor, self.input_stream.close)
         if self.output_stream:
-            await loop.run_in_executor(None, self.output_stream.stop_stream)
-            await loop.run_in_executor(None, self.output_stream.close)
-        self.p.terminate()
\ No newline at end of file
+            await loop.run_in_executor(self._output_executor, self.output_stream.stop_stream)
+            await loop.run_in_executor(self._output_executor, self.output_stream.close)
+        if self.backend is None and self._backend_ready is not None:
+            with contextlib.suppress(Exception):
+                self.backend = await self._backend_ready
+        self._input_executor.shutdown(wait=False)
+        self._output_executor.shutdown(wait=False)
+        if self.backend is not None:
+            self.backend.terminate()
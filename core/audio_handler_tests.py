@@ -0,0 +1,163 @@
+import asyncio
+import pathlib
+import subprocess
+import sys
+import wave
+import numpy as np
+import pytest
+from audio_backends import AudioBackend, MemoryBackend, WavFileBackend
+import audio_handler
+from audio_handler import AsyncAudioHandler
+from instrumentation import metrics
+
+
+def test_read_and_write_through_memory_backend():
+    input_data = np.arange(3000, dtype=np.int16)
+    backend = MemoryBackend(input_data=input_data)
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend, use_callback=False) as handler:
+            await handler.open_input_stream()
+            chunks = [await handler.read_chunk() for _ in range(3)]
+            for chunk in chunks:
+                await handler.write_chunk(chunk)
+            return handler.chunk_size
+
+    chunk_size = asyncio.run(run())
+    output = backend.output_audio()
+    # Input runs out after 3000 samples and is padded with silence
+    assert len(output) == 3 * chunk_size
+    np.testing.assert_array_equal(output[:3000], input_data)
+    assert not output[3000:].any()
+
+
+def test_backend_without_open_cannot_be_created():
+    class Silent(AudioBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
+
+
+def test_wav_file_backend_round_trips_through_the_file(tmp_path):
+    backend = WavFileBackend(tmp_path / "out.wav")
+    blocks = [np.arange(i * 1024, (i + 1) * 1024, dtype=np.int16) for i in range(3)]
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend, use_callback=False) as handler:
+            handler.rate = 22050  # The header follows the stream, not a default
+            for block in blocks:
+                await handler.write_chunk(block.tobytes())
+            # Readable while the file is still being written
+            np.testing.assert_array_equal(backend.output_audio(), np.concatenate(blocks))
+
+    asyncio.run(run())
+    np.testing.assert_array_equal(backend.output_audio(), np.concatenate(blocks))
+    with wave.open(str(tmp_path / "out.wav"), "rb") as wf:
+        assert (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) == (22050, 1, 2)
+        np.testing.assert_array_equal(np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16),
+                                      np.concatenate(blocks))
+
+
+def test_callback_mode_pulls_from_ring():
+    backend = MemoryBackend()
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend) as handler:
+            block = np.full(handler.chunk_size, 5, dtype=np.int16)
+            await handler.write_chunk(block.tobytes())
+            stream = handler.output_stream
+            stream.process_block()
+            stream.process_block()
+            return handler
+
+    metrics.reset()
+    handler = asyncio.run(run())
+    output = backend.output_audio()
+    assert (output[:handler.chunk_size] == 5).all()
+    assert not output[handler.chunk_size:].any()
+    assert handler.output_ring.underruns == 1
+
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"]["write_chunk"]["count"] == 1
+    assert snapshot["gauges"]["output_ring_underruns"] == 1
+    assert snapshot["gauges"]["output_ring_depth"] == 0
+
+
+def test_capture_keeps_the_latest_input_with_its_output_time():
+    input_data = np.arange(6000, dtype=np.int16)
+    backend = MemoryBackend(input_data=input_data)
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend) as handler:
+            chunk = handler.chunk_size
+            capture = await handler.start_capture(2 * chunk / handler.rate)
+            await handler.write_chunk(bytes(2 * chunk))  # One block
+            for _ in range(3):
+                handler.input_stream.process_block()
+
+            # Only the last two blocks are left, and they wrap around the ring's end
+            assert capture.oldest == chunk
+            views = capture.views(chunk, 3 * chunk)
+            assert len(views) == 2
+            np.testing.assert_array_equal(np.concatenate(views), input_data[chunk:3 * chunk])
+            assert capture.time_at(chunk + 5) == 5
+            with pytest.raises(IndexError):
+                capture.views(0, chunk)
+
+            # read_chunk serves the ring from where open_input_stream was called
+            await handler.open_input_stream()
+            await handler.write_chunk(bytes(2 * chunk))
+            asyncio.get_running_loop().call_soon(handler.input_stream.process_block)
+            data = await handler.read_chunk()
+            np.testing.assert_array_equal(np.frombuffer(data, dtype=np.int16), input_data[3 * chunk:4 * chunk])
+            assert handler.input_time == chunk
+
+    asyncio.run(run())
+
+
+def test_blocking_capture_gives_up_on_an_input_that_keeps_failing(monkeypatch, caplog):
+    monkeypatch.setattr(audio_handler, "MAX_INPUT_FAILURES", 3)
+    backend = MemoryBackend()
+    reads = []
+
+    def unplugged(num_bytes):
+        reads.append(num_bytes)
+        raise OSError("Device unavailable")
+
+    backend._read_input = unplugged
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend, use_callback=False) as handler:
+            overruns = metrics.counters.get("input_overruns", 0)
+            capture = await handler.start_capture(0.1)
+            waiter = asyncio.create_task(capture.wait_for(1))
+            await asyncio.wait_for(asyncio.shield(handler._capture_reader), 2)
+            assert metrics.counters["input_overruns"] - overruns == 3
+            # Readers of the dead ring fail instead of waiting forever, and capture can start again
+            with pytest.raises(OSError):
+                await asyncio.wait_for(waiter, 2)
+            with pytest.raises(OSError):
+                await capture.wait_for(1)
+            assert handler.capture is None
+            backend._read_input = lambda num_bytes: bytes(num_bytes)
+            assert await handler.start_capture(0.1) is not capture
+
+    asyncio.run(run())
+    assert len(reads) == 3
+    assert [record.levelname for record in caplog.records if record.name == "audio_handler"] == ["WARNING", "ERROR"]
+
+
+def test_startup_imports_no_device_or_analysis_modules():
+    # The default handler must not touch PortAudio until a stream is opened
+    code = ("import sys, asyncio, audio_looper_gui, main; "
+            "handler = audio_looper_gui.AsyncAudioHandler(); "
+            "asyncio.run(handler.close()); "
+            "print(sorted({'pyaudio', 'librosa', 'soundfile', 'parallel_mixer'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=pathlib.Path(__file__).resolve().parent)
+    assert result.stdout.strip() == "[]"
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -4,7 +4,8 @@ import wave
 import tkinter as tk
 import threading
 import numpy as np
-from functools import lru_cache
+from audio_cache import audio_cache
+from wav_io import memmap_wav
 
 class AudioLooper:
     def __init__(
@@ -32,23 +33,26 @@ class AudioLooper:
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
-    @lru_cache(maxsize=100)
     def read_audio_data(self, loop_index):
         output_filename = self.output_dir / f"output_{loop_index + 1}.wav"
-        with wave.open(str(output_filename), "rb") as wf:
-            return {
-                "data": wf.readframes(wf.getnframes()),
-                "sampwidth": wf.getsampwidth(),
-                "channels": wf.getnchannels(),
-                "framerate": wf.getframerate()
-            }
+        return audio_cache.get(output_filename, self._load_audio_info)
+
+    @staticmethod
+    def _load_audio_info(output_filename):
+        audio_data, info = memmap_wav(output_filename)
+        return {
+            "data": audio_data,
+            "sampwidth": info.sample_width,
+            "channels": info.channels,
+            "framerate": info.rate
+        }
 
     def play_audio_loop(self, loop_index):
         try:
             audio_info = self.read_audio_data(loop_index)
             stream = self.open_audio_stream(audio_info)
             self.play_audio_stream(loop_index, audio_info["data"], stream)
-        except wave.Error as wave_error:
+        except (wave.Error, ValueError) as wave_error:
             print(f"Wave error in playback loop: {wave_error}")
         except IOError as io_error:
             print(f"I/O error in playback loop: {io_error}")
@@ -73,10 +77,10 @@ class AudioLooper:
 
                 if end_index >= audio_length:
                     end_index = audio_length
-                    stream.write(audio_data[start_index:end_index])
+                    stream.write(audio_data[start_index:end_index].tobytes())
                     start_index = 0
                 else:
-                    stream.write(audio_data[start_index:end_index])
+                    stream.write(audio_data[start_index:end_index].tobytes())
                     start_index = end_index
         finally:
             stream.stop_stream()
@@ -1,162 +1,125 @@
 import tkinter as tk
 import asyncio
-import contextlib
-import wave
 import numpy as np
 from audio_handler import AsyncAudioHandler
-from audio_processor import AudioProcessor
+from instrumentation import metrics
+from looper_engine import LoopEntry, LooperEngine
+from waveform_peaks import ensure_peaks
 import pathlib
 import logging
 import os
-from typing import List, Dict, Any
+import time
+from typing import Callable, List
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class AudioLooperGUI:
-    def __init__(self, output_dir: pathlib.Path, root: tk.Tk, audio_handler: AsyncAudioHandler):
-        self.output_dir = output_dir
-        self.app = root
-        self.audio_handler = audio_handler
-        self.is_recording = asyncio.Event()
-        self.loops: List[Dict[str, Any]] = []
-        self.recording_count = 0
-        self.playback_task = None
-        self.shutdown_event = asyncio.Event()
+WAVEFORM_WIDTH = 160
+WAVEFORM_HEIGHT = 18
+
+class LoopRow(LoopEntry):
+    """A loop with its row of widgets."""
+
+    __slots__ = ("toggle_btn", "waveform")
+
+    def __init__(self, filename: pathlib.Path, toggle_btn: tk.Button, waveform: tk.Canvas, mixer_index: int):
+        super().__init__(filename, mixer_index)
+        self.toggle_btn = toggle_btn
+        self.waveform = waveform
+
+
+def _envelope(x: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> List[float]:
+    """Canvas polygon coordinates running along `upper` and back along `lower`, full scale filling the height."""
+    scale = WAVEFORM_HEIGHT / 65536
+    xs = np.concatenate((x, x[::-1]))
+    ys = WAVEFORM_HEIGHT / 2 - np.concatenate((upper, lower[::-1])).astype(np.float64) * scale
+    return np.column_stack((xs, ys)).ravel().tolist()
 
+
+class AudioLooperGUI(LooperEngine):
+    """The Tk front end of LooperEngine."""
+
+    def __init__(self, output_dir: pathlib.Path, root: tk.Tk, audio_handler: AsyncAudioHandler, mix_workers: int = 0,
+                 ui=None):
+        # Widgets are only touched through `ui`, which may run them on another thread (see TkAsyncBridge)
+        super().__init__(output_dir, audio_handler, mix_workers, ui)
+        self.app = root
+        self.waveform_task = None
         self._setup_ui()
 
     def _setup_ui(self):
-        self.app.bind("<space>", lambda event: asyncio.create_task(self.toggle_recording()))
-        self.record_btn = tk.Button(self.app, text="Record", command=lambda: asyncio.create_task(self.toggle_recording()))
+        self.app.bind("<space>", lambda event: self._on_input(self.toggle_recording))
+        self.record_btn = tk.Button(self.app, text="Record", command=lambda: self._on_input(self.toggle_recording))
         self.record_btn.pack()
+        self.calibrate_btn = tk.Button(self.app, text="Calibrate Latency",
+                                       command=lambda: self._on_input(self.calibrate_latency))
+        self.calibrate_btn.pack()
 
-    async def run_async(self):
-        self.playback_task = asyncio.create_task(self.continuous_playback())
-        try:
-            await self.shutdown_event.wait()
-        finally:
-            await self.cleanup()
-
-    async def cleanup(self):
-        logger.info("Cleaning up...")
-        await self._cancel_all_tasks()
-        logger.info("Cleanup complete")
+    def _on_input(self, action: Callable, *args):
+        """Tk callback: hand a user action to the asyncio side, timing how long it takes to start."""
+        pressed = time.perf_counter_ns()
 
-    async def _cancel_all_tasks(self):
-        for loop in self.loops:
-            loop["is_playing"].clear()
-            if loop["playback_task"] and not loop["playback_task"].done():
-                loop["playback_task"].cancel()
+        async def act():
+            metrics.record("input_latency", time.perf_counter_ns() - pressed)
+            await action(*args)
 
-        if self.playback_task and not self.playback_task.done():
-            self.playback_task.cancel()
+        self.ui.submit(act())
 
-        await asyncio.sleep(0.5)
+    def _show_recording(self, recording: bool):
+        self.record_btn.config(text="Stop Recording" if recording else "Record")
 
-        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
-        for task in tasks:
-            task.cancel()
+    def _show_playing(self, loop: LoopRow, playing: bool):
+        loop.toggle_btn.config(text="On" if playing else "Off")
 
-    async def continuous_playback(self):
-        try:
-            while not self.shutdown_event.is_set():
-                mixed_audio = await self._mix_active_loops()
-                if mixed_audio is not None:
-                    await self.audio_handler.write_chunk(mixed_audio.tobytes())
-                else:
-                    await asyncio.sleep(0.01)
-        except asyncio.CancelledError:
-            logger.info("Playback task cancelled")
-        except Exception as e:
-            logger.error(f"Error in continuous playback: {e}")
-
-    async def _mix_active_loops(self) -> np.ndarray | None:
-        active_loops = [loop for loop in self.loops if loop["is_playing"].is_set()]
-        if not active_loops:
-            return None
-
-        chunks = []
-        for loop in active_loops:
-            try:
-                chunk = loop["audio_queue"].get_nowait()
-                chunks.append(np.frombuffer(chunk, dtype=np.int16))
-            except asyncio.QueueEmpty:
-                # If a queue is empty, use a silent chunk instead
-                chunks.append(np.zeros(self.audio_handler.chunk_size, dtype=np.int16))
-
-        if not chunks:
-            return None
-
-        mixed_audio = np.sum(chunks, axis=0, dtype=np.int32)
-        return self._normalize_audio(mixed_audio)
-
-    @staticmethod
-    def _normalize_audio(audio: np.ndarray) -> np.ndarray:
-        abs_max = np.abs(audio).max()
-        if abs_max > 32767:
-            return (audio * 32767 / abs_max).astype(np.int16)
-        return audio.astype(np.int16)
-
-    async def toggle_recording(self):
-        if self.is_recording.is_set():
-            await self.stop_recording()
+    def _show_calibrating(self, calibrating: bool):
+        if calibrating:
+            self.calibrate_btn.config(text="Calibrating...", state=tk.DISABLED)
         else:
-            await self.start_recording()
+            self.calibrate_btn.config(text="Calibrate Latency", state=tk.NORMAL)
+
+    async def restore_session(self):
+        await super().restore_session()
+        self.waveform_task = asyncio.create_task(self._show_waveforms(self.loops[:]))
 
-    async def start_recording(self):
-        await self.audio_handler.open_input_stream()
-        self.is_recording.set()
-        self.record_btn.config(text="Stop Recording")
-        asyncio.create_task(self.record_audio())
+    async def _loop_loaded(self, loop: LoopRow, audio_data: np.ndarray):
+        # New takes get their peak sidecar here, once
+        await self.show_waveform(loop, audio_data)
 
-    async def stop_recording(self):
-        self.is_recording.clear()
-        self.record_btn.config(text="Record")
+    async def _show_waveforms(self, loops: List[LoopRow]):
+        for loop in loops:
+            await self.show_waveform(loop)
 
-    async def record_audio(self):
-        frames = []
+    async def show_waveform(self, loop: LoopRow, audio_data: np.ndarray | None = None):
+        """Draw a take from its peak pyramid, which is read from the sidecar or built from the take."""
         try:
-            async for chunk in self._read_audio_chunks():
-                frames.append(chunk)
-            
-            filename = await self.save_recording(frames)
-            await self.create_loop_box(filename, autoplay=True)
-        except Exception as e:
-            logger.error(f"Error in recording audio: {e}")
-
-    async def _read_audio_chunks(self):
-        while self.is_recording.is_set():
-            yield await self.audio_handler.read_chunk()
-
-    async def save_recording(self, frames: List[bytes]) -> pathlib.Path:
-        audio_data = AudioProcessor.trim_initial_silence(frames)
-        filename = self.output_dir / f"output_{self.recording_count}.wav"
-        self.recording_count += 1
-        await asyncio.to_thread(self._save_wav, filename, audio_data)
-        return filename
-
-    def _save_wav(self, filename: pathlib.Path, audio_data: np.ndarray):
-        with wave.open(str(filename), "wb") as wf:
-            wf.setnchannels(self.audio_handler.channels)
-            wf.setsampwidth(self.audio_handler.p.get_sample_size(self.audio_handler.format))
-            wf.setframerate(self.audio_handler.rate)
-            wf.writeframes(audio_data.tobytes())
-
-    async def create_loop_box(self, filename: pathlib.Path, autoplay: bool = False):
+            peaks = await asyncio.to_thread(ensure_peaks, loop.filename, audio_data, self._load_wav)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No waveform for {loop.filename}: {e}")
+            return
+        columns = peaks.columns(WAVEFORM_WIDTH)
+        if not len(columns.maxs):
+            return
+        x = np.arange(len(columns.maxs))
+        self.ui.call(self._draw_waveform, loop.waveform, _envelope(x, columns.mins, columns.maxs),
+                     _envelope(x, -columns.rms, columns.rms))
+
+    def _draw_waveform(self, canvas: tk.Canvas, peak_points: List[float], rms_points: List[float]):
+        canvas.delete("all")
+        canvas.create_polygon(peak_points, fill="#9ab", outline="")
+        canvas.create_polygon(rms_points, fill="#357", outline="")
+
+    def _add_loop_entry(self, filename: pathlib.Path, mixer_index: int, playing: bool) -> LoopRow:
         loop_index = len(self.loops)
         frame = self._create_loop_frame(loop_index)
-        toggle_btn = self._create_toggle_button(frame, loop_index, autoplay)
-        
-        audio_data = await self.load_audio(filename)
-        loop_info = self._create_loop_info(filename, toggle_btn, audio_data)
-        self.loops.append(loop_info)
-
-        if autoplay:
-            await self.start_loop(loop_info)
+        waveform = tk.Canvas(frame, width=WAVEFORM_WIDTH, height=WAVEFORM_HEIGHT, highlightthickness=0)
+        waveform.pack(side=tk.LEFT, padx=4)
+        toggle_btn = self._create_toggle_button(frame, loop_index, playing)
+        loop = LoopRow(filename, toggle_btn, waveform, mixer_index)
+        self.loops.append(loop)
+        return loop
 
     def _create_loop_frame(self, loop_index: int) -> tk.Frame:
-        frame = tk.Frame(self.app, width=200, height=20, relief=tk.RIDGE, borderwidth=1)
+        frame = tk.Frame(self.app, width=200 + WAVEFORM_WIDTH, height=20, relief=tk.RIDGE, borderwidth=1)
         frame.pack(fill=tk.X, pady=2)
         frame.pack_propagate(False)
         tk.Label(frame, text=f"Recording {loop_index + 1}").pack(side=tk.LEFT)
@@ -166,85 +129,16 @@ class AudioLooperGUI:
         toggle_btn = tk.Button(
             frame,
             text="On" if autoplay else "Off",
-            command=lambda idx=loop_index: asyncio.create_task(self.toggle_loop(idx))
+            command=lambda idx=loop_index: self._on_input(self.toggle_loop, idx)
         )
         toggle_btn.pack(side=tk.RIGHT)
         return toggle_btn
 
-    def _create_loop_info(self, filename: pathlib.Path, toggle_btn: tk.Button, audio_data: np.ndarray) -> Dict[str, Any]:
-        return {
-            "filename": filename,
-            "is_playing": asyncio.Event(),
-            "toggle_btn": toggle_btn,
-            "audio_data": audio_data,
-            "audio_queue": asyncio.Queue(maxsize=10),
-            "playback_task": None
-        }
-
-    async def toggle_loop(self, loop_index: int):
-        loop = self.loops[loop_index]
-        if loop["is_playing"].is_set():
-            await self.stop_loop(loop)
-        else:
-            await self.start_loop(loop)
-
-    async def start_loop(self, loop: Dict[str, Any]):
-        loop["is_playing"].set()
-        loop["toggle_btn"].config(text="On")
-        loop["playback_task"] = asyncio.create_task(self.fill_audio_queue(loop))
-
-    async def stop_loop(self, loop: Dict[str, Any]):
-        loop["is_playing"].clear()
-        loop["toggle_btn"].config(text="Off")
-        if loop["playback_task"]:
-            loop["playback_task"].cancel()
-        loop["audio_queue"] = asyncio.Queue(maxsize=10)
-
-    async def fill_audio_queue(self, loop: Dict[str, Any]):
-        try:
-            audio_data = loop["audio_data"]
-            chunk_size = self.audio_handler.chunk_size
-            
-            # Convert all data to bytes at once
-            byte_data = audio_data.tobytes()
-            
-            # Calculate total number of chunks
-            total_chunks = len(byte_data) // (chunk_size * 2)
-            
-            chunk_index = 0
-            while loop["is_playing"].is_set() and not self.shutdown_event.is_set():
-                # Get the next chunk
-                start = chunk_index * chunk_size * 2
-                end = start + chunk_size * 2
-                chunk = byte_data[start:end]
-                
-                # Try to add the chunk to the queue
-                try:
-                    await asyncio.wait_for(loop["audio_queue"].put(chunk), timeout=0.1)
-                except asyncio.TimeoutError:
-                    await asyncio.sleep(0.01)  # Short sleep if queue is full
-                    continue
-                
-                # Move to the next chunk, wrapping around if necessary
-                chunk_index = (chunk_index + 1) % total_chunks
-                
-                # Allow other coroutines to run
-                await asyncio.sleep(0)
-
-        except asyncio.CancelledError:
-            logger.info("Playback task for loop cancelled")
-        except Exception as e:
-            logger.error(f"Error in fill_audio_queue: {e}")
-
-    async def load_audio(self, filename: pathlib.Path) -> np.ndarray:
-        return await asyncio.to_thread(self._load_wav, filename)
-
-    def _load_wav(self, filename: pathlib.Path) -> np.ndarray:
-        with wave.open(str(filename), "rb") as wf:
-            return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
-
     def on_closing(self):
         logger.info("Closing application...")
+        self.ui.submit(self._request_shutdown())
+        # Whoever runs the GUI quits Tk once cleanup is done; this only catches a hung shutdown
+        self.app.after(5000, lambda: os._exit(0))
+
+    async def _request_shutdown(self):
         self.shutdown_event.set()
-        self.app.quit()
-        self.app.after(1000, lambda: os._exit(0))
\ No newline at end of file
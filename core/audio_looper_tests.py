@@ -3,6 +3,8 @@ import wave
 import pytest
 from unittest.mock import patch
 from audio_looper import AudioLooper  # Replace with the actual module name
+from audio_cache import audio_cache
+from wav_io import WavInfo
 
 # Path to the output directory for testing
 output_dir = pathlib.Path("/tmp/test_recordings")
@@ -15,45 +17,51 @@ def test_read_audio_data_caching(mocker):
     Test the caching behavior of the read_audio_data function.
     
     This test ensures that:
-    1. The wave.open function is called on the first invocation of read_audio_data.
-    2. Subsequent calls with the same loop_index use the cached result and do not call wave.open again.
-    3. Calls with a different loop_index result in another call to wave.open.
-    4. The cache correctly returns the cached data for previously accessed loop_indices without additional calls to wave.open.
+    1. The memmap_wav function is called on the first invocation of read_audio_data.
+    2. Subsequent calls with the same loop_index use the cached result and do not call memmap_wav again.
+    3. Calls with a different loop_index result in another call to memmap_wav.
+    4. The cache correctly returns the cached data for previously accessed loop_indices without additional calls to memmap_wav.
     """
     loop_index = 0
-    
-    # Mock wave.open to track calls and simulate reading a file
-    mock_wave_open = mocker.patch("wave.open", autospec=True)
-    mock_wave_open.return_value.__enter__.return_value.readframes.return_value = b"dummy_data"
-    mock_wave_open.return_value.__enter__.return_value.getsampwidth.return_value = 2
-    mock_wave_open.return_value.__enter__.return_value.getnchannels.return_value = 1
-    mock_wave_open.return_value.__enter__.return_value.getframerate.return_value = 44100
-
-    # First call to read_audio_data should call wave.open
+    audio_cache.clear()
+
+    # The cache keys on each file's mtime and size, so the files have to exist
+    for index in (0, 1):
+        with wave.open(str(output_dir / f"output_{index + 1}.wav"), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(44100)
+            wf.writeframes(b"\x00\x00" * 5)
+
+    # Mock memmap_wav to track calls and simulate mapping a file
+    mock_memmap_wav = mocker.patch("audio_looper.memmap_wav", autospec=True)
+    mock_memmap_wav.return_value = (b"dummy_data", WavInfo(channels=1, sample_width=2, rate=44100, data_offset=44, frames=5))
+
+    # First call to read_audio_data should call memmap_wav
     audio_info1 = audio_looper.read_audio_data(loop_index)
     assert audio_info1["data"] == b"dummy_data"
     assert audio_info1["sampwidth"] == 2
     assert audio_info1["channels"] == 1
     assert audio_info1["framerate"] == 44100
-    mock_wave_open.assert_called_once()
+    mock_memmap_wav.assert_called_once()
 
     # Second call to read_audio_data with the same loop_index should use the cache
     audio_info2 = audio_looper.read_audio_data(loop_index)
     assert audio_info2 == audio_info1
-    mock_wave_open.assert_called_once()  # wave.open should not be called here
+    mock_memmap_wav.assert_called_once()  # memmap_wav should not be called here
 
-    # Call with a different loop_index should call wave.open again
+    # Call with a different loop_index should call memmap_wav again
     audio_info3 = audio_looper.read_audio_data(1)
     assert audio_info3["data"] == b"dummy_data"
     assert audio_info3["sampwidth"] == 2
     assert audio_info3["channels"] == 1
     assert audio_info3["framerate"] == 44100
-    assert mock_wave_open.call_count == 2  # wave.open should be called twice now
+    assert mock_memmap_wav.call_count == 2  # memmap_wav should be called twice now
 
     # Additional call to the first loop_index to confirm cache usage
     audio_info4 = audio_looper.read_audio_data(loop_index)
     assert audio_info4 == audio_info1
-    assert mock_wave_open.call_count == 2  # wave.open should still be called only twice
+    assert mock_memmap_wav.call_count == 2  # memmap_wav should still be called only twice
 
 if __name__ == "__main__":
     pytest.main()
@@ -1,34 +1,37 @@
 import wave
 import threading
 from typing import Dict, Any
-from functools import lru_cache
 import numpy as np
 import pyaudio
 from audio_handler import AsyncAudioHandler, CHUNK_SIZE
+from audio_cache import audio_cache
+from wav_io import memmap_wav
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _load_audio_info(filename: str) -> Dict[str, Any]:
+    audio_data, info = memmap_wav(filename)
+    return {
+        "data": audio_data,
+        "sampwidth": info.sample_width,
+        "channels": info.channels,
+        "framerate": info.rate
+    }
+
 class AudioPlayer:
     def __init__(self):
         self.stop_all_playback = threading.Event()
 
-    @lru_cache(maxsize=32)
     def read_audio_data(self, filename: str) -> Dict[str, Any]:
-        with wave.open(filename, "rb") as wf:
-            return {
-                "data": np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16),
-                "sampwidth": wf.getsampwidth(),
-                "channels": wf.getnchannels(),
-                "framerate": wf.getframerate()
-            }
+        return audio_cache.get(filename, _load_audio_info)
 
     def play_audio_loop(self, filename: str, audio_handler: AsyncAudioHandler, is_playing: threading.Event):
         try:
             audio_info = self.read_audio_data(filename)
             stream = audio_handler.open_output_stream(audio_info)
             self._play_audio_stream(audio_info["data"], stream, is_playing)
-        except wave.Error as wave_error:
+        except (wave.Error, ValueError) as wave_error:
             logger.error(f"Wave error in playback loop: {wave_error}")
         except IOError as io_error:
             logger.error(f"I/O error in playback loop: {io_error}")
@@ -1,9 +1,10 @@
 import numpy as np
-from typing import List, Iterator
+from typing import List, Iterator, Optional
 
 class AudioProcessor:
     CHUNK_SIZE = 1024
     SILENCE_THRESHOLD = 1000
+    ZERO_CROSSING_WINDOW = 256
 
     @staticmethod
     def trim_initial_silence(frames: List[bytes]) -> Iterator[bytes]:
@@ -17,16 +18,10 @@ class AudioProcessor:
         # Convert frames to a single NumPy array directly
         audio_data = np.frombuffer(b"".join(frames), dtype=np.int16)
 
-        # Find the start index where the audio exceeds the silence threshold
-        abs_audio_data = np.abs(audio_data)
-        above_threshold_indices = np.where(abs_audio_data > AudioProcessor.SILENCE_THRESHOLD)[0]
-
-        # If there are no indices above the threshold, use the length of audio_data
-        start_index = (
-            above_threshold_indices[0]
-            if len(above_threshold_indices) > 0
-            else len(audio_data)
-        )
+        # Find the start index where the audio exceeds the silence threshold,
+        # or use the length of audio_data if it never does
+        onset = AudioProcessor.find_onset(audio_data)
+        start_index = onset if onset is not None else len(audio_data)
 
         # Adjust start_index to the nearest zero-crossing
         start_index = AudioProcessor.find_nearest_zero_crossing(audio_data, start_index)
@@ -42,17 +37,65 @@ class AudioProcessor:
 
         return trimmed_audio_data
 
-
+    @staticmethod
+    def find_onset(audio_data: np.ndarray) -> Optional[int]:
+        """Index of the first sample above the silence threshold, scanning chunk by chunk."""
+        detector = OnsetDetector()
+        for i in range(0, len(audio_data), AudioProcessor.CHUNK_SIZE):
+            onset = detector.process(audio_data[i:i + AudioProcessor.CHUNK_SIZE])
+            if onset is not None:
+                return i + onset
+        return None
 
     @staticmethod
     def find_nearest_zero_crossing(audio_data: np.ndarray, start_index: int) -> int:
-        """Find the nearest zero crossing for smooth audio transitions."""
-        zero_crossings = np.where(np.diff(np.sign(audio_data)))[0]
-        if len(zero_crossings) == 0:
-            return start_index
-        return zero_crossings[np.argmin(np.abs(zero_crossings - start_index))]
+        """
+        Find the nearest zero crossing for smooth audio transitions.
+
+        Only a window around start_index is searched, and the window doubles until
+        a crossing turns up. Any crossing outside the window is further away than
+        any crossing inside it, so the answer is the same as a full scan but costs
+        O(distance to the crossing) instead of O(len(audio_data)).
+        """
+        window = AudioProcessor.ZERO_CROSSING_WINDOW
+        while True:
+            low = max(0, start_index - window)
+            high = min(len(audio_data), start_index + window + 2)
+            zero_crossings = low + np.flatnonzero(np.diff(np.sign(audio_data[low:high])))
+            if len(zero_crossings):
+                return zero_crossings[np.argmin(np.abs(zero_crossings - start_index))]
+            if low == 0 and high == len(audio_data):
+                return start_index
+            window *= 2
 
     @staticmethod
     def split_into_chunks(audio_data: np.ndarray) -> List[bytes]:
         return [audio_data[i:i+AudioProcessor.CHUNK_SIZE].tobytes() 
-                for i in range(0, len(audio_data), AudioProcessor.CHUNK_SIZE)]
\ No newline at end of file
+                for i in range(0, len(audio_data), AudioProcessor.CHUNK_SIZE)]
+
+
+class OnsetDetector:
+    """
+    Finds the first sample above the silence threshold while a take streams in.
+
+    Feed it chunks in order; once the onset has been found it stops looking at
+    the audio altogether.
+    """
+
+    def __init__(self, threshold: int = AudioProcessor.SILENCE_THRESHOLD):
+        self.threshold = threshold
+        self.samples_seen = 0
+        self.onset: Optional[int] = None
+
+    def process(self, samples: np.ndarray) -> Optional[int]:
+        """Return the onset's index within `samples` if this chunk contains it."""
+        if self.onset is not None:
+            return None
+        # Not np.abs: it wraps -32768 back to itself in int16
+        above_threshold = np.flatnonzero((samples > self.threshold) | (samples < -self.threshold))
+        if not len(above_threshold):
+            self.samples_seen += len(samples)
+            return None
+        self.onset = self.samples_seen + int(above_threshold[0])
+        self.samples_seen += len(samples)
+        return int(above_threshold[0])
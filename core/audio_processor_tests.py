@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from audio_processor import AudioProcessor, OnsetDetector
+
+THRESHOLD = AudioProcessor.SILENCE_THRESHOLD
+WINDOW = AudioProcessor.ZERO_CROSSING_WINDOW
+
+
+def _full_scan_onset(audio: np.ndarray):
+    above = np.flatnonzero(np.abs(audio.astype(np.int32)) > THRESHOLD)
+    return int(above[0]) if len(above) else None
+
+
+def _full_scan_zero_crossing(audio: np.ndarray, start_index: int) -> int:
+    zero_crossings = np.where(np.diff(np.sign(audio)))[0]
+    if len(zero_crossings) == 0:
+        return start_index
+    return zero_crossings[np.argmin(np.abs(zero_crossings - start_index))]
+
+
+def _quiet_then_loud(rng, onset: int, length: int) -> np.ndarray:
+    audio = rng.integers(-THRESHOLD, THRESHOLD + 1, length).astype(np.int16)
+    audio[onset:] = rng.integers(-20000, 20000, length - onset)
+    audio[onset] = rng.choice([THRESHOLD + 1, -THRESHOLD - 1, -32768])
+    return audio
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streamed_onset_matches_full_scan_across_chunk_boundaries(seed):
+    rng = np.random.default_rng(seed)
+    length = 8 * AudioProcessor.CHUNK_SIZE
+    # Onsets on, just before and just after chunk boundaries, plus anywhere
+    onset = int(rng.choice([1023, 1024, 1025, 2047, 4096, int(rng.integers(0, length))]))
+    audio = _quiet_then_loud(rng, onset, length)
+    assert _full_scan_onset(audio) == onset
+
+    assert AudioProcessor.find_onset(audio) == onset
+    detector = OnsetDetector()
+    cuts = np.sort(rng.integers(0, length, 12))
+    found = [(start, detector.process(chunk)) for start, chunk in zip(np.r_[0, cuts], np.split(audio, cuts))]
+    hits = [start + index for start, index in found if index is not None]
+    assert hits == [onset] and detector.onset == onset
+
+
+def test_silence_has_no_onset():
+    audio = np.full(3000, THRESHOLD, dtype=np.int16)
+    assert AudioProcessor.find_onset(audio) is None
+    detector = OnsetDetector()
+    assert detector.process(audio) is None and detector.samples_seen == 3000
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_windowed_zero_crossing_matches_full_scan(seed):
+    rng = np.random.default_rng(seed)
+    # Runs of one sign, so crossings are sparse and often beyond the first window
+    runs = rng.integers(1, 3 * WINDOW, 40)
+    signs = np.repeat(np.resize([1, -1], len(runs)), runs)
+    audio = (signs * rng.integers(1, 5000, len(signs))).astype(np.int16)
+    audio[rng.integers(0, len(audio), 5)] = 0
+    crossings = np.flatnonzero(np.diff(np.sign(audio)))
+    # Targets right at and either side of the window edge around a crossing, plus random ones
+    targets = [int(c) + offset for c in crossings[:6] for offset in (-WINDOW - 1, -WINDOW, WINDOW, WINDOW + 1, 2 * WINDOW)]
+    targets += [0, len(audio) - 1, len(audio)] + rng.integers(0, len(audio), 20).tolist()
+    for target in targets:
+        target = min(max(target, 0), len(audio))
+        assert AudioProcessor.find_nearest_zero_crossing(audio, target) == _full_scan_zero_crossing(audio, target)
+
+
+def test_zero_crossing_tie_and_no_crossing_match_full_scan():
+    # Crossings at 99 and 199 are equally far from 149; both scans pick the earlier one
+    audio = np.r_[np.ones(100), -np.ones(100), np.ones(100)].astype(np.int16)
+    assert AudioProcessor.find_nearest_zero_crossing(audio, 149) == _full_scan_zero_crossing(audio, 149) == 99
+    flat = np.ones(5000, dtype=np.int16)
+    assert AudioProcessor.find_nearest_zero_crossing(flat, 1234) == 1234
+    assert AudioProcessor.find_nearest_zero_crossing(np.zeros(0, dtype=np.int16), -1) == -1
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,10 +1,8 @@
 import pathlib
-import wave
 import threading
-from typing import List
 import logging
-from audio_handler import AsyncAudioHandler, AUDIO_FORMAT, CHANNELS, RATE, CHUNK_SIZE
-from audio_processor import AudioProcessor
+from audio_handler import AsyncAudioHandler, CHANNELS, RATE, CHUNK_SIZE, SAMPLE_WIDTH
+from take_writer import TakeWriter
 
 logger = logging.getLogger(__name__)
 
@@ -16,30 +14,23 @@ class AudioRecorder:
 
     def record_audio(self, audio_handler: AsyncAudioHandler) -> str:
         stream = audio_handler.open_input_stream()
-        frames: List[bytes] = []
+        output_filename = self.output_dir / f"output_{self.recording_count + 1}.wav"
+        # Chunks go straight to disk, so memory use does not grow with the take
+        writer = TakeWriter(output_filename, CHANNELS, SAMPLE_WIDTH, RATE)
         try:
             logger.info("Recording started")
             self.is_recording.set()
             while self.is_recording.is_set():
                 try:
-                    frames.append(stream.read(CHUNK_SIZE))
+                    writer.write(stream.read(CHUNK_SIZE))
                 except OSError as e:
                     logger.error(f"Error reading from stream: {e}")
                     break
             logger.info("Recording finished")
         finally:
             stream.close()
+            writer.close()
             self.is_recording.clear()
 
-        output_filename = self.output_dir / f"output_{self.recording_count + 1}.wav"
-        self._save_recording_to_wav(output_filename, frames, audio_handler)
         self.recording_count += 1
         return str(output_filename)
-
-    def _save_recording_to_wav(self, file_path: pathlib.Path, frames: List[bytes], audio_handler: AsyncAudioHandler):
-        trimmed_frames = AudioProcessor.trim_initial_silence(frames)
-        with wave.open(str(file_path), "wb") as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(audio_handler.p.get_sample_size(AUDIO_FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b"".join(trimmed_frames))
\ No newline at end of file
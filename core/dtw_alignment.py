@@ -0,0 +1,212 @@
+"""
+Aligns a target take to a reference take and renders the warped target, e.g.:
+
+    python dtw_alignment.py reference_tempo.wav off_tempo_guitar.wav aligned_guitar.wav
+"""
+import argparse
+import pathlib
+import wave
+import logging
+from typing import Tuple
+import numpy as np
+from time_stretch import StreamingTimeStretcher
+from wav_io import memmap_wav
+
+logger = logging.getLogger(__name__)
+
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+FEATURE_BANDS = 40
+BAND_SECONDS = 5.0
+SEGMENT_FRAMES = 32
+FEATURE_CHUNK_FRAMES = 1024
+MIN_RATE, MAX_RATE = 0.25, 4.0
+
+DIAGONAL, VERTICAL, HORIZONTAL = 0, 1, 2
+
+
+def extract_features(audio: np.ndarray, frame_size: int = FRAME_SIZE, hop: int = HOP_SIZE,
+                     bands: int = FEATURE_BANDS) -> np.ndarray:
+    """
+    Unit-length log band energies, one row per hop.
+
+    Spectra are pooled into log-spaced bands so the features follow the notes
+    and not the exact waveform. Frames are computed a chunk at a time, so a
+    memory-mapped take is never converted to float all at once.
+    """
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    frames = max(1, 1 + (len(audio) - frame_size) // hop)
+    window = np.hanning(frame_size).astype(np.float32)
+    edges = np.unique(np.geomspace(1, frame_size // 2 + 1, bands + 1).astype(int))
+    features = np.empty((frames, len(edges) - 1), dtype=np.float32)
+
+    for first in range(0, frames, FEATURE_CHUNK_FRAMES):
+        last = min(frames, first + FEATURE_CHUNK_FRAMES)
+        chunk = np.asarray(audio[first * hop:(last - 1) * hop + frame_size], dtype=np.float32)
+        if len(chunk) < frame_size:
+            chunk = np.pad(chunk, (0, frame_size - len(chunk)))
+        framed = np.lib.stride_tricks.sliding_window_view(chunk, frame_size)[::hop][:last - first]
+        power = np.abs(np.fft.rfft(framed * window, axis=1)) ** 2
+        banded = np.add.reduceat(power, edges[:-1], axis=1)
+        features[first:last] = np.log1p(banded)
+
+    features -= features.mean(axis=1, keepdims=True)
+    features /= np.linalg.norm(features, axis=1, keepdims=True) + 1e-9
+    return features
+
+
+def banded_dtw(reference: np.ndarray, target: np.ndarray, band: int) -> Tuple[np.ndarray, float]:
+    """
+    DTW between two feature sequences, constrained to a Sakoe-Chiba band.
+
+    Only cells within `band` frames of the diagonal (scaled to the two lengths)
+    are evaluated. Accumulated cost is kept one row at a time and each cell's
+    step direction is stored as an int8, so memory is O(n * band) rather than
+    the O(n * m) float matrix of full DTW. Within a row, horizontal steps
+    depend on the cell to their left. Writing c for the row's local costs, S
+    for their running sum and A for the best diagonal or vertical
+    predecessor, D[j] = S[j] + min over k <= j of (A[k] + c[k] - S[k]), so a
+    whole row is one minimum.accumulate.
+
+    Returns the warping path as (reference_frame, target_frame) pairs from
+    (0, 0) to the last frame of each, and the path's total cost.
+    """
+    n, m = len(reference), len(target)
+    # Consecutive rows' windows have to overlap for a path to exist
+    band = max(band, -(-m // n) + 1)
+    width = 2 * band + 1
+    centers = np.rint(np.arange(n) * ((m - 1) / max(n - 1, 1))).astype(np.int64)
+    starts = np.clip(centers - band, 0, max(m - width, 0))
+    steps = np.empty((n, width), dtype=np.int8)
+    inf = np.inf
+
+    previous = np.full(width + 1, inf)
+    previous_start = starts[0]
+    for i in range(n):
+        start = starts[i]
+        columns = start + np.arange(width)
+        valid = columns < m
+        cost = np.full(width, inf)
+        cost[valid] = 1.0 - target[columns[valid]] @ reference[i]
+
+        if i == 0:
+            best = np.full(width, inf)
+            best[0] = 0.0
+            came_from = np.full(width, DIAGONAL, dtype=np.int8)
+        else:
+            # previous[] holds the last row at columns previous_start + k, padded with one inf
+            shift = start - previous_start
+            up = previous[np.minimum(np.arange(width) + shift, width)]
+            diagonal_index = np.arange(width) + shift - 1
+            diagonal = np.where(diagonal_index >= 0, previous[np.clip(diagonal_index, 0, width)], inf)
+            came_from = np.where(diagonal <= up, DIAGONAL, VERTICAL).astype(np.int8)
+            best = np.minimum(diagonal, up)
+
+        anchored = best + cost
+        finite = np.where(valid, cost, 0.0)
+        running = np.cumsum(finite)
+        offsets = anchored - running
+        best_offsets = np.minimum.accumulate(offsets)
+        came_from[best_offsets < offsets] = HORIZONTAL
+        row = running + best_offsets
+        row[~valid] = inf
+
+        steps[i] = came_from
+        previous[:width] = row
+        previous_start = start
+
+    total = float(previous[m - 1 - previous_start])
+    return _backtrack(steps, starts, n, m), total
+
+
+def _backtrack(steps: np.ndarray, starts: np.ndarray, n: int, m: int) -> np.ndarray:
+    path = []
+    i, j = n - 1, m - 1
+    while True:
+        path.append((i, j))
+        if i == 0 and j == 0:
+            break
+        step = steps[i, j - starts[i]]
+        if step == HORIZONTAL or i == 0:
+            j -= 1
+        elif step == VERTICAL or j == 0:
+            i -= 1
+        else:
+            i, j = i - 1, j - 1
+    return np.array(path[::-1], dtype=np.int64)
+
+
+def local_rates(path: np.ndarray, segment_frames: int = SEGMENT_FRAMES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split the path into stretches of `segment_frames` reference frames.
+
+    Returns the target frame at which each stretch begins, and the stretch rate
+    that maps that part of the target onto the reference.
+    """
+    reference_frames = path[-1, 0] + 1
+    boundaries = np.arange(0, reference_frames + segment_frames, segment_frames)
+    boundaries[-1] = reference_frames
+    boundaries = np.unique(boundaries)
+    # First target frame aligned with each boundary
+    target_at = path[np.searchsorted(path[:, 0], boundaries[:-1]), 1]
+    target_at = np.append(target_at, path[-1, 1] + 1)
+    rates = np.diff(target_at) / np.diff(boundaries)
+    return target_at[:-1], np.clip(rates, MIN_RATE, MAX_RATE)
+
+
+def render_aligned(target_audio: np.ndarray, channels: int, path: np.ndarray, output_path: pathlib.Path,
+                   rate: int, hop: int = HOP_SIZE) -> pathlib.Path:
+    """Stream the target through the time-stretcher, changing its rate along the warping path."""
+    segment_starts, rates = local_rates(path)
+    segment_ends = np.append(segment_starts[1:], path[-1, 1] + 1) * hop
+    segment_ends[-1] = len(target_audio)
+    stretcher = StreamingTimeStretcher(rates[0], channels=channels)
+
+    def write(wf, stretched):
+        wf.writeframes(np.clip(np.rint(stretched), -32768, 32767).astype(np.int16).tobytes())
+
+    with wave.open(str(output_path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        position = 0
+        for end, segment_rate in zip(segment_ends, rates):
+            stretcher.set_rate(segment_rate)
+            write(wf, stretcher.process(target_audio[position:end]))
+            position = end
+        write(wf, stretcher.flush())
+    return output_path
+
+
+def align_files(reference_path: pathlib.Path, target_path: pathlib.Path, output_path: pathlib.Path,
+                band_seconds: float = BAND_SECONDS) -> pathlib.Path:
+    """Warp the 16-bit WAV at `target_path` onto the timing of `reference_path`."""
+    reference_audio, reference_info = memmap_wav(reference_path)
+    target_audio, target_info = memmap_wav(target_path)
+    if target_info.sample_width != 2:
+        raise ValueError(f"{target_path} is not 16-bit PCM")
+
+    reference = extract_features(reference_audio)
+    target = extract_features(target_audio)
+    band = max(1, int(band_seconds * target_info.rate / HOP_SIZE))
+    path, cost = banded_dtw(reference, target, band)
+    logger.info(f"Aligned {len(target)} target frames to {len(reference)} reference frames "
+                f"(band {band}, cost {cost:.2f})")
+    return render_aligned(target_audio, target_info.channels, path, output_path, target_info.rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warp a take onto the timing of a reference take")
+    parser.add_argument("reference", type=pathlib.Path)
+    parser.add_argument("target", type=pathlib.Path)
+    parser.add_argument("output", type=pathlib.Path)
+    parser.add_argument("--band", type=float, default=BAND_SECONDS,
+                        help="Seconds either side of the diagonal the alignment may drift")
+    args = parser.parse_args()
+
+    align_files(args.reference, args.target, args.output, args.band)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
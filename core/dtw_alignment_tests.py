@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from dtw_alignment import banded_dtw, local_rates
+
+
+def _unit_rows(rng, rows: int) -> np.ndarray:
+    features = rng.normal(size=(rows, 8))
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def _full_dtw_cost(reference: np.ndarray, target: np.ndarray) -> float:
+    cost = 1 - reference @ target.T
+    total = np.full((len(reference) + 1, len(target) + 1), np.inf)
+    total[0, 0] = 0
+    for i in range(1, len(reference) + 1):
+        for j in range(1, len(target) + 1):
+            total[i, j] = cost[i - 1, j - 1] + min(total[i - 1, j - 1], total[i - 1, j], total[i, j - 1])
+    return total[-1, -1]
+
+
+@pytest.mark.parametrize("n, m", [(30, 40), (50, 20), (1, 5), (5, 1)])
+def test_wide_band_matches_full_dtw(n, m):
+    rng = np.random.default_rng(n * m)
+    reference, target = _unit_rows(rng, n), _unit_rows(rng, m)
+
+    path, cost = banded_dtw(reference, target, band=100)
+
+    assert cost == pytest.approx(_full_dtw_cost(reference, target))
+    assert tuple(path[0]) == (0, 0) and tuple(path[-1]) == (n - 1, m - 1)
+    steps = np.diff(path, axis=0)
+    assert ((steps >= 0) & (steps <= 1)).all() and (steps.sum(axis=1) >= 1).all()
+    assert cost == pytest.approx(sum(1 - reference[i] @ target[j] for i, j in path))
+
+
+def test_narrow_band_recovers_a_tempo_change():
+    rng = np.random.default_rng(0)
+    reference = _unit_rows(rng, 200)
+    # The first half of the target plays twice as slowly, the second half as written
+    target = np.concatenate((np.repeat(reference[:100], 2, axis=0), reference[100:]))
+
+    path, cost = banded_dtw(reference, target, band=120)
+    starts, rates = local_rates(path, segment_frames=20)
+
+    assert cost == pytest.approx(0, abs=1e-6)
+    np.testing.assert_allclose(rates[:5], 2.0)
+    np.testing.assert_allclose(rates[-5:], 1.0)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import pathlib
+import time
+import logging
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bucket i holds durations in [2**(i-1), 2**i) microseconds; the last bucket is open ended
+HISTOGRAM_BUCKETS = 24
+
+
+class StageHistogram:
+    """Log2 latency histogram: a fixed list of counters, so recording never allocates."""
+
+    __slots__ = ("counts", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns: int):
+        bucket = min((duration_ns >> 10).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def percentile_us(self, fraction: float) -> float:
+        """Upper edge of the bucket holding the given fraction of samples."""
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(float(1 << bucket) * 1.024, self.max_ns / 1000)
+        return self.max_ns / 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000 if self.count else 0.0,
+            "p50_us": self.percentile_us(0.5),
+            "p99_us": self.percentile_us(0.99),
+            "max_us": self.max_ns / 1000,
+            "buckets": list(self.counts),
+        }
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: StageHistogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+
+
+class Instrumentation:
+    """
+    Always-on counters for the audio path.
+
+    Per-stage latency histograms, event counters (underruns, overruns) and gauges
+    (queue depths). Gauges can be callables, which are only evaluated when a
+    snapshot is taken, so the hot path never pays for them.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageHistogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, Any] = {}
+        self.started = time.time()
+
+    def stage(self, name: str) -> _StageTimer:
+        """Time a `with` block into the named stage's histogram."""
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = StageHistogram()
+        return _StageTimer(histogram)
+
+    def record(self, name: str, duration_ns: int):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = StageHistogram()
+        histogram.record(duration_ns)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: Any):
+        self.gauges[name] = value
+
+    def register_gauge(self, name: str, read: Callable[[], Any]):
+        self.gauges[name] = read
+
+    async def monitor_event_loop_lag(self, stop_event: asyncio.Event, interval: float = 0.05):
+        """Record how late the event loop wakes us up, as the stage `event_loop_lag`."""
+        interval_ns = int(interval * 1e9)
+        while not stop_event.is_set():
+            start = time.perf_counter_ns()
+            await asyncio.sleep(interval)
+            self.record("event_loop_lag", max(0, time.perf_counter_ns() - start - interval_ns))
+
+    async def monitor_cpu(self, stop_event: asyncio.Event, idle: Callable[[], bool] = lambda: False,
+                          interval: float = 1.0):
+        """
+        Sample this process's CPU use (all threads) into the gauge `cpu_percent`.
+
+        Intervals during which `idle()` held throughout are also averaged into
+        `idle_cpu_percent`, the cost of the app just sitting there.
+        """
+        idle_cpu = idle_wall = 0.0
+        while not stop_event.is_set():
+            was_idle = idle()
+            cpu, wall = time.process_time(), time.perf_counter()
+            await asyncio.sleep(interval)
+            used, elapsed = time.process_time() - cpu, time.perf_counter() - wall
+            self.gauges["cpu_percent"] = 100 * used / elapsed
+            if was_idle and idle():
+                idle_cpu += used
+                idle_wall += elapsed
+                self.gauges["idle_cpu_percent"] = 100 * idle_cpu / idle_wall
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": time.time() - self.started,
+            "stages": {name: histogram.summary() for name, histogram in self.stages.items()},
+            "counters": dict(self.counters),
+            "gauges": {name: value() if callable(value) else value for name, value in self.gauges.items()},
+        }
+
+    def dump(self, filename: pathlib.Path):
+        with open(filename, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        logger.info(f"Audio metrics written to {filename}")
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+        self.started = time.time()
+
+
+class StartupTimer:
+    """
+    Milestones of a cold start, in milliseconds since launch.
+
+    Startup work runs concurrently (window, audio device, session restore), so
+    this records when each piece became ready rather than summing durations.
+    Only the first time a milestone is reached counts.
+    """
+
+    def __init__(self, launched: Optional[float] = None):
+        self.launched = launched if launched is not None else time.perf_counter()
+        self.milestones: Dict[str, float] = {}
+
+    def reset(self, launched: float):
+        self.launched = launched
+        self.milestones.clear()
+
+    def mark(self, name: str):
+        if name in self.milestones:
+            return
+        elapsed_ms = (time.perf_counter() - self.launched) * 1000
+        self.milestones[name] = elapsed_ms
+        logger.info(f"Startup: {name} at {elapsed_ms:.1f} ms")
+
+    def report(self) -> Dict[str, float]:
+        return dict(self.milestones)
+
+
+# Process-wide instances used by the handler, mixer and GUI
+metrics = Instrumentation()
+startup = StartupTimer()
+metrics.register_gauge("startup_ms", startup.report)
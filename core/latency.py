@@ -0,0 +1,161 @@
+"""
+Round-trip latency calibration.
+
+A burst of noise is played on the output and recorded back on the input,
+either through a cable from the output to the input or through a microphone
+near the speakers. The lag of the cross-correlation peak between what was sent
+and what came back is the round-trip latency. It is measured on the output
+timeline and stamped the same way the looper stamps takes, so it also covers
+the output ring, device buffers and driver, and can be taken off every take.
+
+Usage: python latency.py [--repeats N]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+from typing import Dict, NamedTuple, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LATENCY_FILENAME = "latency.json"
+PROBE_FRAMES = 4096
+PROBE_PEAK = 8000
+MAX_LATENCY_SECONDS = 0.5
+# Normalised correlation below this means the burst never made it back to the input
+MIN_CORRELATION = 0.3
+
+
+class LatencyMeasurement(NamedTuple):
+    frames: int  # Median round trip
+    spread: int  # Largest minus smallest of the repeats
+    correlation: float  # Weakest normalised correlation peak of the repeats
+
+
+def make_probe(frames: int = PROBE_FRAMES, seed: int = 0) -> np.ndarray:
+    """White noise with short fades. Unlike a click or a tone, its correlation has one sharp peak even when quiet."""
+    probe = np.random.default_rng(seed).standard_normal(frames) * (PROBE_PEAK / 4)
+    fade = np.linspace(0.0, 1.0, min(64, frames // 2))
+    probe[:len(fade)] *= fade
+    probe[len(probe) - len(fade):] *= fade[::-1]
+    return np.clip(probe, -PROBE_PEAK, PROBE_PEAK).astype(np.int16)
+
+
+def find_lag(recorded: np.ndarray, probe: np.ndarray) -> Tuple[int, float]:
+    """
+    Where `probe` starts in `recorded`, and the normalised correlation there.
+
+    Polarity is ignored, since some interfaces invert their inputs.
+    """
+    if len(recorded) < len(probe):
+        raise ValueError("Recording is shorter than the probe")
+    recorded = recorded.astype(np.float64)
+    probe = probe.astype(np.float64)
+    size = 1 << (len(recorded) + len(probe) - 1).bit_length()
+    spectrum = np.fft.rfft(recorded, size) * np.conj(np.fft.rfft(probe, size))
+    correlation = np.fft.irfft(spectrum, size)[:len(recorded) - len(probe) + 1]
+
+    lag = int(np.argmax(np.abs(correlation)))
+    window = recorded[lag:lag + len(probe)]
+    norm = np.linalg.norm(probe) * np.linalg.norm(window)
+    return lag, float(abs(correlation[lag]) / norm) if norm else 0.0
+
+
+async def measure_round_trip(handler, repeats: int = 3,
+                             max_latency: float = MAX_LATENCY_SECONDS) -> LatencyMeasurement:
+    """
+    Play the probe `repeats` times through `handler` and find each one in its input.
+
+    Nothing else may write to the handler meanwhile. Output and input run in
+    lockstep, a block out and a block in, with the output ring primed so it
+    stays as full as it is during playback. Each recorded block is placed by
+    the handler's `input_time`, the same stamp LooperEngine places takes by.
+    """
+    await handler.open_input_stream()
+    chunk = handler.chunk_size
+    probe = make_probe()
+    silence = bytes(chunk * handler.sample_width * handler.channels)
+    for _ in range(handler.ring_blocks):
+        await handler.write_chunk(silence)
+
+    blocks = -(-(len(probe) + int(max_latency * handler.rate)) // chunk)
+    outgoing = np.zeros(blocks * chunk, dtype=np.int16)
+    outgoing[:len(probe)] = probe
+    latencies, correlations = [], []
+    for _ in range(repeats):
+        sent_at = handler.output_frames
+        input_start = None
+        recorded = []
+        for block in outgoing.reshape(blocks, chunk):
+            await handler.write_chunk(block.tobytes())
+            data = await handler.read_chunk()
+            if input_start is None:
+                input_start = handler.input_time
+            recorded.append(np.frombuffer(data, dtype=np.int16))
+        lag, correlation = find_lag(np.concatenate(recorded), probe)
+        latencies.append(input_start + lag - sent_at)
+        correlations.append(correlation)
+
+    if min(correlations) < MIN_CORRELATION:
+        raise ValueError(f"Probe not found in the input (correlation {min(correlations):.2f}); "
+                         f"connect the output to the input or turn the volume up")
+    return LatencyMeasurement(int(np.median(latencies)), max(latencies) - min(latencies), min(correlations))
+
+
+class LatencyStore:
+    """Measured round-trip latencies, one per device configuration, in a small JSON file."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable latency file {self.path}: {e}")
+
+    def get(self, config: str) -> Optional[int]:
+        """Round-trip latency in frames for `config`, or None if it was never calibrated."""
+        entry = self.entries.get(config)
+        return entry["frames"] if entry else None
+
+    def set(self, config: str, measurement: LatencyMeasurement):
+        self.entries[config] = measurement._asdict()
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+async def calibrate(store_path: pathlib.Path, repeats: int) -> LatencyMeasurement:
+    from audio_handler import AsyncAudioHandler
+    async with AsyncAudioHandler() as handler:
+        measurement = await measure_round_trip(handler, repeats)
+        config = handler.device_config()
+    LatencyStore(store_path).set(config, measurement)
+    print(f"{config}: {measurement.frames} frames ({1000 * measurement.frames / handler.rate:.1f} ms), "
+          f"spread {measurement.spread} frames, correlation {measurement.correlation:.2f}")
+    return measurement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the sound card's round-trip latency for the looper.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of bursts to measure (default 5)")
+    parser.add_argument("--store", type=pathlib.Path,
+                        default=pathlib.Path(__file__).resolve().parent.parent / "recordings" / LATENCY_FILENAME,
+                        help="Latency file to update (default ../recordings/latency.json)")
+    args = parser.parse_args()
+    args.store.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        asyncio.run(calibrate(args.store, args.repeats))
+    except (OSError, ValueError) as e:
+        print(f"Calibration failed: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+from audio_backends import MemoryBackend
+from audio_handler import AsyncAudioHandler
+from latency import LatencyStore, find_lag, make_probe, measure_round_trip
+
+
+def test_find_lag_through_noise_and_inverted_polarity():
+    probe = make_probe()
+    rng = np.random.default_rng(1)
+    recorded = rng.normal(0, 300, 20000)
+    recorded[7123:7123 + len(probe)] -= probe * 0.2
+    lag, correlation = find_lag(recorded.astype(np.int16), probe)
+    assert lag == 7123
+    assert correlation > 0.5
+
+
+def test_round_trip_through_loopback_backend():
+    backend = MemoryBackend(loopback_delay=3000)
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend, use_callback=False) as handler:
+            return await measure_round_trip(handler, repeats=2, max_latency=0.1)
+
+    measurement = asyncio.run(run())
+    assert measurement.frames == 3000
+    assert measurement.spread == 0
+    assert measurement.correlation > 0.99
+
+
+def test_round_trip_through_capture_ring():
+    # The always-on capture stamps blocks as they arrive, so the repeats agree
+    backend = MemoryBackend(loopback_delay=3000, realtime=True)
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend) as handler:
+            await handler.start_capture(1.0)
+            await handler.open_output_stream()
+            return await measure_round_trip(handler, repeats=2, max_latency=0.2), handler
+
+    measurement, handler = asyncio.run(run())
+    # The loopback plus the output ring, which blocking mode does not have
+    assert measurement.frames >= 3000 + handler.ring_blocks * handler.chunk_size
+    assert measurement.spread <= handler.chunk_size // 8
+    assert measurement.correlation > 0.99
+
+
+def test_silent_input_is_rejected():
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(), use_callback=False) as handler:
+            await measure_round_trip(handler, repeats=1, max_latency=0.1)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_store_keeps_latency_per_configuration(tmp_path):
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(loopback_delay=500), use_callback=False) as handler:
+            return handler.device_config(), await measure_round_trip(handler, repeats=1, max_latency=0.1)
+
+    config, measurement = asyncio.run(run())
+    LatencyStore(tmp_path / "latency.json").set(config, measurement)
+    store = LatencyStore(tmp_path / "latency.json")
+    assert store.get(config) == 500
+    assert store.get("some other card") is None
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,198 @@
+import numpy as np
+
+INITIAL_LOOPS = 16
+INITIAL_ARENA_SAMPLES = 1 << 16
+
+
+class LoopRegistry:
+    """
+    Struct-of-arrays table of every loop in a session.
+
+    Each per-loop attribute (arena offset, length, transport anchor, gain,
+    playing flag) lives in its own contiguous array, and all PCM is packed back
+    to back into one int16 arena. Rows and arena both grow by doubling, so
+    adding a loop is amortised O(its own length) and never copies the whole
+    session. The mixer picks its active loops with a single boolean mask.
+
+    Loops added from a file mapping (np.memmap) are not copied: the row keeps
+    the mapping, with offset -1, until `make_resident` moves the loop into the
+    arena the first time it plays. Takes that are only loaded cost no heap.
+
+    A registry made by `wrap` (a loaded session) keeps the wrapped PCM as a
+    separate, read-only base segment. Its rows stay there and are mixed from
+    it in place, while loops added later go into the arena, so adding a loop
+    to a restored session does not copy the session.
+
+    The public arrays are views of the first `len(self)` rows and are
+    invalidated by `add`.
+    """
+
+    def __init__(self, capacity: int = INITIAL_LOOPS, arena_samples: int = INITIAL_ARENA_SAMPLES):
+        self._count = 0
+        self._arena_used = 0
+        self._storage = self._new_arena(arena_samples)
+        self._base = np.zeros(0, dtype=np.int16)
+        self._offsets = np.zeros(capacity, dtype=np.int64)
+        self._lengths = np.zeros(capacity, dtype=np.int64)
+        self._anchors = np.zeros(capacity, dtype=np.int64)
+        self._gains = np.ones(capacity, dtype=np.float32)
+        self._playing = np.zeros(capacity, dtype=bool)
+        self._in_base = np.zeros(capacity, dtype=bool)
+        self._mapped = {}  # Row -> file mapping, for loops not yet in the arena
+
+    @classmethod
+    def wrap(cls, arena: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, anchors: np.ndarray,
+             gains: np.ndarray, playing: np.ndarray) -> "LoopRegistry":
+        """
+        Build a registry over existing arrays without copying them.
+
+        `arena` becomes the base segment and may be a read-only memory map; it
+        is never written or copied. Loops added later go into a new arena.
+        """
+        registry = cls(capacity=0, arena_samples=0)
+        registry._base = arena
+        registry._offsets = offsets
+        registry._lengths = lengths
+        registry._anchors = np.array(anchors, dtype=np.int64)
+        registry._gains = np.array(gains, dtype=np.float32)
+        registry._playing = np.array(playing, dtype=bool)
+        registry._in_base = np.ones(len(lengths), dtype=bool)
+        registry._count = len(lengths)
+        return registry
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def arena(self) -> np.ndarray:
+        return self._storage[:self._arena_used]
+
+    @property
+    def base(self) -> np.ndarray:
+        """The segment the registry was wrapped around; rows with `in_base` set index into it."""
+        return self._base
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets[:self._count]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths[:self._count]
+
+    @property
+    def anchors(self) -> np.ndarray:
+        return self._anchors[:self._count]
+
+    @property
+    def gains(self) -> np.ndarray:
+        return self._gains[:self._count]
+
+    @property
+    def playing(self) -> np.ndarray:
+        return self._playing[:self._count]
+
+    @property
+    def in_base(self) -> np.ndarray:
+        return self._in_base[:self._count]
+
+    def add(self, audio_data: np.ndarray, anchor: int, gain: float = 1.0) -> int:
+        """
+        Add a loop and return its index. New loops start stopped.
+
+        The PCM is copied into the arena, unless it is a file mapping of int16
+        samples, which is kept as it is until the loop first plays.
+        """
+        mapped = isinstance(audio_data, np.memmap) and audio_data.dtype == np.int16 and audio_data.ndim == 1
+        if not mapped:
+            audio_data = np.asarray(audio_data, dtype=np.int16)
+        if self._count == len(self._offsets):
+            self._resize_rows(max(2 * len(self._offsets), INITIAL_LOOPS))
+
+        index = self._count
+        self._lengths[index] = len(audio_data)
+        self._anchors[index] = anchor
+        self._gains[index] = gain
+        self._playing[index] = False
+        self._in_base[index] = False
+        self._count += 1
+        if mapped:
+            self._offsets[index] = -1
+            self._mapped[index] = audio_data
+        else:
+            self._offsets[index] = self._append(audio_data)
+        return index
+
+    def make_resident(self, index: int):
+        """Copy a mapped loop into the arena so it can be mixed. Does nothing for loops already there."""
+        audio_data = self._mapped.pop(index, None)
+        if audio_data is not None:
+            self._offsets[index] = self._append(audio_data)
+
+    def is_resident(self, index: int) -> bool:
+        return index not in self._mapped
+
+    def _append(self, audio_data: np.ndarray) -> int:
+        offset = self._arena_used
+        needed = offset + len(audio_data)
+        if needed > len(self._storage):
+            self._resize_arena(1 << (needed - 1).bit_length())
+        self._storage[offset:needed] = audio_data
+        self._arena_used = needed
+        return offset
+
+    def audio(self, index: int) -> np.ndarray:
+        """A view of one loop's PCM, in the arena or in its file mapping."""
+        mapped = self._mapped.get(index)
+        if mapped is not None:
+            return mapped
+        offset = self._offsets[index]
+        segment = self._base if self._in_base[index] else self._storage
+        return segment[offset:offset + self._lengths[index]]
+
+    def active(self) -> np.ndarray:
+        """Indexes of the loops that are playing, in the arena and not empty."""
+        return np.flatnonzero(self.playing & (self.lengths > 0) & (self.offsets >= 0))
+
+    def assign(self, arena: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, anchors: np.ndarray,
+               gains: np.ndarray):
+        """Replace the whole table with `arena` and the given rows, all playing. Used by mixing workers."""
+        count = len(lengths)
+        self._storage = arena
+        self._arena_used = len(arena)
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._lengths = np.array(lengths, dtype=np.int64)
+        self._anchors = np.array(anchors, dtype=np.int64)
+        self._gains = np.array(gains, dtype=np.float32)
+        self._playing = np.ones(count, dtype=bool)
+        self._in_base = np.zeros(count, dtype=bool)
+        self._base = np.zeros(0, dtype=np.int16)
+        self._mapped = {}
+        self._count = count
+
+    def set_arena(self, arena: np.ndarray):
+        """Swap in a relocated copy of the same arena, at least as large; loop offsets stay valid."""
+        if len(arena) < self._arena_used:
+            raise ValueError(f"Arena of {len(arena)} samples cannot hold the {self._arena_used} in use")
+        self._storage = arena
+
+    def _new_arena(self, samples: int) -> np.ndarray:
+        return np.zeros(samples, dtype=np.int16)
+
+    def _resize_arena(self, samples: int):
+        arena = self._new_arena(samples)
+        arena[:self._arena_used] = self._storage[:self._arena_used]
+        self._storage = arena
+
+    def _resize_rows(self, capacity: int):
+        def grown(array, fill):
+            resized = np.full(capacity, fill, dtype=array.dtype)  # Also unshares wrapped arrays
+            resized[:self._count] = array[:self._count]
+            return resized
+
+        self._offsets = grown(self._offsets, 0)
+        self._lengths = grown(self._lengths, 0)
+        self._anchors = grown(self._anchors, 0)
+        self._gains = grown(self._gains, 1)
+        self._playing = grown(self._playing, False)
+        self._in_base = grown(self._in_base, False)
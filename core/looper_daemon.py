@@ -0,0 +1,197 @@
+"""
+Headless looper: the LooperEngine without Tk, driven over a local datagram socket.
+
+Commands are OSC messages sent over UDP (default 127.0.0.1:9000) or a Unix
+datagram socket:
+
+    /record [i [f]]    toggle recording, or start (1) / stop (0) it; a start may
+                       give the pre-roll in seconds (default 0.5)
+    /loop/toggle i     toggle loop i (numbered as in /status)
+    /stop              stop recording and every loop
+    /calibrate         measure the round-trip latency (output looped back to input)
+    /status            reply /status with a JSON string of the engine's state
+
+Other commands reply /done with their address once applied, or /error with a
+message. Replies go to the sender's address; Unix-socket clients must bind
+their own socket to receive them.
+
+Usage: python looper_daemon.py [--udp HOST:PORT] [--unix PATH] [--workers N]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import signal
+import socket
+import time
+from typing import Optional, Tuple
+from audio_handler import AsyncAudioHandler
+from instrumentation import metrics
+from looper_engine import LooperEngine
+from osc import decode_message, encode_message
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_UDP = "127.0.0.1:9000"
+
+
+class _ControlProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "ControlServer"):
+        self.server = server
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.server.handle(data, addr, self.transport)
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"Control socket error: {exc}")
+
+
+class ControlServer:
+    """
+    Applies OSC commands to a LooperEngine.
+
+    Each datagram is handled on the event loop as soon as it arrives. /status
+    is answered from there directly, and other commands run as tasks that
+    only flip engine state. The audio itself is fed from the output ring on
+    PortAudio's thread, so control traffic never stalls it.
+    """
+
+    def __init__(self, engine: LooperEngine):
+        self.engine = engine
+        self.transports = []
+        self._unix_path: Optional[pathlib.Path] = None
+        self._tasks = set()
+        self._commands = {
+            "/record": self._record,
+            "/loop/toggle": engine.toggle_loop,
+            "/stop": engine.stop,
+            "/calibrate": engine.calibrate_latency,
+        }
+
+    async def start(self, udp: Optional[Tuple[str, int]] = None, unix_path: Optional[pathlib.Path] = None):
+        loop = asyncio.get_running_loop()
+        if udp is not None:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _ControlProtocol(self), local_addr=udp)
+            self.transports.append(transport)
+            logger.info(f"Listening for OSC on udp://{self.udp_address[0]}:{self.udp_address[1]}")
+        if unix_path is not None:
+            unix_path = pathlib.Path(unix_path)
+            unix_path.unlink(missing_ok=True)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(str(unix_path))
+            transport, _ = await loop.create_datagram_endpoint(lambda: _ControlProtocol(self), sock=sock)
+            self.transports.append(transport)
+            self._unix_path = unix_path
+            logger.info(f"Listening for OSC on {unix_path}")
+
+    @property
+    def udp_address(self) -> Optional[Tuple[str, int]]:
+        for transport in self.transports:
+            sock = transport.get_extra_info("socket")
+            if sock.family in (socket.AF_INET, socket.AF_INET6):
+                return sock.getsockname()[:2]
+        return None
+
+    def close(self):
+        for transport in self.transports:
+            transport.close()
+        self.transports.clear()
+        if self._unix_path is not None:
+            self._unix_path.unlink(missing_ok=True)
+            self._unix_path = None
+
+    def handle(self, data: bytes, addr, transport: asyncio.DatagramTransport):
+        received = time.perf_counter_ns()
+        try:
+            address, args = decode_message(data)
+        except ValueError as e:
+            self._reply(transport, addr, "/error", str(e))
+            return
+        if address == "/status":
+            self._reply(transport, addr, "/status", json.dumps(self.engine.status()))
+            return
+        command = self._commands.get(address)
+        if command is None:
+            self._reply(transport, addr, "/error", f"Unknown command {address}")
+            return
+        task = asyncio.create_task(self._run(command, args, address, addr, transport, received))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, command, args, address: str, addr, transport: asyncio.DatagramTransport, received: int):
+        try:
+            await command(*args)
+        except (IndexError, TypeError, ValueError, OSError) as e:
+            self._reply(transport, addr, "/error", f"{address}: {e}")
+            return
+        except Exception as e:
+            logger.exception(f"Error handling {address}")
+            self._reply(transport, addr, "/error", f"{address}: {e}")
+            return
+        metrics.record("control_latency", time.perf_counter_ns() - received)
+        self._reply(transport, addr, "/done", address)
+
+    async def _record(self, *state):
+        if not state:
+            await self.engine.toggle_recording()
+        elif state[0]:
+            await self.engine.start_recording(*state[1:2])
+        else:
+            await self.engine.stop_recording()
+
+    def _reply(self, transport: asyncio.DatagramTransport, addr, address: str, *args):
+        if addr and not transport.is_closing():
+            transport.sendto(encode_message(address, *args), addr)
+
+
+def parse_udp(value: str) -> Optional[Tuple[str, int]]:
+    """HOST:PORT or just PORT (on localhost); an empty string turns UDP off."""
+    if not value:
+        return None
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def run_daemon(output_dir: pathlib.Path, udp: Optional[Tuple[str, int]], unix_path: Optional[pathlib.Path],
+                     mix_workers: int = 0):
+    async with AsyncAudioHandler() as audio_handler:
+        output_task = asyncio.create_task(audio_handler.open_output_stream())
+        engine = LooperEngine(output_dir, audio_handler, mix_workers=mix_workers)
+        server = ControlServer(engine)
+        await server.start(udp, unix_path)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, engine.shutdown_event.set)
+        try:
+            await asyncio.gather(output_task, engine.run_async(), return_exceptions=True)
+        finally:
+            server.close()
+            logger.info("Daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the looper without a window, controlled over OSC.")
+    parser.add_argument("--udp", default=DEFAULT_UDP,
+                        help=f"UDP address to listen on, HOST:PORT or PORT; empty to disable (default {DEFAULT_UDP})")
+    parser.add_argument("--unix", type=pathlib.Path, help="Also listen on this Unix datagram socket")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("LOOPER_MIX_WORKERS", "0")),
+                        help="Mixing worker processes (default 0: mix in-process)")
+    args = parser.parse_args()
+
+    output_dir = pathlib.Path(__file__).resolve().parent.parent / "recordings"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        asyncio.run(run_daemon(output_dir, parse_udp(args.udp), args.unix, args.workers))
+    except asyncio.CancelledError:
+        logger.info("Daemon shut down")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import socket
+import wave
+import numpy as np
+import pytest
+from audio_backends import MemoryBackend
+from audio_handler import AsyncAudioHandler
+from looper_daemon import ControlServer
+from looper_engine import LooperEngine
+from osc import decode_message, encode_message
+
+
+class _Client(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.replies: asyncio.Queue = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.replies.put_nowait(decode_message(data))
+
+
+def test_osc_round_trip():
+    message = encode_message("/loop/toggle", 3, 0.5, "take", True)
+    assert len(message) % 4 == 0
+    assert decode_message(message) == ("/loop/toggle", [3, 0.5, "take", True])
+    with pytest.raises(ValueError):
+        decode_message(b"/status")
+
+
+def _write_take(path):
+    tone = (8000 * np.sin(2 * np.pi * 220 * np.arange(22050) / 44100)).astype(np.int16)
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(tone.tobytes())
+
+
+def test_daemon_answers_commands_without_waiting_for_a_block(tmp_path):
+    _write_take(tmp_path / "output_0.wav")
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(realtime=True)) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            blocks = []
+
+            async def held_block():
+                # Playback stays inside its first block, so no block boundary ever comes
+                blocks.append(True)
+                await engine.shutdown_event.wait()
+
+            engine.play_block = held_block
+            server = ControlServer(engine)
+            await server.start(udp=("127.0.0.1", 0))
+            loop = asyncio.get_running_loop()
+            transport, client = await loop.create_datagram_endpoint(_Client, remote_addr=server.udp_address)
+
+            async def command(address, *args):
+                transport.sendto(encode_message(address, *args))
+                return await asyncio.wait_for(client.replies.get(), 2)
+
+            async def session():
+                try:
+                    while engine.status()["loops"] < 1:
+                        await asyncio.sleep(0.01)
+                    for _ in range(10):
+                        assert await command("/loop/toggle", 0) == ("/done", ["/loop/toggle"])
+                    _, [status] = await command("/status")
+                    assert json.loads(status)["playing"] == []
+
+                    await command("/loop/toggle", 0)
+                    assert await command("/record") == ("/done", ["/record"])
+                    status = json.loads((await command("/status"))[1][0])
+                    assert status["recording"] and status["playing"] == [0]
+                    await command("/stop")
+                    status = json.loads((await command("/status"))[1][0])
+                    assert not status["recording"] and status["playing"] == []
+
+                    while engine.status()["loops"] < 2:
+                        await asyncio.sleep(0.01)  # The take, which starts playing once written
+                    playing = engine.status()["playing"]
+                    assert (await command("/loop/toggle", 7))[0] == "/error"
+                    assert (await command("/loop/toggle", -1))[0] == "/error"
+                    assert json.loads((await command("/status"))[1][0])["playing"] == playing
+
+                    async def broken():
+                        raise RuntimeError("device gone")
+                    server._commands["/calibrate"] = broken
+                    assert await command("/calibrate") == ("/error", ["/calibrate: device gone"])
+                    assert (await command("/nope"))[0] == "/error"
+                    # Every reply came while playback was still inside its first block
+                    return len(blocks)
+                finally:
+                    engine.shutdown_event.set()
+
+            session_task = asyncio.create_task(session())
+            try:
+                await engine.run_async()
+            finally:
+                transport.close()
+                server.close()
+            return session_task.result()
+
+    assert asyncio.run(run()) == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
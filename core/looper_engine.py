@@ -0,0 +1,434 @@
+import asyncio
+import logging
+import os
+import pathlib
+import re
+from typing import Any, Callable, Coroutine, Dict, List
+import numpy as np
+from audio_cache import audio_cache
+from audio_convert import CACHE_DIRNAME, load_for_engine
+from audio_handler import AsyncAudioHandler
+from instrumentation import metrics, startup
+from latency import LATENCY_FILENAME, LatencyStore, measure_round_trip
+from mixer import LoopMixer
+from ring_buffer import CaptureRing
+from session_file import SESSION_FILENAME, load_session, save_session
+from take_writer import TakeWriter
+
+logger = logging.getLogger(__name__)
+
+RECORDING_NAME = re.compile(r"output_(\d+)\.wav$")
+# Audio from before the record command that a take starts with, by default and at most
+PRE_ROLL_SECONDS = 0.5
+MAX_PRE_ROLL_SECONDS = 5.0
+# The capture ring holds the longest pre-roll plus this much, so a take writer held up
+# by a stalled event loop can still catch up before the ring laps it
+CAPTURE_SLACK_SECONDS = 2.0
+
+
+class InlineDispatcher:
+    """
+    UI dispatcher for when the front end and asyncio share one thread, or there
+    is no front end: everything runs in place. See tk_bridge.TkAsyncBridge for
+    the threaded one.
+    """
+
+    def call(self, func: Callable, *args, **kwargs):
+        func(*args, **kwargs)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        return func(*args, **kwargs)
+
+    def submit(self, coro: Coroutine):
+        return asyncio.ensure_future(coro)
+
+
+class LoopEntry:
+    """What the engine keeps per loop; the audio and play state live in the mixer's LoopRegistry."""
+
+    __slots__ = ("filename", "mixer_index")
+
+    def __init__(self, filename: pathlib.Path, mixer_index: int):
+        self.filename = filename
+        self.mixer_index = mixer_index
+
+
+def _write_views(writer: TakeWriter, views):
+    for samples in views:
+        writer.write(samples)
+
+
+class LooperEngine:
+    """
+    The looper without a user interface: playback, recording, loops and sessions.
+
+    Front ends subclass it and override the `_show_*` hooks, `_add_loop_entry`
+    and `_loop_loaded`. The `_show_*` hooks and `_add_loop_entry` are always
+    called through `ui`, so a front end whose widgets live on another thread
+    gets them on that thread. Headless, they do nothing.
+    """
+
+    def __init__(self, output_dir: pathlib.Path, audio_handler: AsyncAudioHandler, mix_workers: int = 0, ui=None,
+                 pre_roll: float = PRE_ROLL_SECONDS):
+        self.output_dir = output_dir
+        self.ui = ui if ui is not None else InlineDispatcher()
+        self.audio_handler = audio_handler
+        self.is_recording = asyncio.Event()
+        self.is_calibrating = False
+        self.pre_roll = pre_roll
+        self._take_stop: asyncio.Future | None = None
+        self._take_capture = None  # The ring the take in progress is read from
+        self.loops: List[LoopEntry] = []
+        self.mixer = self._create_mixer(mix_workers)
+        self.session_path = output_dir / SESSION_FILENAME
+        self.latency_store = LatencyStore(output_dir / LATENCY_FILENAME)
+        # Number new takes after the ones already on disk so none are overwritten
+        self.recording_count = self._first_free_recording_number()
+        self.playback_task = None
+        self.capture_task = None
+        self.lag_monitor_task = None
+        self.cpu_monitor_task = None
+        self.preload_task = None
+        self.shutdown_event = asyncio.Event()
+        self._silence = bytes(self.audio_handler.chunk_size * 2)
+        metrics.register_gauge("active_loops", lambda: self.mixer.active_count)
+
+    def _create_mixer(self, mix_workers: int) -> LoopMixer:
+        if not mix_workers:
+            return LoopMixer(self.audio_handler.rate)
+        # With mix_workers, loops are summed in worker processes over shared memory
+        from parallel_mixer import ParallelLoopMixer
+        return ParallelLoopMixer(self.audio_handler.rate, workers=mix_workers)
+
+    # Front-end hooks
+
+    def _add_loop_entry(self, filename: pathlib.Path, mixer_index: int, playing: bool) -> LoopEntry:
+        loop = LoopEntry(filename, mixer_index)
+        self.loops.append(loop)
+        return loop
+
+    def _show_recording(self, recording: bool):
+        pass
+
+    def _show_playing(self, loop: LoopEntry, playing: bool):
+        pass
+
+    def _show_calibrating(self, calibrating: bool):
+        pass
+
+    async def _loop_loaded(self, loop: LoopEntry, audio_data: np.ndarray):
+        """A take was added from disk or a recording, with its samples at hand."""
+
+    # Lifecycle
+
+    async def run_async(self):
+        # The input runs from the start, so every take can reach back into what was already played
+        self.capture_task = asyncio.create_task(self._start_capture())
+        await self.restore_session()
+        startup.mark("session_restored")
+        self.playback_task = asyncio.create_task(self.continuous_playback())
+        # Takes the session does not know about load while the user can already play
+        self.preload_task = asyncio.create_task(self.preload_recordings())
+        self.lag_monitor_task = asyncio.create_task(metrics.monitor_event_loop_lag(self.shutdown_event))
+        self.cpu_monitor_task = asyncio.create_task(metrics.monitor_cpu(self.shutdown_event, idle=self._is_idle))
+        try:
+            await self.shutdown_event.wait()
+        finally:
+            await self.cleanup()
+
+    async def cleanup(self):
+        logger.info("Cleaning up...")
+        metrics.dump(self.output_dir / "audio_metrics.json")
+        await self.save_session()
+        await self._cancel_all_tasks()
+        self.mixer.close()
+        logger.info("Cleanup complete")
+
+    async def _cancel_all_tasks(self):
+        self.mixer.stop_all()
+
+        if self.playback_task and not self.playback_task.done():
+            self.playback_task.cancel()
+
+        await asyncio.sleep(0.5)
+
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+
+    async def continuous_playback(self):
+        try:
+            while not self.shutdown_event.is_set():
+                await self.play_block()
+        except asyncio.CancelledError:
+            logger.info("Playback task cancelled")
+        except Exception as e:
+            logger.error(f"Error in continuous playback: {e}")
+
+    async def play_block(self):
+        """One turn of continuous_playback: mix a block and hand it to the output."""
+        mixed_audio = self._mix_active_loops()
+        if mixed_audio is not None:
+            await self.audio_handler.write_chunk(mixed_audio.tobytes())
+            startup.mark("first_sound")
+        elif self.audio_handler.output_ring is not None:
+            # Keep the callback ring fed so idle time is not counted as underruns
+            await self.audio_handler.write_chunk(self._silence)
+        else:
+            await asyncio.sleep(0.01)
+
+    def _is_idle(self) -> bool:
+        return not self.mixer.active_count and not self.is_recording.is_set()
+
+    def _mix_active_loops(self) -> np.ndarray | None:
+        with metrics.stage("mix"):
+            return self.mixer.mix(self.audio_handler.chunk_size)
+
+    def status(self) -> Dict[str, Any]:
+        """A snapshot of the engine's state, cheap enough to answer from the event loop at any time."""
+        playing = self.mixer.loops.playing
+        return {
+            "recording": self.is_recording.is_set(),
+            "calibrating": self.is_calibrating,
+            "sample_time": self.mixer.transport.sample_time,
+            "seconds": self.mixer.transport.seconds(),
+            "loops": len(self.loops),
+            "playing": [index for index, loop in enumerate(self.loops) if playing[loop.mixer_index]],
+        }
+
+    async def stop(self):
+        """Stop recording and every loop."""
+        if self.is_recording.is_set():
+            await self.stop_recording()
+        for loop in self.loops:
+            if self.mixer.is_playing(loop.mixer_index):
+                await self.stop_loop(loop)
+
+    # Recording
+
+    async def toggle_recording(self):
+        if self.is_recording.is_set():
+            await self.stop_recording()
+        else:
+            await self.start_recording()
+
+    async def start_recording(self, pre_roll: float | None = None):
+        """
+        Start a take `pre_roll` seconds back (default `self.pre_roll`), from
+        audio the input has already captured. Leading silence is still trimmed,
+        so the take begins at the first sound in that window.
+        """
+        if self.is_calibrating or self.is_recording.is_set():
+            return
+        capture = await self._start_capture()
+        if capture is None or self.is_recording.is_set():
+            return
+        pre_roll = min(max(self.pre_roll if pre_roll is None else pre_roll, 0.0), MAX_PRE_ROLL_SECONDS)
+        start = max(capture.written - int(pre_roll * self.audio_handler.rate) * self.audio_handler.channels,
+                    capture.oldest)
+        self._take_stop = asyncio.get_running_loop().create_future()
+        self._take_capture = capture
+        self.is_recording.set()
+        self.ui.call(self._show_recording, True)
+        asyncio.create_task(self.record_audio(capture, start, self._take_stop))
+
+    async def stop_recording(self):
+        """End the take at the audio captured so far; whatever is still arriving belongs to the next one."""
+        if self._take_stop is not None and not self._take_stop.done():
+            # The take's own ring: the handler drops it if the input fails
+            self._take_stop.set_result(self._take_capture.written)
+        self.is_recording.clear()
+        self.ui.call(self._show_recording, False)
+
+    async def _start_capture(self):
+        try:
+            return await self.audio_handler.start_capture(MAX_PRE_ROLL_SECONDS + CAPTURE_SLACK_SECONDS)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not open the input: {e}")
+            return None
+
+    async def record_audio(self, capture: CaptureRing, start: int, stop: asyncio.Future):
+        """
+        Copy the take from `capture` into its file, from `start` until `stop` has the end position.
+
+        If the input fails first, the take ends with what was captured.
+        """
+        try:
+            filename = self._next_recording_filename()
+            writer = TakeWriter(filename, self.audio_handler.channels,
+                                self.audio_handler.sample_width, self.audio_handler.rate)
+            take_start = None
+            position = start
+            try:
+                while not stop.done() or position < stop.result():
+                    try:
+                        end = await self._next_captured(capture, position, stop)
+                    except OSError as e:
+                        logger.error(f"Input failed during the take; keeping what was captured: {e}")
+                        if self._take_stop is stop:
+                            await self.stop_recording()
+                        break
+                    if take_start is None:
+                        # Capture times are on the handler's output timeline, a fixed offset from the transport
+                        take_start = (capture.time_at(start) + self.mixer.transport.sample_time
+                                      - self.audio_handler.output_frames)
+                    if stop.done():
+                        end = min(end, stop.result())
+                    position = await self._write_captured(writer, capture, position, end)
+            finally:
+                await asyncio.to_thread(writer.close)
+            anchor = None
+            if writer.start_frame is not None:
+                # What was heard at transport time t reached the input at t + latency
+                anchor = take_start + writer.start_frame - self._round_trip_latency()
+            await self.create_loop_box(filename, autoplay=True, anchor=anchor)
+        except Exception as e:
+            logger.error(f"Error in recording audio: {e}")
+
+    async def _next_captured(self, capture: CaptureRing, position: int, stop: asyncio.Future) -> int:
+        """Wait for audio past `position` or for the take to be stopped, and return how much has been captured."""
+        if capture.written > position or stop.done():
+            return capture.written
+        waiting = asyncio.ensure_future(capture.wait_for(position + 1))
+        # An input that stops delivering must not keep a stopped take open
+        await asyncio.wait((waiting, stop), return_when=asyncio.FIRST_COMPLETED)
+        if waiting.done():
+            return waiting.result()
+        waiting.cancel()
+        return capture.written
+
+    async def _write_captured(self, writer: TakeWriter, capture, start: int, end: int) -> int:
+        if start < capture.oldest:
+            metrics.count("capture_overruns")
+            logger.warning(f"Take writer fell {capture.oldest - start} samples behind the capture ring; take has a gap")
+            start = capture.oldest
+        views = capture.views(start, end)
+        # The views stay valid for CAPTURE_SLACK_SECONDS, far longer than a write takes
+        with metrics.stage("take_write"):
+            await asyncio.to_thread(_write_views, writer, views)
+        return end
+
+    def _round_trip_latency(self) -> int:
+        latency = self.latency_store.get(self.audio_handler.device_config())
+        if latency is None:
+            logger.warning("Round-trip latency is not calibrated for this device setup; takes will be late")
+            return 0
+        return latency
+
+    async def calibrate_latency(self):
+        """Measure the round-trip latency of the current device setup, pausing playback meanwhile."""
+        if self.is_calibrating:
+            return
+        if self.is_recording.is_set():
+            logger.warning("Stop recording before calibrating latency")
+            return
+        self.is_calibrating = True
+        self.ui.call(self._show_calibrating, True)
+        if self.playback_task:
+            self.playback_task.cancel()
+            await asyncio.gather(self.playback_task, return_exceptions=True)
+        try:
+            measurement = await measure_round_trip(self.audio_handler)
+            self.latency_store.set(self.audio_handler.device_config(), measurement)
+            logger.info(f"Round-trip latency: {measurement.frames} frames "
+                        f"({1000 * measurement.frames / self.audio_handler.rate:.1f} ms), "
+                        f"spread {measurement.spread} frames")
+        except (OSError, ValueError) as e:
+            logger.error(f"Latency calibration failed: {e}")
+        finally:
+            self.is_calibrating = False
+            self.playback_task = asyncio.create_task(self.continuous_playback())
+            self.ui.call(self._show_calibrating, False)
+
+    # Sessions and takes
+
+    async def restore_session(self):
+        """Bring back the loops and play state of the last session, if there is one."""
+        if not self.session_path.exists():
+            return
+        try:
+            session = await asyncio.to_thread(load_session, self.session_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load session {self.session_path}: {e}")
+            return
+        if session.rate != self.audio_handler.rate:
+            logger.error(f"Session was recorded at {session.rate} Hz, not {self.audio_handler.rate} Hz; not loading it")
+            return
+
+        self.mixer.transport.reset(session.sample_time)
+        self.mixer.adopt(session.loops)
+        entries = [(self.output_dir / name, mixer_index, self.mixer.is_playing(mixer_index))
+                   for mixer_index, name in enumerate(session.names)]
+        # One hand-off to the UI for the whole session
+        await self.ui.run(lambda: [self._add_loop_entry(*entry) for entry in entries])
+        logger.info(f"Restored {len(session.names)} loops from {self.session_path}")
+
+    async def save_session(self):
+        names = [loop.filename.name for loop in self.loops]
+        try:
+            await asyncio.to_thread(save_session, self.session_path, self.mixer.loops, self.audio_handler.rate,
+                                    self.mixer.transport.sample_time, names)
+        except OSError as e:
+            logger.error(f"Could not save session {self.session_path}: {e}")
+
+    async def preload_recordings(self):
+        """Add recorded takes missing from the session, stopped, in recording order."""
+        known = {loop.filename.name for loop in self.loops}
+        takes = [(int(match.group(1)), self.output_dir / match.group(0))
+                 for match in map(RECORDING_NAME.match, os.listdir(self.output_dir)) if match]
+        for _, filename in sorted(takes):
+            if filename.name in known:
+                continue
+            try:
+                audio_data = await self.load_audio(filename)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping {filename}: {e}")
+                continue
+            loop = await self.ui.run(self._add_loop_entry, filename, self.mixer.add_loop(audio_data), False)
+            await self._loop_loaded(loop, audio_data)
+        startup.mark("recordings_preloaded")
+
+    def _first_free_recording_number(self) -> int:
+        numbers = [int(match.group(1)) for match in map(RECORDING_NAME.match, os.listdir(self.output_dir)) if match]
+        return max(numbers, default=-1) + 1
+
+    def _next_recording_filename(self) -> pathlib.Path:
+        filename = self.output_dir / f"output_{self.recording_count}.wav"
+        self.recording_count += 1
+        return filename
+
+    async def create_loop_box(self, filename: pathlib.Path, autoplay: bool = False, anchor: int | None = None):
+        audio_data = await self.load_audio(filename)
+        loop = await self.ui.run(self._add_loop_entry, filename, self.mixer.add_loop(audio_data, anchor), autoplay)
+
+        if autoplay:
+            await self.start_loop(loop)
+        await self._loop_loaded(loop, audio_data)
+
+    # Loops
+
+    async def toggle_loop(self, loop_index: int):
+        if not 0 <= loop_index < len(self.loops):
+            raise IndexError(f"No loop {loop_index}")
+        loop = self.loops[loop_index]
+        if self.mixer.is_playing(loop.mixer_index):
+            await self.stop_loop(loop)
+        else:
+            await self.start_loop(loop)
+
+    async def start_loop(self, loop: LoopEntry):
+        self.mixer.set_playing(loop.mixer_index, True)
+        self.ui.call(self._show_playing, loop, True)
+
+    async def stop_loop(self, loop: LoopEntry):
+        self.mixer.set_playing(loop.mixer_index, False)
+        self.ui.call(self._show_playing, loop, False)
+
+    async def load_audio(self, filename: pathlib.Path) -> np.ndarray:
+        return await asyncio.to_thread(self._load_wav, filename)
+
+    def _load_wav(self, filename: pathlib.Path) -> np.ndarray:
+        # Takes from other rigs are converted to the engine's format once and kept on disk
+        rate, channels = self.audio_handler.rate, self.audio_handler.channels
+        return audio_cache.get(filename, lambda f: load_for_engine(f, rate, channels, self.output_dir / CACHE_DIRNAME),
+                               variant=(rate, channels))
@@ -0,0 +1,187 @@
+import asyncio
+import pathlib
+import threading
+import audio_handler
+import wave
+import numpy as np
+import pytest
+from audio_backends import MemoryBackend
+from audio_handler import AsyncAudioHandler
+from looper_engine import LooperEngine
+from take_writer import TakeWriter
+
+CHUNK = 1024
+
+
+def _input_with_transient(onset: int, frames: int) -> np.ndarray:
+    t = np.arange(frames - onset)
+    tone = (8000 * np.sin(2 * np.pi * 220 * t / 44100)).astype(np.int16)
+    return np.concatenate((np.zeros(onset, dtype=np.int16), tone))
+
+
+async def _record_take(engine: LooperEngine, blocks_before: int, blocks_during: int, pre_roll: float):
+    stream = engine.audio_handler.input_stream
+    for _ in range(blocks_before):
+        stream.process_block()
+    await engine.start_recording(pre_roll)
+    for _ in range(blocks_during):
+        stream.process_block()
+        await asyncio.sleep(0)
+    loops = len(engine.loops)
+    await engine.stop_recording()
+    while len(engine.loops) == loops:
+        await asyncio.sleep(0.01)
+    with wave.open(str(engine.loops[-1].filename), "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def test_take_reaches_back_into_audio_captured_before_record(tmp_path):
+    onset = 4 * CHUNK + 100
+    input_data = _input_with_transient(onset, 12 * CHUNK)
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(input_data=input_data)) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            await engine._start_capture()
+            # The transient is captured two blocks before the record command
+            take = await _record_take(engine, 6, 4, pre_roll=0.5)
+            anchor = int(engine.mixer.loops.anchors[0])
+            engine.mixer.close()
+            return take, anchor
+
+    take, anchor = asyncio.run(run())
+    start = onset
+    assert abs(int(take[0])) < 300
+    np.testing.assert_array_equal(take, input_data[start:start + len(take)])
+    # The take stops where the stop command was, ten blocks in
+    assert 10 * CHUNK - CHUNK < start + len(take) <= 10 * CHUNK
+    # Nothing was played, so every block sits one block before output position 0
+    assert anchor == start - CHUNK
+
+
+def test_without_pre_roll_the_take_starts_at_the_command(tmp_path):
+    input_data = _input_with_transient(4 * CHUNK + 100, 12 * CHUNK)
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(input_data=input_data)) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            await engine._start_capture()
+            take = await _record_take(engine, 6, 4, pre_roll=0)
+            engine.mixer.close()
+            return take
+
+    take = asyncio.run(run())
+    # It begins at the zero crossing nearest the command, six blocks in
+    starts = [start for start in range(6 * CHUNK - 200, 6 * CHUNK + 200)
+              if np.array_equal(take, input_data[start:start + len(take)])]
+    assert len(starts) == 1
+    assert abs(starts[0] - 6 * CHUNK) < 200
+
+
+def test_take_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    writers = set()
+    write = TakeWriter.write
+
+    def recording_write(self, samples):
+        writers.add(threading.current_thread())
+        return write(self, samples)
+
+    monkeypatch.setattr(TakeWriter, "write", recording_write)
+    input_data = _input_with_transient(4 * CHUNK + 100, 12 * CHUNK)
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(input_data=input_data)) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            await engine._start_capture()
+            take = await _record_take(engine, 6, 4, pre_roll=0.5)
+            engine.mixer.close()
+            return take
+
+    assert len(asyncio.run(run())) > 0
+    assert writers and threading.current_thread() not in writers
+
+
+def test_take_ends_on_stop_while_the_input_delivers_nothing(tmp_path):
+    input_data = _input_with_transient(100, 12 * CHUNK)
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend(input_data=input_data)) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            capture = await engine._start_capture()
+            await engine.start_recording(0)
+            for _ in range(3):
+                handler.input_stream.process_block()
+            while capture.written < 3 * CHUNK:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)  # The writer has caught up and waits for more input
+            await engine.stop_recording()
+            await asyncio.wait_for(_wait_for_loops(engine, 1), 2)
+            engine.mixer.close()
+
+    asyncio.run(run())
+
+
+def test_take_is_kept_when_the_input_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_handler, "MAX_INPUT_FAILURES", 2)
+    backend = MemoryBackend(input_data=_input_with_transient(100, 40 * CHUNK), realtime=True)
+    read_input = backend._read_input
+    reads = []
+
+    def failing(num_bytes):
+        reads.append(num_bytes)
+        if len(reads) > 8:
+            raise OSError("Device unavailable")
+        return read_input(num_bytes)
+
+    backend._read_input = failing
+
+    async def run():
+        async with AsyncAudioHandler(backend=backend, use_callback=False) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            await engine._start_capture()
+            await engine.start_recording(0)
+            # Nobody stops the take: the failed input ends it
+            await asyncio.wait_for(_wait_for_loops(engine, 1), 5)
+            assert not engine.is_recording.is_set()
+            engine.mixer.close()
+            return engine.loops[0].filename
+
+    with wave.open(str(asyncio.run(run())), "rb") as wf:
+        assert 0 < wf.getnframes() <= 8 * CHUNK
+
+
+async def _wait_for_loops(engine: LooperEngine, count: int):
+    while len(engine.loops) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_preloaded_takes_stay_mapped_from_their_files(tmp_path):
+    tone = _input_with_transient(0, 4 * CHUNK)
+    for number in range(3):
+        with wave.open(str(tmp_path / f"output_{number}.wav"), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(44100)
+            wf.writeframes(tone.tobytes())
+
+    async def run():
+        async with AsyncAudioHandler(backend=MemoryBackend()) as handler:
+            engine = LooperEngine(tmp_path, handler)
+            await engine.preload_recordings()
+            try:
+                # Nothing is copied onto the heap until a take plays
+                assert len(engine.mixer.loops.arena) == 0
+                for loop in engine.loops:
+                    audio = engine.mixer.loops.audio(loop.mixer_index)
+                    assert isinstance(audio, np.memmap) and pathlib.Path(audio.filename) == loop.filename.resolve()
+                await engine.toggle_loop(1)
+                assert len(engine.mixer.loops.arena) == len(tone)
+                np.testing.assert_array_equal(engine.mixer.mix(CHUNK), engine.mixer.loops.audio(1)[:CHUNK])
+            finally:
+                engine.mixer.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,75 +1,85 @@
+import time
+LAUNCHED = time.perf_counter()
+
 import asyncio
 import pathlib
 import tkinter as tk
-from audio_handler import AsyncAudioHandler
-from audio_looper_gui import AudioLooperGUI
 import logging
 import signal
 import os
 import sys
+from instrumentation import startup
+from tk_bridge import TkAsyncBridge
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class AsyncTk(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        self.shutdown_event = asyncio.Event()
-
-    def on_closing(self):
-        logger.info("Initiating shutdown...")
-        self.shutdown_event.set()
-        self.quit()
-        # Force exit after a short delay
-        self.after(1000, lambda: os._exit(0))
-
-    async def update_async(self):
-        while not self.shutdown_event.is_set():
-            self.update()
-            await asyncio.sleep(0.01)
-
-async def main():
+
+async def run_engine(root: tk.Tk, bridge: TkAsyncBridge, output_dir: pathlib.Path):
+    """Everything but the window: runs on the bridge's asyncio thread while Tk stays responsive."""
+    # NumPy and the audio engine import here, off the Tk thread
+    from audio_looper_gui import AudioLooperGUI
+    from audio_handler import AsyncAudioHandler
+    startup.mark("modules_loaded")
+
+    try:
+        async with AsyncAudioHandler() as audio_handler:
+            # PortAudio's device scan and the output stream come up in the background
+            output_task = asyncio.create_task(audio_handler.open_output_stream())
+            mix_workers = int(os.environ.get("LOOPER_MIX_WORKERS", "0"))
+
+            def build_gui():
+                looper_gui = AudioLooperGUI(output_dir, root, audio_handler, mix_workers=mix_workers, ui=bridge)
+                root.protocol("WM_DELETE_WINDOW", looper_gui.on_closing)
+                return looper_gui
+
+            looper_gui = await bridge.run(build_gui)
+            startup.mark("gui_ready")
+            await asyncio.gather(output_task, looper_gui.run_async(), return_exceptions=True)
+    except Exception as e:
+        logger.error(f"Error in main loop: {e}")
+    finally:
+        logger.info("Main function completed")
+        bridge.call(root.quit)
+
+
+def main():
+    startup.reset(LAUNCHED)
     script_dir = pathlib.Path(__file__).resolve().parent
     root_dir = script_dir.parent
     output_dir = root_dir / "recordings"
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    root = AsyncTk()
+    # Show the window before anything heavy loads
+    root = tk.Tk()
     root.title("Simple Audio Looper")
+    root.protocol("WM_DELETE_WINDOW", root.quit)  # Replaced by the GUI's handler once it exists
+    root.update()
+    startup.mark("window_shown")
 
-    def signal_handler():
+    bridge = TkAsyncBridge(root)
+    bridge.start()
+
+    def signal_handler(signum, frame):
         logger.info("Received termination signal")
-        root.on_closing()
+        # Close the same way the window manager would
+        root.tk.eval(root.protocol("WM_DELETE_WINDOW"))
 
-    # Set up signal handlers
     for sig in (signal.SIGINT, signal.SIGTERM):
-        signal.signal(sig, lambda signum, frame: signal_handler())
-
-    async with AsyncAudioHandler() as audio_handler:
-        looper_gui = AudioLooperGUI(output_dir, root, audio_handler)
-        root.protocol("WM_DELETE_WINDOW", looper_gui.on_closing)
-        
-        # Run the Tkinter event loop and our async code concurrently
-        try:
-            await asyncio.gather(
-                root.update_async(),
-                looper_gui.run_async(),
-                return_exceptions=True
-            )
-        except asyncio.CancelledError:
-            logger.info("Tasks cancelled during shutdown")
-        except Exception as e:
-            logger.error(f"Error in main loop: {e}")
-        finally:
-            logger.info("Main function completed")
+        signal.signal(sig, signal_handler)
+    # Tk sleeps in C, so a signal must also wake it before the handler can run
+    if bridge.wakeup_fd is not None:
+        signal.set_wakeup_fd(bridge.wakeup_fd)
+
+    bridge.submit(run_engine(root, bridge, output_dir))
+    root.mainloop()
+    bridge.stop()
+
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
-    except asyncio.CancelledError:
-        logger.info("Application shut down successfully")
+        main()
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
     finally:
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
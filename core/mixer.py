@@ -0,0 +1,253 @@
+import numpy as np
+from instrumentation import metrics
+from loop_registry import LoopRegistry
+from transport import Transport
+
+INT16_FULL_SCALE = 32767.0
+
+
+class SoftLimiter:
+    """
+    Peak limiter with smoothly moving gain, followed by a soft clipper.
+
+    The gain only changes along precomputed curves. It moves toward its target
+    on a short exponential attack when a block would exceed the ceiling, and
+    recovers linearly over `release_ms`. This avoids the block-to-block pumping
+    of rescaling every block by its own peak. Anything the attack lets past the
+    knee is bent back under full scale by a tanh curve instead of wrapping.
+    Every buffer is allocated up front, so steady-state processing does not
+    touch the heap.
+    """
+
+    def __init__(self, rate: int = 44100, ceiling: float = 0.89, attack_ms: float = 1.5, release_ms: float = 250.0):
+        self.rate = rate
+        self.ceiling = ceiling * INT16_FULL_SCALE
+        self.knee = self.ceiling
+        self.attack_samples = max(1.0, attack_ms * rate / 1000)
+        self.release_samples = max(1.0, release_ms * rate / 1000)
+        self.gain = 1.0
+        self._frames = 0
+
+    def _ensure_buffers(self, frames: int):
+        if frames == self._frames:
+            return
+        n = np.arange(frames, dtype=np.float32)
+        self._attack_curve = np.exp(-n / np.float32(self.attack_samples)).astype(np.float32)
+        self._release_curve = (1 - n / frames).astype(np.float32)
+        self._envelope = np.empty(frames, dtype=np.float32)
+        self._scratch = np.empty(frames, dtype=np.float32)
+        self._frames = frames
+
+    def process(self, bus: np.ndarray):
+        """Limit `bus` (float32 in int16 scale) in place."""
+        frames = len(bus)
+        self._ensure_buffers(frames)
+        envelope = self._envelope
+
+        np.abs(bus, out=envelope)
+        peak = float(envelope.max()) if frames else 0.0
+        target = min(1.0, self.ceiling / peak) if peak > 0 else 1.0
+
+        start_gain = self.gain
+        if target < start_gain:
+            end_gain, curve = target, self._attack_curve
+        else:
+            end_gain = min(target, start_gain + frames / self.release_samples)
+            curve = self._release_curve
+        self.gain = end_gain
+
+        if start_gain != 1.0 or end_gain != 1.0:
+            np.multiply(curve, start_gain - end_gain, out=envelope)
+            envelope += end_gain
+            bus *= envelope
+
+        if peak * max(start_gain, end_gain) > self.knee:
+            self._soft_clip(bus)
+
+    def _soft_clip(self, bus: np.ndarray):
+        over = self._envelope
+        bent = self._scratch
+        headroom = INT16_FULL_SCALE - self.knee
+
+        # over = max(|x| - knee, 0); x -= sign(x) * (over - headroom * tanh(over / headroom))
+        np.abs(bus, out=over)
+        over -= self.knee
+        np.maximum(over, 0, out=over)
+        np.divide(over, headroom, out=bent)
+        np.tanh(bent, out=bent)
+        bent *= headroom
+        np.subtract(over, bent, out=over)
+        np.copysign(over, bus, out=over)
+        bus -= over
+
+
+class LoopMixer:
+    """
+    Mixes every playing loop straight from memory.
+
+    Loops live in a struct-of-arrays LoopRegistry with their PCM packed into
+    one int16 arena. Loops have no play heads of their own: each is anchored on
+    the shared Transport, and plays sample (sample_time - anchor) mod length.
+    Each playing loop owns one row of a persistent matrix of arena positions
+    covering the next block. An output block is one clock read, a single
+    gather of that matrix from the arena and one gain-weighted dot product
+    into a float32 bus that the limiter brings back to int16. The matrix is
+    then advanced in place, with wrap-around at each loop's end, and is only
+    recomputed from the clock when it no longer matches the block being mixed.
+    Loops still in a loaded session's base segment take the rows at the top
+    of the matrix and are gathered from that segment instead.
+
+    Every per-block operation works on arrays of identical shape with `out=`.
+    Broadcasting would make NumPy allocate iterator buffers, and take's default
+    mode copies `out`, so both are avoided. Buffers are only rebuilt when a loop
+    is toggled or the block size changes, so steady-state mixing does not
+    allocate.
+    """
+
+    def __init__(self, rate: int = 44100, transport: Transport | None = None, loops: LoopRegistry | None = None):
+        self.transport = transport or Transport(rate)
+        self.loops = loops if loops is not None else LoopRegistry()
+        self._active = np.zeros(0, dtype=np.int64)
+        self._base_rows = 0
+        self._frames = 0
+        self._next_time = 0
+        self._bus = np.zeros(0, dtype=np.float32)
+        self._out = np.zeros(0, dtype=np.int16)
+        self.limiter = SoftLimiter(rate)
+
+    def __len__(self) -> int:
+        return len(self.loops)
+
+    def add_loop(self, audio_data: np.ndarray, anchor: int | None = None, gain: float = 1.0) -> int:
+        """
+        Add a loop and return its index. New loops start stopped.
+
+        `anchor` is the transport time at which the loop's first sample plays;
+        it defaults to now. A memory-mapped loop is only copied into the arena
+        when it first plays (see LoopRegistry).
+        """
+        return self.loops.add(audio_data, self.transport.sample_time if anchor is None else anchor, gain)
+
+    def set_playing(self, index: int, playing: bool):
+        if playing:
+            self._make_resident(index)
+        # The loop keeps its anchor, so it comes back in phase with the transport
+        self.loops.playing[index] = playing
+        self._update_active()
+
+    def _make_resident(self, index: int):
+        self.loops.make_resident(index)
+
+    def set_anchor(self, index: int, anchor: int):
+        self.loops.anchors[index] = anchor
+        self._update_active()
+
+    def set_gain(self, index: int, gain: float):
+        self.loops.gains[index] = gain
+        self._update_active()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def is_playing(self, index: int) -> bool:
+        return bool(self.loops.playing[index])
+
+    def stop_all(self):
+        self.loops.playing[:] = False
+        self._update_active()
+
+    def assign(self, arena: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, anchors: np.ndarray,
+               gains: np.ndarray):
+        """Replace the whole loop table at once, with every loop playing. Used by mixing workers."""
+        self.loops.assign(arena, offsets, lengths, anchors, gains)
+        self._update_active()
+
+    def adopt(self, loops: LoopRegistry):
+        """Replace every loop with those in `loops`, such as a loaded session, keeping their play state."""
+        self.loops = loops
+        self._update_active()
+
+    def set_arena(self, arena: np.ndarray):
+        """Swap in a relocated copy of the same arena; loop offsets stay valid."""
+        self.loops.set_arena(arena)
+        self._arena = self.loops.arena
+        self._frames = 0
+
+    def positions(self) -> np.ndarray:
+        """Where each loop plays at the current transport time, whether or not it is playing."""
+        lengths = np.maximum(self.loops.lengths, 1)
+        return (self.transport.sample_time - self.loops.anchors) % lengths
+
+    def close(self):
+        pass
+
+    def _update_active(self):
+        active = self.loops.active()
+        # Base-segment loops first, so each segment is gathered by one contiguous block of rows
+        in_base = self.loops.in_base[active]
+        self._active = np.concatenate((active[in_base], active[~in_base]))
+        self._base_rows = int(np.count_nonzero(in_base))
+        self._frames = 0  # Rebuild the position matrix on the next mix
+
+    def _build_positions(self, frames: int, sample_time: int):
+        active = self._active
+        loops = len(active)
+        lengths = self.loops.lengths[active, None]
+        offsets = self.loops.offsets[active, None]
+        self._positions = (sample_time - self.loops.anchors[active, None] + np.arange(frames)) % lengths + offsets
+        self._length_matrix = np.repeat(lengths, frames, axis=1)
+        self._offset_matrix = np.repeat(offsets, frames, axis=1)
+        self._gathered = np.empty((loops, frames), dtype=np.int16)
+        self._stack = np.empty((loops, frames), dtype=np.float32)
+        self._active_gains = self.loops.gains[active]
+        split = self._base_rows
+        self._base_positions, self._arena_positions = self._positions[:split], self._positions[split:]
+        self._base_gathered, self._arena_gathered = self._gathered[:split], self._gathered[split:]
+        self._base = self.loops.base
+        self._arena = self.loops.arena
+        self._frames = frames
+
+    def accumulate(self, frames: int, out: np.ndarray, sample_time: int):
+        """Sum `frames` samples of every playing loop, starting at transport time `sample_time`, into `out` (float32)."""
+        if not len(self._active):
+            out[:] = 0
+            return
+        if frames != self._frames or sample_time != self._next_time:
+            self._build_positions(frames, sample_time)
+        self._next_time = sample_time + frames
+
+        positions = self._positions
+        if self._base_rows:
+            np.take(self._base, self._base_positions, out=self._base_gathered, mode="clip")
+        if len(self._arena_positions):
+            np.take(self._arena, self._arena_positions, out=self._arena_gathered, mode="clip")
+        np.copyto(self._stack, self._gathered)
+        np.dot(self._active_gains, self._stack, out=out)
+
+        positions -= self._offset_matrix
+        positions += frames
+        np.remainder(positions, self._length_matrix, out=positions)
+        positions += self._offset_matrix
+
+    def mix(self, frames: int) -> np.ndarray | None:
+        """
+        Return the next `frames` samples of every playing loop, mixed and limited to int16.
+
+        Advances the transport by `frames` even when nothing plays. The returned
+        array is reused by the next call; copy it (or call tobytes) to keep it.
+        """
+        sample_time = self.transport.advance(frames)
+        if not len(self._active):
+            return None
+        if frames != len(self._out):
+            self._bus = np.empty(frames, dtype=np.float32)
+            self._out = np.empty(frames, dtype=np.int16)
+
+        bus = self._bus
+        self.accumulate(frames, bus, sample_time)
+        with metrics.stage("limiter"):
+            self.limiter.process(bus)
+        np.rint(bus, out=bus)
+        np.copyto(self._out, bus, casting="unsafe")
+        return self._out
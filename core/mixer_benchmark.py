@@ -0,0 +1,191 @@
+"""
+Throughput and latency benchmark for the playback hot path.
+
+Runs LooperEngine.play_block, one turn of continuous_playback (the mix
+stage with its limiter, then a write into the handler's output ring), on an
+engine with synthetic loops. A MemoryBackend callback stream drains the
+ring. Reports machine-readable JSON, e.g.:
+
+    python mixer_benchmark.py --output bench.json
+    python mixer_benchmark.py --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import logging
+from typing import Dict, Any, List
+import numpy as np
+from audio_backends import MemoryBackend
+from audio_handler import AsyncAudioHandler, CHUNK_SIZE, RATE
+from looper_engine import LooperEngine
+
+logger = logging.getLogger(__name__)
+
+LOOP_COUNTS = [1, 8, 64, 256, 1024]
+DEADLINE_MS = CHUNK_SIZE / RATE * 1000
+MAX_SEARCH_LOOPS = 8192
+
+
+def make_engine(handler: AsyncAudioHandler, output_dir: pathlib.Path, loop_count: int, seed: int = 0,
+                workers: int = 0) -> LooperEngine:
+    """Build an engine with `loop_count` playing loops of 0.25 - 1 s of noise."""
+    rng = np.random.default_rng(seed)
+    engine = LooperEngine(output_dir, handler, mix_workers=workers)
+    for _ in range(loop_count):
+        length = int(rng.integers(RATE // 4, RATE))
+        index = engine.mixer.add_loop(rng.integers(-3000, 3000, length, dtype=np.int16))
+        engine.mixer.set_playing(index, True)
+    return engine
+
+
+async def _run_blocks(engine: LooperEngine, blocks: int) -> np.ndarray:
+    latencies = np.empty(blocks)
+    for i in range(blocks):
+        start = time.perf_counter()
+        await engine.play_block()
+        latencies[i] = time.perf_counter() - start
+        engine.audio_handler.output_stream.process_block()
+    return latencies
+
+
+async def _measure_allocations(engine: LooperEngine, blocks: int) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(blocks):
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            await _run_blocks(engine, 1)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+        snapshot_blocks = len(tracemalloc.take_snapshot().traces)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_bytes_per_block": float(np.median(peaks)), "live_traced_blocks": snapshot_blocks}
+
+
+async def bench_loop_count(loop_count: int, blocks: int, warmup: int = 10,
+                           measure_allocations: bool = True, workers: int = 0) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as output_dir:
+        async with AsyncAudioHandler(backend=MemoryBackend()) as handler:
+            engine = make_engine(handler, pathlib.Path(output_dir), loop_count, workers=workers)
+            try:
+                await _run_blocks(engine, warmup)
+                started = time.perf_counter()
+                latencies = await _run_blocks(engine, blocks)
+                elapsed = time.perf_counter() - started
+                allocations = await _measure_allocations(engine, 20) if measure_allocations else {}
+                underruns = handler.output_ring.underruns
+            finally:
+                engine.mixer.close()
+
+    latencies_ms = latencies * 1000
+    result = {
+        "loops": loop_count,
+        "blocks": blocks,
+        "blocks_per_sec": blocks / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+        "underruns": underruns,
+        "meets_deadline": bool(np.percentile(latencies_ms, 99) < DEADLINE_MS),
+    }
+    result.update(allocations)
+    return result
+
+
+async def find_max_loops(results: List[Dict[str, Any]], blocks: int, workers: int = 0) -> int:
+    """Largest loop count whose p99 block time stays inside one block's deadline."""
+    passing = [r["loops"] for r in results if r["meets_deadline"]]
+    failing = [r["loops"] for r in results if not r["meets_deadline"]]
+    low = max(passing, default=0)
+    high = min(failing, default=None)
+
+    if high is None:
+        # Everything passed: keep doubling until we miss the deadline
+        high = max(low, 1) * 2
+        while high <= MAX_SEARCH_LOOPS and (await bench_loop_count(high, blocks, measure_allocations=False, workers=workers))["meets_deadline"]:
+            low, high = high, high * 2
+        if high > MAX_SEARCH_LOOPS:
+            return low
+
+    while high - low > max(1, low // 20):
+        middle = (low + high) // 2
+        if (await bench_loop_count(middle, blocks, measure_allocations=False, workers=workers))["meets_deadline"]:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+async def run_benchmarks(loop_counts: List[int], blocks: int, search: bool = True, workers: int = 0) -> Dict[str, Any]:
+    results = []
+    for loop_count in loop_counts:
+        result = await bench_loop_count(loop_count, blocks, workers=workers)
+        logger.info(f"{loop_count:5d} loops: {result['blocks_per_sec']:9.1f} blocks/s, "
+                    f"p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms, max {result['max_ms']:.3f} ms")
+        results.append(result)
+
+    report = {
+        "chunk_size": CHUNK_SIZE,
+        "rate": RATE,
+        "deadline_ms": DEADLINE_MS,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "mix_workers": workers,
+        "results": results,
+    }
+    if search:
+        report["max_loops_within_deadline"] = await find_max_loops(results, blocks, workers)
+    return report
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every loop count whose throughput dropped by more than `tolerance`."""
+    previous = {r["loops"]: r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result["loops"])
+        if old and result["blocks_per_sec"] < old["blocks_per_sec"] * (1 - tolerance):
+            regressions.append(f"{result['loops']} loops: {old['blocks_per_sec']:.1f} -> "
+                               f"{result['blocks_per_sec']:.1f} blocks/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loop mixer hot path")
+    parser.add_argument("--loops", type=int, nargs="+", default=LOOP_COUNTS)
+    parser.add_argument("--blocks", type=int, default=500, help="Measured blocks per loop count")
+    parser.add_argument("--no-search", action="store_true", help="Skip the max-loops-per-core search")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=0, help="Benchmark ParallelLoopMixer with this many workers")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmarks(args.loops, args.blocks, search=not args.no_search, workers=args.workers))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
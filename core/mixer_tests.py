@@ -0,0 +1,193 @@
+import pathlib
+import tracemalloc
+import wave
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from mixer import LoopMixer
+from wav_io import memmap_wav
+from parallel_mixer import INITIAL_ARENA_SAMPLES, ParallelLoopMixer
+
+
+def test_mix_wraps_each_loop_independently():
+    mixer = LoopMixer()
+    a = mixer.add_loop(np.array([1, 2, 3], dtype=np.int16))
+    b = mixer.add_loop(np.array([10, 20, 30, 40, 50], dtype=np.int16))
+    mixer.set_playing(a, True)
+    mixer.set_playing(b, True)
+
+    first = mixer.mix(4).copy()
+    second = mixer.mix(4).copy()
+
+    np.testing.assert_array_equal(first, [11, 22, 33, 41])
+    np.testing.assert_array_equal(second, [52, 13, 21, 32])
+
+
+def test_mix_skips_stopped_loops_and_returns_none_when_silent():
+    mixer = LoopMixer()
+    a = mixer.add_loop(np.full(8, 100, dtype=np.int16))
+    b = mixer.add_loop(np.full(8, 7, dtype=np.int16))
+    assert mixer.mix(4) is None
+
+    mixer.set_playing(b, True)
+    np.testing.assert_array_equal(mixer.mix(4), [7, 7, 7, 7])
+    assert not mixer.is_playing(a)
+
+
+def test_toggled_loop_resumes_in_phase_with_transport():
+    mixer = LoopMixer()
+    a = mixer.add_loop(np.arange(1, 11, dtype=np.int16))
+    mixer.set_playing(a, True)
+    mixer.mix(3)
+
+    mixer.set_playing(a, False)
+    assert mixer.mix(4) is None  # The transport keeps counting while the loop is off
+    mixer.set_playing(a, True)
+
+    assert mixer.transport.sample_time == 7
+    np.testing.assert_array_equal(mixer.mix(5), [8, 9, 10, 1, 2])
+
+
+def test_registry_grows_in_place_and_gains_weight_the_mix():
+    mixer = LoopMixer()
+    for value in range(1, 41):
+        mixer.add_loop(np.full(3000, value, dtype=np.int16))
+    assert len(mixer) == 40
+    np.testing.assert_array_equal(mixer.loops.audio(39), 40)
+
+    mixer.set_playing(0, True)
+    mixer.set_playing(39, True)
+    mixer.set_gain(39, 0.5)
+    np.testing.assert_array_equal(mixer.mix(8), 21)
+
+
+def test_mapped_loop_stays_a_view_of_its_file_until_it_plays(tmp_path):
+    take = np.arange(1, 2001, dtype=np.int16)
+    with wave.open(str(tmp_path / "take.wav"), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(take.tobytes())
+    mixer = LoopMixer()
+    index = mixer.add_loop(memmap_wav(tmp_path / "take.wav")[0], anchor=0)
+
+    audio = mixer.loops.audio(index)
+    assert isinstance(audio, np.memmap) and pathlib.Path(audio.filename) == (tmp_path / "take.wav").resolve()
+    assert len(mixer.loops.arena) == 0
+    np.testing.assert_array_equal(mixer.positions(), [0])
+
+    mixer.set_playing(index, True)
+    assert mixer.loops.is_resident(index) and len(mixer.loops.arena) == len(take)
+    np.testing.assert_array_equal(mixer.mix(4), [1, 2, 3, 4])
+
+
+def test_limiter_settles_at_ceiling_without_wrapping():
+    mixer = LoopMixer()
+    for _ in range(4):
+        mixer.set_playing(mixer.add_loop(np.full(4096, 30000, dtype=np.int16)), True)
+
+    mixed = mixer.mix(1024).astype(np.int32)
+    ceiling = mixer.limiter.ceiling
+
+    assert mixed.dtype == np.int32 and (mixed > 0).all()
+    assert mixed.max() <= 32767
+    np.testing.assert_allclose(mixed[-100:], ceiling, atol=1)
+
+    # Gain holds steady across blocks instead of being recomputed per block
+    np.testing.assert_allclose(mixer.mix(1024), ceiling, atol=1)
+
+
+def test_mix_does_not_allocate_in_steady_state():
+    rng = np.random.default_rng(0)
+    mixer = LoopMixer()
+    for _ in range(16):
+        mixer.set_playing(mixer.add_loop(rng.integers(-20000, 20000, 5000, dtype=np.int16)), True)
+    mixer.mix(1024)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(10):
+            mixer.mix(1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Only NumPy's small reduction scratch, never a block-sized buffer (1024 float32 = 4 KiB)
+    assert peak - baseline < 4096
+
+
+def test_parallel_mixer_matches_serial_mix():
+    rng = np.random.default_rng(1)
+    loops = [rng.integers(-3000, 3000, int(n), dtype=np.int16) for n in rng.integers(300, 900, 6)]
+    serial = LoopMixer()
+    parallel = ParallelLoopMixer(workers=2, max_frames=256)
+    try:
+        for mixer in (serial, parallel):
+            for loop in loops:
+                mixer.set_playing(mixer.add_loop(loop), True)
+        for block in range(6):
+            if block == 3:
+                for mixer in (serial, parallel):
+                    mixer.set_playing(1, False)
+                    mixer.set_playing(mixer.add_loop(loops[0]), True)
+            np.testing.assert_allclose(parallel.mix(256), serial.mix(256), atol=1)
+    finally:
+        parallel.close()
+
+
+def test_parallel_mixer_survives_arena_growth_during_playback():
+    rng = np.random.default_rng(2)
+    loops = [rng.integers(-3000, 3000, n, dtype=np.int16) for n in (500, 700, 900)]
+    # Bigger than the whole initial arena, so it moves to a new segment mid-playback
+    big = rng.integers(-3000, 3000, INITIAL_ARENA_SAMPLES + 1000, dtype=np.int16)
+    serial = LoopMixer()
+    parallel = ParallelLoopMixer(workers=2, max_frames=256)
+    try:
+        for mixer in (serial, parallel):
+            for loop in loops:
+                mixer.set_playing(mixer.add_loop(loop), True)
+        for block in range(6):
+            for mixer in (serial, parallel):
+                if block == 2:
+                    # Added stopped, as preloaded takes are: the workers mix on with the moved arena
+                    big_index = mixer.add_loop(big)
+                elif block == 4:
+                    mixer.set_playing(big_index, True)
+            np.testing.assert_allclose(parallel.mix(256), serial.mix(256), atol=1)
+        assert all(process.is_alive() for process in parallel._processes)
+    finally:
+        parallel.close()
+
+
+def test_parallel_mixer_falls_back_in_process_when_a_worker_dies():
+    rng = np.random.default_rng(3)
+    loops = [rng.integers(-3000, 3000, n, dtype=np.int16) for n in (400, 600, 800)]
+    serial = LoopMixer()
+    parallel = ParallelLoopMixer(workers=2, max_frames=256)
+    arena_name, partial_name = parallel.loops.shm.name, parallel._partial_shm.name
+    try:
+        for mixer in (serial, parallel):
+            for loop in loops:
+                mixer.set_playing(mixer.add_loop(loop), True)
+        np.testing.assert_allclose(parallel.mix(256), serial.mix(256), atol=1)
+
+        parallel._processes[0].kill()
+        parallel._processes[0].join()
+        big = rng.integers(-3000, 3000, INITIAL_ARENA_SAMPLES, dtype=np.int16)
+        for block in range(4):
+            if block == 2:
+                # Toggles and arena growth keep working without workers
+                for mixer in (serial, parallel):
+                    mixer.set_playing(mixer.add_loop(big), True)
+            np.testing.assert_allclose(parallel.mix(256), serial.mix(256), atol=1)
+        assert not parallel._processes
+    finally:
+        parallel.close()
+    for name in (arena_name, partial_name, parallel.loops.shm.name):
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,83 @@
+import argparse
+import pathlib
+import wave
+import logging
+from typing import Sequence
+import numpy as np
+from audio_convert import load_for_engine
+from mixer import LoopMixer
+from parallel_mixer import ParallelLoopMixer
+
+logger = logging.getLogger(__name__)
+
+RATE = 44100
+RENDER_BLOCK_SIZE = 16384
+
+
+class OfflineRenderer:
+    """
+    Renders a set of loops straight to a WAV file without an audio device.
+
+    Uses the same LoopMixer as live playback, but with large blocks and no
+    real-time pacing, so a session bounces as fast as the CPU can mix it.
+    """
+
+    def __init__(self, rate: int = RATE, block_size: int = RENDER_BLOCK_SIZE, workers: int = 0):
+        self.rate = rate
+        self.block_size = block_size
+        self.mixer = ParallelLoopMixer(rate, workers=workers, max_frames=block_size) if workers else LoopMixer(rate)
+
+    def add_loop(self, filename: pathlib.Path, playing: bool = True) -> int:
+        index = self.mixer.add_loop(self._load_wav(filename))
+        self.mixer.set_playing(index, playing)
+        return index
+
+    def _load_wav(self, filename: pathlib.Path) -> np.ndarray:
+        return load_for_engine(filename, self.rate)
+
+    def render(self, output_path: pathlib.Path, duration: float) -> pathlib.Path:
+        total_frames = int(round(duration * self.rate))
+        silence = np.zeros(self.block_size, dtype=np.int16)
+        with wave.open(str(output_path), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.rate)
+            rendered = 0
+            while rendered < total_frames:
+                frames = min(self.block_size, total_frames - rendered)
+                mixed_audio = self.mixer.mix(frames)
+                block = silence[:frames] if mixed_audio is None else mixed_audio
+                wf.writeframes(block.tobytes())
+                rendered += frames
+        logger.info(f"Rendered {duration:.2f}s to {output_path}")
+        return output_path
+
+
+def render_session(loop_files: Sequence[pathlib.Path], playing: Sequence[bool], duration: float,
+                   output_path: pathlib.Path, block_size: int = RENDER_BLOCK_SIZE, workers: int = 0) -> pathlib.Path:
+    """Mix `loop_files` (with their on/off state) for `duration` seconds into `output_path`."""
+    renderer = OfflineRenderer(block_size=block_size, workers=workers)
+    try:
+        for filename, is_playing in zip(loop_files, playing):
+            renderer.add_loop(filename, is_playing)
+        return renderer.render(output_path, duration)
+    finally:
+        renderer.mixer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounce loops to a WAV file without a sound card")
+    parser.add_argument("output", type=pathlib.Path)
+    parser.add_argument("loops", type=pathlib.Path, nargs="+")
+    parser.add_argument("--duration", type=float, required=True, help="Length of the render in seconds")
+    parser.add_argument("--mute", type=int, nargs="*", default=[], help="Indexes of loops to render as off")
+    parser.add_argument("--block-size", type=int, default=RENDER_BLOCK_SIZE)
+    parser.add_argument("--workers", type=int, default=0, help="Mix in this many worker processes")
+    args = parser.parse_args()
+
+    playing = [index not in args.mute for index in range(len(args.loops))]
+    render_session(args.loops, playing, args.duration, args.output, args.block_size, args.workers)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,61 @@
+import wave
+import numpy as np
+import pytest
+from audio_convert import load_for_engine
+from mixer import LoopMixer
+from offline_renderer import render_session
+
+RATE = 44100
+BLOCK = 1024
+
+
+def _write_wav(path, frames: np.ndarray, rate: int):
+    frames = frames.reshape(len(frames), -1)
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(frames.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(frames.astype("<i2").tobytes())
+
+
+def _read_wav(path):
+    with wave.open(str(path), "rb") as wf:
+        assert (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) == (1, 2, RATE)
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def test_render_matches_live_mix_including_converted_loops(tmp_path):
+    rng = np.random.default_rng(0)
+    native = tmp_path / "native.wav"
+    _write_wav(native, rng.integers(-4000, 4000, 3001), RATE)
+    # Stereo at half the rate goes through load_for_engine's conversion
+    converted = tmp_path / "converted.wav"
+    t = np.arange(1500) / 22050
+    _write_wav(converted, np.repeat((3000 * np.sin(2 * np.pi * 330 * t))[:, None], 2, axis=1), 22050)
+    muted = tmp_path / "muted.wav"
+    _write_wav(muted, np.full(700, 9000), RATE)
+
+    duration = 0.1  # 4410 frames: four full blocks and a partial one
+    output = render_session([native, converted, muted], [True, True, False], duration, tmp_path / "bounce.wav",
+                            block_size=BLOCK)
+    rendered = _read_wav(output)
+
+    mixer = LoopMixer(RATE)
+    for filename, playing in ((native, True), (converted, True), (muted, False)):
+        mixer.set_playing(mixer.add_loop(load_for_engine(filename, RATE)), playing)
+    expected = np.concatenate([mixer.mix(min(BLOCK, 4410 - start)).copy() for start in range(0, 4410, BLOCK)])
+
+    assert len(rendered) == round(duration * RATE)
+    np.testing.assert_array_equal(rendered, expected)
+    assert len(load_for_engine(converted, RATE)) == 3000
+
+
+def test_render_with_nothing_playing_is_silent(tmp_path):
+    _write_wav(tmp_path / "loop.wav", np.full(500, 1000), RATE)
+    output = render_session([tmp_path / "loop.wav"], [False], 0.05, tmp_path / "bounce.wav", block_size=BLOCK)
+    rendered = _read_wav(output)
+    assert len(rendered) == round(0.05 * RATE) and not rendered.any()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,75 @@
+"""
+Minimal OSC 1.0 message encoding, enough for the looper's control socket.
+
+A message is an address pattern, a type tag string and the arguments, each
+padded to a multiple of four bytes. Integers (i) and floats (f) are
+big-endian 32-bit, strings (s) are NUL-terminated, and T/F are booleans with
+no payload. Bundles and blobs are not supported.
+"""
+import struct
+from typing import List, Tuple, Union
+
+Argument = Union[int, float, str, bool]
+
+
+def _pad_string(value: str) -> bytes:
+    data = value.encode() + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    end = data.find(b"\0", offset)
+    if end < 0:
+        raise ValueError("Malformed OSC message: unterminated string")
+    return data[offset:end].decode(), end + 1 + (-(end + 1 - offset) % 4)
+
+
+def encode_message(address: str, *args: Argument) -> bytes:
+    tags = ","
+    payload = b""
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += "T" if arg else "F"
+        elif isinstance(arg, int):
+            tags += "i"
+            payload += struct.pack(">i", arg)
+        elif isinstance(arg, float):
+            tags += "f"
+            payload += struct.pack(">f", arg)
+        elif isinstance(arg, str):
+            tags += "s"
+            payload += _pad_string(arg)
+        else:
+            raise TypeError(f"Cannot encode {type(arg).__name__} in an OSC message")
+    return _pad_string(address) + _pad_string(tags) + payload
+
+
+def decode_message(data: bytes) -> Tuple[str, List[Argument]]:
+    """Split a datagram into its address and arguments. Raises ValueError if it is not an OSC message."""
+    try:
+        address, offset = _read_string(data, 0)
+        if not address.startswith("/"):
+            raise ValueError(f"Not an OSC address: {address!r}")
+        if offset >= len(data):
+            return address, []  # Very old senders omit the type tags when there are no arguments
+        tags, offset = _read_string(data, offset)
+        if not tags.startswith(","):
+            raise ValueError(f"Bad OSC type tags: {tags!r}")
+        args: List[Argument] = []
+        for tag in tags[1:]:
+            if tag == "i":
+                args.append(struct.unpack_from(">i", data, offset)[0])
+                offset += 4
+            elif tag == "f":
+                args.append(struct.unpack_from(">f", data, offset)[0])
+                offset += 4
+            elif tag == "s":
+                value, offset = _read_string(data, offset)
+                args.append(value)
+            elif tag in "TF":
+                args.append(tag == "T")
+            else:
+                raise ValueError(f"Unsupported OSC type tag {tag!r}")
+        return address, args
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed OSC message: {e}") from e
@@ -0,0 +1,217 @@
+import contextlib
+import multiprocessing
+import os
+import logging
+from multiprocessing import shared_memory
+from typing import List, Optional
+import numpy as np
+from loop_registry import LoopRegistry
+from mixer import LoopMixer
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOCK_FRAMES = 16384
+INITIAL_ARENA_SAMPLES = 1 << 20
+
+
+def _worker_main(conn, arena_name: str, arena_samples: int, partial_name: str, row: int, max_frames: int):
+    """Mix one share of the playing loops into this worker's row of the partial-sum buffer."""
+    arena_shm = shared_memory.SharedMemory(name=arena_name)
+    partial_shm = shared_memory.SharedMemory(name=partial_name)
+    arena = np.ndarray(arena_samples, dtype=np.int16, buffer=arena_shm.buf)
+    partial = np.ndarray(max_frames, dtype=np.float32, buffer=partial_shm.buf, offset=row * max_frames * 4)
+    mixer = LoopMixer()
+    conn.send(True)  # Attached: the parent may now replace the arena
+    try:
+        while True:
+            command, *args = conn.recv()
+            if command == "mix":
+                frames, sample_time = args
+                mixer.accumulate(frames, partial[:frames], sample_time)
+                conn.send(True)
+            elif command == "loops":
+                offsets, lengths, anchors, gains = args
+                mixer.assign(arena, offsets, lengths, anchors, gains)
+            elif command == "arena":
+                arena_name, arena_samples = args
+                # Attach the new segment first: once the mixer holds no view of the old one, it can be closed
+                new_shm = shared_memory.SharedMemory(name=arena_name)
+                arena = np.ndarray(arena_samples, dtype=np.int16, buffer=new_shm.buf)
+                mixer.set_arena(arena)
+                arena_shm.close()
+                arena_shm = new_shm
+            elif command == "stop":
+                break
+    finally:
+        mixer.assign(np.zeros(0, dtype=np.int16), [], [], [], [])
+        del arena, partial
+        arena_shm.close()
+        partial_shm.close()
+
+
+class SharedLoopRegistry(LoopRegistry):
+    """LoopRegistry whose arena lives in shared memory, so worker processes can map it."""
+
+    shm = None
+
+    def _new_arena(self, samples: int) -> np.ndarray:
+        self._previous_shm, self.shm = self.shm, shared_memory.SharedMemory(create=True, size=max(samples, 1) * 2)
+        return np.ndarray(samples, dtype=np.int16, buffer=self.shm.buf)
+
+    def _resize_arena(self, samples: int):
+        super()._resize_arena(samples)
+        self._previous_shm.close()
+        self._previous_shm.unlink()
+        self._previous_shm = None
+
+    @property
+    def capacity(self) -> int:
+        return len(self._storage)
+
+    def close(self):
+        self._storage = np.zeros(0, dtype=np.int16)
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ParallelLoopMixer(LoopMixer):
+    """
+    LoopMixer that spreads the playing loops over worker processes.
+
+    Loop PCM lives in a shared-memory arena that every worker maps. Each worker
+    keeps its share of loops' positions and sums them into its own row of a
+    shared float32 partial-sum buffer. Per block the parent only sends the
+    block's transport time to each worker, adds the rows together and runs the
+    limiter, so the GIL-bound share of a block stays small however many loops
+    play.
+
+    If a worker dies, the rest are shut down and mixing carries on in-process
+    from the same shared arena, so playback does not stop.
+    """
+
+    def __init__(self, rate: int = 44100, workers: Optional[int] = None, max_frames: int = MAX_BLOCK_FRAMES):
+        super().__init__(rate, loops=SharedLoopRegistry(arena_samples=INITIAL_ARENA_SAMPLES))
+        self.workers = workers or os.cpu_count() or 1
+        self.max_frames = max_frames
+        self._partial_shm = shared_memory.SharedMemory(create=True, size=self.workers * max_frames * 4)
+        self._partials = np.ndarray((self.workers, max_frames), dtype=np.float32, buffer=self._partial_shm.buf)
+        self._assignments: List[np.ndarray] = [np.zeros(0, dtype=np.int64)] * self.workers
+
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for row in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(child_conn, self.loops.shm.name, self.loops.capacity, self._partial_shm.name, row, max_frames),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+        for conn in self._connections:
+            conn.recv()
+
+    def add_loop(self, audio_data: np.ndarray, anchor: Optional[int] = None, gain: float = 1.0) -> int:
+        return self._growing_arena(super().add_loop, audio_data, anchor, gain)
+
+    def _make_resident(self, index: int):
+        self._growing_arena(super()._make_resident, index)
+
+    def _growing_arena(self, add, *args):
+        """Run `add`, which may move the arena to a bigger segment, and point the workers at the new one."""
+        shm = self.loops.shm
+        # The in-process fallback's view would keep the old segment from closing if the arena moves
+        self._release_arena_view()
+        result = add(*args)
+        if self.loops.shm is not shm:
+            # Offsets are unchanged
+            self._broadcast(lambda row: ("arena", self.loops.shm.name, self.loops.capacity))
+        return result
+
+    def adopt(self, loops: LoopRegistry):
+        # Workers can only see loops in the shared arena, so these are copied in
+        for index in range(len(loops)):
+            added = self.add_loop(loops.audio(index), int(loops.anchors[index]), float(loops.gains[index]))
+            if loops.playing[index]:
+                self._make_resident(added)
+                self.loops.playing[added] = True
+        self._update_active()
+
+    def _update_active(self):
+        super()._update_active()
+        # Deal loops out round-robin so long and short loops spread evenly
+        loops = self.loops
+        self._assignments = [self._active[row::self.workers] for row in range(self.workers)]
+
+        def message(row):
+            assigned = self._assignments[row]
+            return ("loops", loops.offsets[assigned], loops.lengths[assigned], loops.anchors[assigned],
+                    loops.gains[assigned])
+
+        self._broadcast(message)
+
+    def _broadcast(self, message):
+        try:
+            for row, conn in enumerate(self._connections):
+                conn.send(message(row))
+        except (EOFError, OSError) as e:
+            self._lose_workers(e)
+
+    def _lose_workers(self, error: Exception):
+        """A worker died: stop the others and mix in-process from now on."""
+        logger.error(f"Mixing worker failed ({error!r}); mixing in-process from now on")
+        connections, self._connections = self._connections, []
+        for conn in connections:
+            with contextlib.suppress(OSError):
+                conn.send(("stop",))
+            conn.close()
+        self._stop_processes()
+        self._frames = 0  # The in-process path builds its own position matrix
+
+    def accumulate(self, frames: int, out: np.ndarray, sample_time: int):
+        if not self._connections:
+            return super().accumulate(frames, out, sample_time)
+        if frames > self.max_frames:
+            raise ValueError(f"Block of {frames} frames exceeds the shared buffer ({self.max_frames})")
+        busy = [row for row, assigned in enumerate(self._assignments) if len(assigned)]
+        try:
+            for row in busy:
+                self._connections[row].send(("mix", frames, sample_time))
+            for row in busy:
+                self._connections[row].recv()
+        except (EOFError, OSError) as e:
+            self._lose_workers(e)
+            return super().accumulate(frames, out, sample_time)
+        if busy:
+            np.sum(self._partials[busy[0]:busy[-1] + 1, :frames], axis=0, out=out)
+        else:
+            out[:] = 0
+
+    def _release_arena_view(self):
+        self._arena = None
+        self._frames = 0
+
+    def _stop_processes(self):
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def close(self):
+        try:
+            for conn in self._connections:
+                with contextlib.suppress(OSError):
+                    conn.send(("stop",))
+            self._connections = []
+            self._stop_processes()
+        finally:
+            self._partials = None
+            self._release_arena_view()
+            try:
+                self.loops.close()
+            finally:
+                self._partial_shm.close()
+                self._partial_shm.unlink()
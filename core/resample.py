@@ -0,0 +1,68 @@
+"""
+Polyphase sample-rate conversion in NumPy.
+
+The rate ratio is reduced to up/down (44100/48000 is 147/160). Output frame
+n sits at input position n * down / up, and every output frame with the same
+fractional position uses the same set of filter taps. Those frames are evenly
+spaced, so for each of the `up` phases the work is one strided window view
+of the input times one tap vector, and no per-sample Python runs. The filter
+is a Kaiser-windowed sinc with its cutoff just below the lower of the two
+Nyquist frequencies.
+"""
+import math
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+ROLLOFF = 0.95
+
+
+@lru_cache(maxsize=16)
+def _filter_bank(up: int, down: int) -> np.ndarray:
+    """Taps for each of the `up` phases, shape (up, taps); each row sums to 1."""
+    cutoff = ROLLOFF * min(1.0, up / down)
+    half = math.ceil(ZERO_CROSSINGS / cutoff)
+    taps = 2 * half
+    phases = np.arange(up)[:, None] / up
+    # Distance from each output position to the inputs it is made of, in input samples
+    t = phases + (half - 1) - np.arange(taps)[None, :]
+    window = np.i0(KAISER_BETA * np.sqrt(np.clip(1 - (t / half) ** 2, 0, None))) / np.i0(KAISER_BETA)
+    bank = cutoff * np.sinc(cutoff * t) * window
+    return bank / bank.sum(axis=1, keepdims=True)
+
+
+def resampled_length(frames: int, from_rate: int, to_rate: int) -> int:
+    return -(-frames * to_rate // from_rate)
+
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """
+    Convert float `samples` (frames, or frames x channels) from `from_rate` to `to_rate`.
+
+    The output has resampled_length(...) frames and float64 samples.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    if from_rate == to_rate:
+        return samples.copy()
+    if samples.ndim == 2:
+        return np.stack([resample(channel, from_rate, to_rate) for channel in samples.T], axis=1)
+
+    divisor = math.gcd(from_rate, to_rate)
+    up, down = to_rate // divisor, from_rate // divisor
+    bank = _filter_bank(up, down)
+    taps = bank.shape[1]
+    half = taps // 2
+    frames_out = resampled_length(len(samples), from_rate, to_rate)
+
+    # Output n reads input (n * down // up) - half + 1 ... + half, so pad both ends with silence
+    padded = np.zeros(len(samples) + taps + down, dtype=np.float64)
+    padded[half - 1:half - 1 + len(samples)] = samples
+    windows = sliding_window_view(padded, taps)
+    out = np.empty(frames_out, dtype=np.float64)
+    for phase_start in range(min(up, frames_out)):
+        first_input, phase = divmod(phase_start * down, up)
+        count = len(range(phase_start, frames_out, up))
+        out[phase_start::up] = windows[first_input:first_input + count * down:down] @ bank[phase]
+    return out
@@ -0,0 +1,147 @@
+import asyncio
+import numpy as np
+
+
+class BlockRingBuffer:
+    """
+    Single-producer / single-consumer sample ring.
+
+    The producer (the asyncio mixer) only ever advances `_write_pos` and the
+    consumer (the PortAudio callback thread) only ever advances `_read_pos`.
+    Both are plain ints that grow forever, so each side can read the other's
+    position without a lock and no slot is ever shared mid-update.
+    """
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+        self.underruns = 0
+
+    @property
+    def available(self) -> int:
+        return self._write_pos - self._read_pos
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.available
+
+    def write(self, samples: np.ndarray) -> int:
+        """Copy as many samples as fit and return how many were written."""
+        count = min(len(samples), self.free)
+        start = self._write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:count - first] = samples[first:count]
+        self._write_pos += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Fill `out` from the ring, padding with silence on underrun."""
+        count = min(len(out), self.available)
+        start = self._read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        out[first:count] = self._buffer[:count - first]
+        if count < len(out):
+            out[count:] = 0
+            self.underruns += 1
+        self._read_pos += count
+        return count
+
+
+class CaptureRing:
+    """
+    Fixed-size ring the input stream writes into for as long as it runs.
+
+    Positions count every sample captured since the stream opened and never
+    wrap, so readers ask for a span by position and get views of the buffer
+    without a copy. The last `capacity` samples are always kept, which is what
+    lets a take start before the record command. Views stay valid until the
+    producer laps them, `capacity` samples later.
+
+    Each block also keeps where it sits on the output timeline, so audio that
+    was captured earlier can still be lined up with the transport.
+
+    There is one producer (the input stream's thread), which writes a block at
+    a time. Readers run on the event loop. A producer that gives up calls
+    `close`, which fails every reader waiting for samples that will not come.
+    """
+
+    def __init__(self, capacity: int, block: int, dtype=np.int16):
+        blocks = -(-capacity // block)
+        self.block = block
+        self.capacity = blocks * block
+        self._buffer = np.zeros(self.capacity, dtype=dtype)
+        self._times = np.zeros(blocks, dtype=np.int64)
+        self.written = 0
+        self.error: Exception | None = None
+        self._waiters = []
+
+    @property
+    def oldest(self) -> int:
+        """Position of the oldest sample still in the ring."""
+        return max(self.written - self.capacity, 0)
+
+    def write(self, samples: np.ndarray, output_time: int):
+        """Append a block captured when the output timeline stood at `output_time`, waking any readers."""
+        position = self.written
+        start = position % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:len(samples) - first] = samples[first:]
+        self._times[(position // self.block) % len(self._times)] = output_time - position % self.block
+        # Published last, so a reader that sees the new position also sees the samples
+        self.written = position + len(samples)
+        self._wake_waiters()
+
+    def close(self, error: Exception):
+        """No more samples will come: wake every reader, now and later, with `error`."""
+        self.error = error
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        if self._waiters:
+            waiters, self._waiters = self._waiters, []
+            for loop, future in waiters:
+                try:
+                    loop.call_soon_threadsafe(_wake, future)
+                except RuntimeError:  # The reader's loop has already closed
+                    pass
+
+    def time_at(self, position: int) -> int:
+        """Output-timeline frame at which the sample at `position` was captured."""
+        return int(self._times[(position // self.block) % len(self._times)]) + position % self.block
+
+    def views(self, start: int, stop: int) -> tuple:
+        """The samples from `start` to `stop` as one or two views, split where the ring wraps."""
+        if start < self.oldest or stop > self.written or start > stop:
+            raise IndexError(f"Samples {start}-{stop} are not in the ring ({self.oldest}-{self.written})")
+        first, last = start % self.capacity, stop % self.capacity
+        if stop - start == self.capacity or (last < first and stop > start):
+            return self._buffer[first:], self._buffer[:last]
+        return (self._buffer[first:first + stop - start],)
+
+    async def wait_for(self, position: int) -> int:
+        """
+        Wait until `position` samples have been captured and return how many there are.
+
+        Raises the ring's error if it is closed before then.
+        """
+        while self.written < position:
+            if self.error is not None:
+                raise self.error
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+            # Checked again after registering: a block written or a close in between would not have woken us
+            if self.written >= position or self.error is not None:
+                continue
+            await future
+        return self.written
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,143 @@
+"""
+Session container: a small index file beside an append-only PCM file.
+
+Index file layout (little-endian):
+
+    magic      8 bytes  b"LOOPSES2"
+    header     struct HEADER: rate, loop count, metadata length, index offset
+    index      loop_count records of INDEX_DTYPE, 64-byte aligned
+    metadata   UTF-8 JSON: transport time, loop names, name of the data file
+
+The data file (`<stem>.<generation>.pcm` beside the index) holds the int16
+PCM of every loop, each loop starting on a 64-byte boundary. Index offsets
+and lengths are in samples from the start of the data file.
+
+A loaded session stays mapped from its data file, so saving never replaces
+that file: loops already in it are left where they are and only new loops
+are appended. The index file is never mapped and is replaced atomically, so
+a session is switched to its new contents in one step.
+"""
+import contextlib
+import json
+import os
+import pathlib
+import re
+import struct
+from typing import List, NamedTuple
+import numpy as np
+from loop_registry import LoopRegistry
+
+MAGIC = b"LOOPSES2"
+HEADER = struct.Struct("<IIIQ")
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("length", "<i8"), ("anchor", "<i8"), ("gain", "<f4"), ("playing", "u1"),
+                        ("reserved", "V3")])
+INDEX_ALIGNMENT = 64
+LOOP_ALIGNMENT_SAMPLES = 32
+SESSION_FILENAME = "session.loops"
+
+
+class Session(NamedTuple):
+    rate: int
+    sample_time: int
+    names: List[str]
+    loops: LoopRegistry
+
+
+def _align(value: int, alignment: int) -> int:
+    return -(-value // alignment) * alignment
+
+
+def _data_files(path: pathlib.Path) -> dict:
+    """Generation -> data file, for every data file of the session at `path`."""
+    pattern = re.compile(rf"{re.escape(path.stem)}\.(\d+)\.pcm$")
+    return {int(match.group(1)): path.parent / match.group(0)
+            for match in map(pattern.match, os.listdir(path.parent)) if match}
+
+
+def _mapped_from(loops: LoopRegistry, data_files: dict) -> pathlib.Path | None:
+    """The data file `loops` was loaded from, if it is one of `data_files`."""
+    base = loops.base
+    if not isinstance(base, np.memmap) or not loops.in_base.any():
+        return None
+    source = pathlib.Path(base.filename).resolve()
+    return next((data_path for data_path in data_files.values() if data_path.resolve() == source), None)
+
+
+def save_session(path: pathlib.Path, loops: LoopRegistry, rate: int, sample_time: int, names: List[str]):
+    """
+    Write every loop in `loops` with its play state to the session at `path`.
+
+    If `loops` was loaded from this session, its loops are already in the data
+    file and only the others are appended. Otherwise the PCM goes to a new
+    data file and the old ones are removed once the index points away from
+    them; one that cannot be removed yet (mapped on Windows) goes next time.
+    """
+    path = pathlib.Path(path)
+    count = len(loops)
+    index = np.zeros(count, dtype=INDEX_DTYPE)
+    index["length"] = loops.lengths
+    index["anchor"] = loops.anchors
+    index["gain"] = loops.gains
+    index["playing"] = loops.playing
+
+    data_files = _data_files(path)
+    data_path = _mapped_from(loops, data_files)
+    if data_path is not None:
+        in_file = loops.in_base.copy()
+        index["offset"][in_file] = loops.offsets[in_file]
+        mode = "r+b"
+    else:
+        in_file = np.zeros(count, dtype=bool)
+        data_path = path.parent / f"{path.stem}.{max(data_files, default=-1) + 1}.pcm"
+        mode = "wb"
+    with open(data_path, mode) as f:
+        end = f.seek(0, os.SEEK_END)
+        for loop in np.flatnonzero(~in_file):
+            offset = _align(end // 2, LOOP_ALIGNMENT_SAMPLES)
+            f.seek(offset * 2)
+            f.write(loops.audio(loop).tobytes())
+            index["offset"][loop] = offset
+            end = (offset + int(loops.lengths[loop])) * 2
+
+    metadata = json.dumps({"sample_time": int(sample_time), "names": list(names), "data": data_path.name}).encode()
+    index_offset = _align(len(MAGIC) + HEADER.size, INDEX_ALIGNMENT)
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC + HEADER.pack(rate, count, len(metadata), index_offset))
+        f.seek(index_offset)
+        f.write(index.tobytes())
+        f.write(metadata)
+    os.replace(temp_path, path)
+
+    for stale in data_files.values():
+        if stale != data_path:
+            with contextlib.suppress(OSError):
+                stale.unlink()
+
+
+def load_session(path: pathlib.Path) -> Session:
+    """
+    Read a session's index and wrap it and the mapped PCM in a LoopRegistry.
+
+    The data file is mapped once and every loop is a view into that mapping,
+    so no PCM is read or copied until samples are played, however many loops
+    the session holds.
+    """
+    path = pathlib.Path(path)
+    contents = path.read_bytes()
+    if contents[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a session file")
+    rate, count, metadata_length, index_offset = HEADER.unpack_from(contents, len(MAGIC))
+
+    index = np.frombuffer(contents, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+    metadata_start = index_offset + index.nbytes
+    metadata = json.loads(contents[metadata_start:metadata_start + metadata_length])
+    data_path = path.parent / metadata["data"]
+    if os.path.getsize(data_path):
+        arena = np.memmap(data_path, dtype="<i2", mode="r")
+    else:
+        arena = np.zeros(0, dtype=np.int16)  # An empty file cannot be mapped
+
+    loops = LoopRegistry.wrap(arena, index["offset"], index["length"], index["anchor"], index["gain"],
+                              index["playing"])
+    return Session(rate, metadata["sample_time"], metadata["names"], loops)
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from loop_registry import LoopRegistry
+from mixer import LoopMixer
+from session_file import load_session, save_session
+
+
+def test_session_round_trips_loops_and_play_state(tmp_path):
+    rng = np.random.default_rng(0)
+    loops = LoopRegistry()
+    for index in range(5):
+        loops.add(rng.integers(-1000, 1000, 1000 + 37 * index, dtype=np.int16), anchor=index * 100, gain=0.5 + index / 10)
+    loops.playing[[1, 3]] = True
+
+    path = tmp_path / "session.loops"
+    save_session(path, loops, 44100, 98765, [f"output_{index}.wav" for index in range(5)])
+    session = load_session(path)
+
+    assert (session.rate, session.sample_time) == (44100, 98765)
+    assert session.names[4] == "output_4.wav"
+    restored = session.loops
+    for index in range(5):
+        np.testing.assert_array_equal(restored.audio(index), loops.audio(index))
+        # Loop data is a view of the mapped file, not a copy
+        assert not restored.audio(index).flags.owndata and not restored.audio(index).flags.writeable
+    np.testing.assert_array_equal(restored.playing, loops.playing)
+    np.testing.assert_array_equal(restored.anchors, loops.anchors)
+    np.testing.assert_allclose(restored.gains, loops.gains)
+
+
+def test_loaded_session_mixes_and_accepts_new_loops(tmp_path):
+    loops = LoopRegistry()
+    loops.add(np.arange(1, 9, dtype=np.int16), anchor=0)
+    loops.playing[0] = True
+    path = tmp_path / "session.loops"
+    save_session(path, loops, 44100, 3, ["output_0.wav"])
+
+    session = load_session(path)
+    mixer = LoopMixer()
+    mixer.transport.reset(session.sample_time)
+    mixer.adopt(session.loops)
+    np.testing.assert_array_equal(mixer.mix(4), [4, 5, 6, 7])
+
+    mixer.set_playing(mixer.add_loop(np.full(4, 10, dtype=np.int16), anchor=0), True)
+    np.testing.assert_array_equal(mixer.mix(4), [18, 11, 12, 13])
+    # The new loop went into its own arena; the session is still mixed from the file
+    assert len(mixer.loops.arena) == 4
+    assert not mixer.loops.audio(0).flags.writeable
+
+
+def test_new_loops_never_copy_the_loaded_session(tmp_path):
+    rng = np.random.default_rng(1)
+    loops = LoopRegistry()
+    for index in range(8):
+        loops.add(rng.integers(-1000, 1000, 50000, dtype=np.int16), anchor=index)
+    loops.playing[::2] = True
+    path = tmp_path / "session.loops"
+    save_session(path, loops, 44100, 0, [f"output_{index}.wav" for index in range(8)])
+
+    restored = LoopMixer()
+    restored.adopt(load_session(path).loops)
+    reference = LoopMixer()
+    reference.adopt(loops)
+    take = rng.integers(-1000, 1000, 1000, dtype=np.int16)
+    for mixer in (restored, reference):
+        mixer.set_playing(mixer.add_loop(take, anchor=0), True)
+        mixer.set_playing(1, True)
+
+    assert len(restored.loops.arena) == len(take)
+    assert len(restored.loops._storage) < 2 * len(take)
+    for _ in range(5):
+        np.testing.assert_array_equal(restored.mix(4096), reference.mix(4096))
+
+
+def test_saving_a_loaded_session_appends_only_new_loops(tmp_path):
+    rng = np.random.default_rng(2)
+    loops = LoopRegistry()
+    for index in range(3):
+        loops.add(rng.integers(-1000, 1000, 1000 + index, dtype=np.int16), anchor=index)
+    path = tmp_path / "session.loops"
+    save_session(path, loops, 44100, 0, ["a", "b", "c"])
+    [data_path] = tmp_path.glob("*.pcm")
+    saved = data_path.read_bytes()
+
+    session = load_session(path)
+    take = rng.integers(-1000, 1000, 500, dtype=np.int16)
+    session.loops.add(take, anchor=7)
+    session.loops.playing[1] = True
+    # Saved over the file the session is still mapped from
+    save_session(path, session.loops, 44100, 10, ["a", "b", "c", "d"])
+
+    assert list(tmp_path.glob("*.pcm")) == [data_path]
+    grown = data_path.read_bytes()
+    assert grown[:len(saved)] == saved
+    assert len(grown) - len(saved) < 2 * len(take) + 64
+    reloaded = load_session(path)
+    for index in range(3):
+        np.testing.assert_array_equal(session.loops.audio(index), loops.audio(index))
+        np.testing.assert_array_equal(reloaded.loops.audio(index), loops.audio(index))
+    np.testing.assert_array_equal(reloaded.loops.audio(3), take)
+    np.testing.assert_array_equal(reloaded.loops.playing, [False, True, False, False])
+    assert reloaded.names == ["a", "b", "c", "d"]
+
+
+def test_saving_other_loops_starts_a_new_data_file(tmp_path):
+    path = tmp_path / "session.loops"
+    for fill in (1, 2):
+        loops = LoopRegistry()
+        loops.add(np.full(100, fill, dtype=np.int16), anchor=0)
+        save_session(path, loops, 44100, 0, ["a"])
+
+    assert [data_path.name for data_path in tmp_path.glob("*.pcm")] == ["session.1.pcm"]
+    np.testing.assert_array_equal(load_session(path).loops.audio(0), np.full(100, 2))
+
+
+if __name__ == "__main__":
+    pytest.main()
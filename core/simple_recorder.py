@@ -3,7 +3,7 @@ import pyaudio
 import wave
 import tkinter as tk
 import threading
-import numpy as np
+from take_writer import TakeWriter
 
 # Audio settings
 
@@ -35,31 +35,32 @@ os.makedirs(output_dir, exist_ok=True)
 
 
 def record_audio():
-    global recorded_frames, recording_count
+    global recording_count
     stream = p.open(
         format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK
     )
 
     print("* recording")
 
-    recorded_frames = []
+    # Stream chunks straight to a uniquely named file; initial silence is
+    # dropped as the chunks arrive instead of after the take is in memory
+
+    output_filename = os.path.join(output_dir, f"output_{recording_count + 1}.wav")
+    writer = TakeWriter(
+        output_filename,
+        CHANNELS,
+        p.get_sample_size(FORMAT),
+        RATE,
+        silence_threshold=SILENCE_THRESHOLD,
+    )
 
     while is_recording.is_set():
-        data = stream.read(CHUNK)
-        recorded_frames.append(data)
+        writer.write(stream.read(CHUNK))
     print("* done recording")
 
     stream.stop_stream()
     stream.close()
-
-    # Process recorded frames to remove initial silence
-
-    trimmed_frames = trim_initial_silence(recorded_frames)
-
-    # Save the trimmed recording to a uniquely named file
-
-    output_filename = os.path.join(output_dir, f"output_{recording_count + 1}.wav")
-    save_recording_to_wav(output_filename, trimmed_frames)
+    writer.close()
 
     # Increment the recording count after saving the file
 
@@ -71,27 +72,6 @@ def record_audio():
     start_playback(recording_count - 1)
 
 
-def trim_initial_silence(frames):
-    # Convert frames to a single numpy array
-
-    audio_data = np.frombuffer(b"".join(frames), dtype=np.int16)
-    # Find the index where the sound starts
-
-    start_index = 0
-    for i in range(0, len(audio_data), CHUNK):
-        chunk = audio_data[i : i + CHUNK]
-        if np.max(np.abs(chunk)) > SILENCE_THRESHOLD:
-            start_index = i
-            break
-    # Return trimmed frames
-
-    trimmed_audio_data = audio_data[start_index:]
-    return [
-        trimmed_audio_data[i : i + CHUNK].tobytes()
-        for i in range(0, len(trimmed_audio_data), CHUNK)
-    ]
-
-
 def play_audio_loop(loop_index):
     try:
         output_filename = os.path.join(output_dir, f"output_{loop_index + 1}.wav")
@@ -130,9 +110,7 @@ def toggle_recording(event=None):
 
 
 def start_recording():
-    global recorded_frames
     print("Starting recording...")
-    recorded_frames = []
     is_recording.set()
     record_btn.config(text="Stop Recording")
     threading.Thread(target=record_audio).start()
@@ -191,18 +169,6 @@ def stop_playback(loop_index):
         loops[loop_index]["thread"].join()
 
 
-# Save recording to WAV file
-
-
-def save_recording_to_wav(file_path, frames):
-    wf = wave.open(file_path, "wb")
-    wf.setnchannels(CHANNELS)
-    wf.setsampwidth(p.get_sample_size(FORMAT))
-    wf.setframerate(RATE)
-    wf.writeframes(b"".join(frames))
-    wf.close()
-
-
 def on_closing():
     stop_all_playback.set()
     for loop in loops:
@@ -0,0 +1,73 @@
+import pathlib
+import wave
+import numpy as np
+from audio_processor import AudioProcessor, OnsetDetector
+
+
+class TakeWriter:
+    """
+    Streams a take to a WAV file chunk by chunk as it is recorded.
+
+    Memory stays at about two chunks however long the take runs. Leading silence
+    is dropped before it is ever written. The last chunk is held back until the
+    next one arrives, so `close` can cut the end back to a zero crossing before
+    it reaches the file. This does the same trim as
+    AudioProcessor.trim_initial_silence without keeping the whole take in memory.
+
+    `start_frame` is where the file's first frame was in the input stream,
+    which is what is needed to line the take up with the transport.
+    """
+
+    def __init__(self, filename: pathlib.Path, channels: int = 1, sample_width: int = 2, rate: int = 44100,
+                 silence_threshold: int = AudioProcessor.SILENCE_THRESHOLD):
+        self.filename = filename
+        self.frames_written = 0
+        self.start_frame: int | None = None
+        self._onset_detector = OnsetDetector(silence_threshold)
+        self._held = np.zeros(0, dtype=np.int16)
+        self._wave = wave.open(str(filename), "wb")
+        self._wave.setnchannels(channels)
+        self._wave.setsampwidth(sample_width)
+        self._wave.setframerate(rate)
+
+    def write(self, chunk: bytes | np.ndarray):
+        """Append samples, as bytes or an int16 array. An array is only referenced until the next write."""
+        samples = chunk if isinstance(chunk, np.ndarray) else np.frombuffer(chunk, dtype=np.int16)
+        if self._onset_detector.onset is None:
+            samples = self._trim_leading_silence(samples)
+            if samples is None:
+                return
+        self._write_samples(self._held)
+        self._held = samples
+
+    def _trim_leading_silence(self, samples: np.ndarray) -> np.ndarray | None:
+        onset = self._onset_detector.process(samples)
+        if onset is None:
+            # Still silent: keep this chunk only so the zero-crossing search can look back into it
+            self._held = samples
+            return None
+
+        window = np.concatenate((self._held, samples))
+        start_index = AudioProcessor.find_nearest_zero_crossing(window, len(self._held) + onset)
+        self.start_frame = self._onset_detector.samples_seen - len(window) + start_index
+        self._held = np.zeros(0, dtype=np.int16)
+        return window[start_index:]
+
+    def _write_samples(self, samples: np.ndarray):
+        if len(samples):
+            self._wave.writeframes(samples)
+            self.frames_written += len(samples)
+
+    def close(self) -> pathlib.Path:
+        if self._onset_detector.onset is not None and len(self._held):
+            end_index = AudioProcessor.find_nearest_zero_crossing(self._held, len(self._held) - 1)
+            self._write_samples(self._held[:end_index + 1])
+        self._held = np.zeros(0, dtype=np.int16)
+        self._wave.close()
+        return self.filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
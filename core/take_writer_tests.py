@@ -0,0 +1,52 @@
+import wave
+import numpy as np
+import pytest
+from audio_processor import AudioProcessor
+from take_writer import TakeWriter
+
+CHUNK = 1024
+
+
+def _make_take(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    silence = rng.integers(-200, 200, 5 * CHUNK + 300, dtype=np.int16)
+    t = np.arange(20 * CHUNK + 17)
+    tone = (8000 * np.sin(2 * np.pi * 220 * t / 44100)).astype(np.int16)
+    return np.concatenate((silence, tone))
+
+
+def _write_take(path, audio: np.ndarray):
+    with TakeWriter(path) as writer:
+        for i in range(0, len(audio), CHUNK):
+            writer.write(audio[i:i + CHUNK].tobytes())
+    with wave.open(str(path), "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+def test_streamed_take_matches_in_memory_trim(tmp_path):
+    audio = _make_take()
+    chunks = [audio[i:i + CHUNK].tobytes() for i in range(0, len(audio), CHUNK)]
+
+    written = _write_take(tmp_path / "take.wav", audio)
+
+    np.testing.assert_array_equal(written, AudioProcessor.trim_initial_silence(chunks))
+
+
+def test_start_frame_locates_the_take_in_the_input(tmp_path):
+    audio = _make_take(seed=3)
+    with TakeWriter(tmp_path / "take.wav") as writer:
+        for i in range(0, len(audio), CHUNK):
+            writer.write(audio[i:i + CHUNK].tobytes())
+    with wave.open(str(tmp_path / "take.wav"), "rb") as wf:
+        written = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+    np.testing.assert_array_equal(audio[writer.start_frame:writer.start_frame + len(written)], written)
+
+
+def test_silent_take_writes_empty_file(tmp_path):
+    written = _write_take(tmp_path / "silent.wav", np.zeros(4 * CHUNK, dtype=np.int16))
+    assert len(written) == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
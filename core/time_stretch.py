@@ -0,0 +1,159 @@
+import pathlib
+import wave
+import numpy as np
+from wav_io import memmap_wav
+
+FRAME_SIZE = 2048
+TOLERANCE = 512
+STREAM_BLOCK_SIZE = 16384
+
+
+class StreamingTimeStretcher:
+    """
+    Block-streaming WSOLA time-stretch.
+
+    Input is pushed in blocks of any size and stretched output comes back as
+    soon as enough input has arrived. Each output hop overlap-adds one Hann
+    windowed frame of input. Its nominal position advances by `hop * rate`,
+    and within +/- `tolerance` of that the frame is placed where it best matches
+    the natural continuation of the previous frame, so the waveform stays
+    continuous and the pitch is kept. Only about one frame plus the search
+    range of input is held, so memory does not grow with the length of the
+    stream. `rate` may be changed between blocks while audio is playing.
+
+    `rate` follows librosa.effects.time_stretch: 2.0 plays twice as fast (half
+    as long), 0.5 half as fast. Samples are float32 in the caller's scale,
+    shaped (frames,) or (frames, channels).
+    """
+
+    def __init__(self, rate: float = 1.0, channels: int = 1, frame_size: int = FRAME_SIZE, tolerance: int = TOLERANCE):
+        if frame_size % 2:
+            raise ValueError("frame_size must be even")
+        self.channels = channels
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.tolerance = tolerance
+        n = np.arange(frame_size)
+        # Periodic Hann windows at 50% overlap sum to exactly one
+        self._window = (0.5 - 0.5 * np.cos(2 * np.pi * n / frame_size)).astype(np.float32)[:, None]
+        self._fft_size = 1 << (2 * tolerance + 2 * self.hop).bit_length()
+        self.set_rate(rate)
+        self.reset()
+
+    def set_rate(self, rate: float):
+        if rate <= 0:
+            raise ValueError(f"Stretch rate must be positive, got {rate}")
+        self.rate = float(rate)
+
+    def reset(self):
+        """Forget all buffered input and output, ready for a new stream."""
+        # Input positions are absolute sample indexes; the first frame starts one hop
+        # before the input so sample 0 is reached at full window gain
+        lead = self.tolerance + self.hop
+        self._input = np.zeros((lead, self.channels), dtype=np.float32)
+        self._input_start = -lead
+        self._input_end = 0
+        self._analysis = float(-self.hop)
+        self._previous = None
+        self._tail = np.zeros((self.hop, self.channels), dtype=np.float32)
+        self._discard = self.hop
+        # Whether the stream's first block was one-dimensional; flush returns the same shape
+        self._mono = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Push a block of input and return whatever output it completes."""
+        samples = np.asarray(samples, dtype=np.float32)
+        mono = samples.ndim == 1
+        if self._mono is None:
+            self._mono = mono
+        self._append(samples.reshape(len(samples), self.channels))
+        return self._emit(self._input_start + len(self._input), mono)
+
+    def flush(self) -> np.ndarray:
+        """Stretch the rest of the input, return the final output and reset for the next stream."""
+        end = self._input_end
+        padding = self.frame_size + 2 * self.tolerance + int(np.ceil(self.hop * max(self.rate, 1.0)))
+        self._append(np.zeros((padding, self.channels), dtype=np.float32), counts=False)
+        mono = self.channels == 1 if self._mono is None else self._mono
+        output = self._emit(None, mono, stop_at=end)
+        output = np.concatenate((output, self._tail[:, 0] if mono else self._tail))
+        self.reset()
+        return output
+
+    def _append(self, samples: np.ndarray, counts: bool = True):
+        keep_from = self._oldest_needed() - self._input_start
+        self._input = np.concatenate((self._input[keep_from:], samples))
+        self._input_start += keep_from
+        if counts:
+            self._input_end += len(samples)
+
+    def _oldest_needed(self) -> int:
+        oldest = int(round(self._analysis)) - self.tolerance
+        if self._previous is not None:
+            oldest = min(oldest, self._previous + self.hop)
+        return oldest
+
+    def _emit(self, available: int | None, mono: bool, stop_at: int | None = None) -> np.ndarray:
+        blocks = []
+        while True:
+            nominal = int(round(self._analysis))
+            if stop_at is not None and nominal >= stop_at:
+                break
+            if available is not None and nominal + self.tolerance + self.frame_size > available:
+                break
+            blocks.append(self._next_hop(nominal))
+        if not blocks:
+            return np.zeros((0,) if mono else (0, self.channels), dtype=np.float32)
+        output = np.concatenate(blocks)
+        return output[:, 0] if mono else output
+
+    def _next_hop(self, nominal: int) -> np.ndarray:
+        start = nominal if self._previous is None else self._best_start(nominal)
+        offset = start - self._input_start
+        frame = self._input[offset:offset + self.frame_size] * self._window
+
+        output = self._tail + frame[:self.hop]
+        self._tail = frame[self.hop:]
+        self._previous = start
+        self._analysis += self.hop * self.rate
+
+        if self._discard:
+            output = output[self._discard:]
+            self._discard = 0
+        return output
+
+    def _best_start(self, nominal: int) -> int:
+        """Frame start within the tolerance of `nominal` whose first half best continues the previous frame."""
+        hop, tolerance = self.hop, self.tolerance
+        natural = self._previous + hop - self._input_start
+        low = nominal - tolerance - self._input_start
+        template = self._input[natural:natural + hop].sum(axis=1)
+        region = self._input[low:low + 2 * tolerance + hop].sum(axis=1)
+
+        n = self._fft_size
+        correlation = np.fft.irfft(np.fft.rfft(region, n) * np.conj(np.fft.rfft(template, n)), n)[:2 * tolerance + 1]
+        energy = np.cumsum(np.concatenate(([0.0], region.astype(np.float64) ** 2)))
+        window_energy = energy[hop:hop + 2 * tolerance + 1] - energy[:2 * tolerance + 1]
+        score = correlation / np.sqrt(window_energy + 1e-9)
+        return nominal - tolerance + int(np.argmax(score))
+
+
+def stretch_file(input_path: pathlib.Path, output_path: pathlib.Path, rate: float,
+                 block_size: int = STREAM_BLOCK_SIZE) -> pathlib.Path:
+    """Time-stretch a 16-bit WAV at its own sample rate, one block at a time."""
+    audio_data, info = memmap_wav(input_path)
+    if info.sample_width != 2:
+        raise ValueError(f"{input_path} is not 16-bit PCM")
+    stretcher = StreamingTimeStretcher(rate, channels=info.channels)
+
+    def write(wf, stretched):
+        wf.writeframes(np.clip(np.rint(stretched), -32768, 32767).astype(np.int16).tobytes())
+
+    with wave.open(str(output_path), "wb") as wf:
+        wf.setnchannels(info.channels)
+        wf.setsampwidth(2)
+        wf.setframerate(info.rate)
+        for start in range(0, len(audio_data), block_size):
+            write(wf, stretcher.process(audio_data[start:start + block_size]))
+        write(wf, stretcher.flush())
+    return output_path
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from time_stretch import StreamingTimeStretcher
+
+RATE = 44100
+
+
+def _sine(seconds: float, frequency: float = 440.0) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (10000 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def _stretch(stretcher: StreamingTimeStretcher, audio: np.ndarray, block: int = 1000) -> np.ndarray:
+    blocks = [stretcher.process(audio[i:i + block]) for i in range(0, len(audio), block)]
+    return np.concatenate(blocks + [stretcher.flush()])
+
+
+def _frequency(audio: np.ndarray) -> float:
+    middle = audio[len(audio) // 4:3 * len(audio) // 4]
+    return np.count_nonzero(np.diff(np.signbit(middle))) / 2 / (len(middle) / RATE)
+
+
+@pytest.mark.parametrize("rate", [0.5, 1.5, 2.0])
+def test_stretch_changes_length_but_not_pitch(rate):
+    audio = _sine(2.0)
+    stretched = _stretch(StreamingTimeStretcher(rate), audio)
+
+    assert abs(len(stretched) - len(audio) / rate) < 2 * 2048
+    assert _frequency(stretched) == pytest.approx(440, abs=2)
+    assert np.abs(stretched).max() < 10001
+
+
+def test_unit_rate_passes_audio_through_and_rate_can_change_mid_stream():
+    audio = _sine(1.0)
+    stretcher = StreamingTimeStretcher(1.0)
+    first = stretcher.process(audio[:20000])
+    np.testing.assert_allclose(first, audio[:len(first)], atol=0.01)
+
+    stretcher.set_rate(2.0)
+    rest = np.concatenate((stretcher.process(audio[20000:]), stretcher.flush()))
+    assert abs(len(first) + len(rest) - (len(first) + (len(audio) - len(first)) / 2)) < 2 * 2048
+    assert _frequency(rest) == pytest.approx(440, abs=2)
+
+
+def test_flush_keeps_the_shape_of_the_input():
+    audio = _sine(0.5)
+    column = _stretch(StreamingTimeStretcher(1.5), audio[:, None])
+    assert column.shape[1] == 1
+    np.testing.assert_array_equal(column[:, 0], _stretch(StreamingTimeStretcher(1.5), audio))
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import queue
+import threading
+import tkinter as tk
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine
+
+logger = logging.getLogger(__name__)
+
+
+class TkAsyncBridge:
+    """
+    Runs an asyncio event loop on its own thread beside Tk's mainloop.
+
+    Neither side polls. Tk stays on the main thread in its own mainloop and
+    sleeps until there is an X event, a timer or a wake-up byte. Coroutines are
+    handed to the asyncio thread with run_coroutine_threadsafe. Widget calls
+    from the asyncio thread go through a queue that Tk drains when a byte
+    arrives on a pipe it watches with createfilehandler. Where Tk cannot watch
+    files (Windows), a virtual event raised from the asyncio thread wakes it
+    instead, which needs a threaded Tcl. A slow redraw no longer delays the
+    coroutines that feed audio, and vice versa.
+    """
+
+    WAKE_EVENT = "<<AsyncioCall>>"
+
+    def __init__(self, root: tk.Misc):
+        self.root = root
+        self.loop = asyncio.new_event_loop()
+        self._calls: "queue.SimpleQueue[tuple]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run_loop, name="asyncio", daemon=True)
+        self._wake_read = self._wake_write = None
+        if hasattr(root.tk, "createfilehandler"):
+            self._wake_read, self._wake_write = os.pipe()
+            os.set_blocking(self._wake_read, False)
+            os.set_blocking(self._wake_write, False)
+            root.tk.createfilehandler(self._wake_read, tk.READABLE, self._on_wake)
+        else:
+            root.bind(self.WAKE_EVENT, lambda event: self._drain())
+
+    @property
+    def wakeup_fd(self) -> int | None:
+        """A non-blocking fd that wakes Tk when written; suitable for signal.set_wakeup_fd."""
+        return self._wake_write
+
+    def start(self):
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        if self._wake_read is not None:
+            self.root.tk.deletefilehandler(self._wake_read)
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._wake_read = self._wake_write = None
+
+    # asyncio side -> Tk
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Run `func` on the Tk thread soon, without waiting for it."""
+        self._calls.put((func, args, kwargs, None))
+        self._wake()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run `func` on the Tk thread and return its result."""
+        future: Future = Future()
+        self._calls.put((func, args, kwargs, future))
+        self._wake()
+        return await asyncio.wrap_future(future)
+
+    def _wake(self):
+        if self._wake_write is not None:
+            try:
+                os.write(self._wake_write, b"\0")
+            except BlockingIOError:
+                pass  # The pipe is full, so Tk is already due to wake up
+        else:
+            self.root.event_generate(self.WAKE_EVENT, when="tail")
+
+    def _on_wake(self, fd: int, mask: int):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                func, args, kwargs, future = self._calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if future is None:
+                    logger.error(f"Error in UI call {func}: {e}")
+                else:
+                    future.set_exception(e)
+            else:
+                if future is not None:
+                    future.set_result(result)
+
+    # Tk side -> asyncio
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule `coro` on the asyncio thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import tkinter
+import pytest
+from tk_bridge import TkAsyncBridge
+
+
+def run_bridge(engine, stats=None):
+    """
+    Run `engine(bridge)` on the bridge's asyncio thread while this thread runs Tk's event loop.
+
+    `stats["tk_events"]` counts the events Tk has handled so far.
+    """
+    stats = {} if stats is None else stats
+    stats["tk_events"] = 0
+    root = tkinter.Tcl()  # No display needed; file handlers and timers work the same
+    bridge = TkAsyncBridge(root)
+    bridge.start()
+    result = {}
+    done = []
+
+    async def run():
+        try:
+            result["value"] = await engine(bridge)
+        finally:
+            bridge.call(done.append, True)
+
+    bridge.submit(run())
+    root.after(5000, done.append, True)  # Don't hang the suite if the bridge is broken
+    # mainloop() returns at once without a window, so block in the event loop by hand
+    while not done:
+        root.tk.dooneevent()
+        stats["tk_events"] += 1
+    bridge.stop()
+    return result["value"]
+
+
+def test_calls_run_on_the_tk_thread_and_return_results():
+    tk_thread = threading.get_ident()
+
+    async def engine(bridge):
+        calls = []
+        bridge.call(lambda: calls.append(threading.get_ident()))
+        value = await bridge.run(lambda a, b: a + b, 2, b=3)
+        with pytest.raises(ZeroDivisionError):
+            await bridge.run(lambda: 1 / 0)
+        return calls, value, threading.get_ident()
+
+    calls, value, engine_thread = run_bridge(engine)
+    assert calls == [tk_thread]
+    assert value == 5
+    assert engine_thread != tk_thread
+
+
+def test_idle_tk_sleeps_and_each_call_wakes_it_once():
+    stats = {}
+
+    async def engine(bridge):
+        drains = []
+        drain = bridge._drain
+        bridge._drain = lambda: (drains.append(True), drain())
+        for _ in range(20):
+            await bridge.run(lambda: None)
+        handed_off = len(drains)
+
+        before = await bridge.run(lambda: stats["tk_events"])
+        await asyncio.sleep(0.2)  # Idle: a 10 ms poll would run about 20 times here
+        after = await bridge.run(lambda: stats["tk_events"])
+        return handed_off, after - before
+
+    handed_off, events = run_bridge(engine, stats)
+    assert handed_off == 20
+    # Only the wake-up that delivered the first count finished in between
+    assert events == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
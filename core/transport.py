@@ -0,0 +1,30 @@
+class Transport:
+    """
+    The session's sample clock.
+
+    Counts every sample frame handed to the output since the session started,
+    silent blocks included. Loops do not keep their own play heads. Each one has
+    an anchor on this timeline, and its position is derived from the clock as
+    (sample_time - anchor) mod length. A loop that is stopped and started again
+    therefore comes back in phase with the rest, whatever happened in between.
+    """
+
+    def __init__(self, rate: int = 44100):
+        self.rate = rate
+        self.sample_time = 0
+
+    def advance(self, frames: int) -> int:
+        """Move the clock past one block and return the time at which that block started."""
+        start = self.sample_time
+        self.sample_time = start + frames
+        return start
+
+    def seconds(self) -> float:
+        return self.sample_time / self.rate
+
+    def position_of(self, anchor: int, length: int) -> int:
+        """Where a loop of `length` frames anchored at `anchor` plays at the current time."""
+        return (self.sample_time - anchor) % length if length else 0
+
+    def reset(self, sample_time: int = 0):
+        self.sample_time = sample_time
@@ -0,0 +1,100 @@
+import pathlib
+import struct
+from typing import NamedTuple, Tuple
+import numpy as np
+
+SAMPLE_DTYPES = {1: np.dtype("u1"), 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+FLOAT_DTYPES = {4: np.dtype("<f4"), 8: np.dtype("<f8")}
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo(NamedTuple):
+    channels: int
+    sample_width: int
+    rate: int
+    data_offset: int
+    frames: int
+    is_float: bool = False
+
+
+def read_wav_info(filename: pathlib.Path) -> WavInfo:
+    """Walk the RIFF chunks of a PCM WAV file and locate its data section."""
+    with open(filename, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{filename} is not a WAV file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{filename} has no data chunk")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt_chunk = f.read(chunk_size)
+                fmt = struct.unpack_from("<HHIIHH", fmt_chunk)
+                f.seek(chunk_size & 1, 1)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"{filename} has a data chunk before its fmt chunk")
+                format_tag, channels, rate, _, block_align, bits = fmt
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt_chunk) >= 26:
+                    # The real format is the first two bytes of the SubFormat GUID
+                    format_tag = struct.unpack_from("<H", fmt_chunk, 24)[0]
+                if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                    raise ValueError(f"{filename} is compressed (format 0x{format_tag:04x}), not PCM")
+                sample_width = (bits + 7) // 8
+                return WavInfo(channels, sample_width, rate, f.tell(), chunk_size // block_align,
+                               format_tag == WAVE_FORMAT_IEEE_FLOAT)
+            else:
+                # Chunks are padded to an even length
+                f.seek(chunk_size + (chunk_size & 1), 1)
+
+
+def memmap_wav(filename: pathlib.Path) -> Tuple[np.ndarray, WavInfo]:
+    """
+    Map a WAV file's PCM data without reading it.
+
+    The returned array is a read-only view over the page cache. Nothing is copied
+    onto the heap until the samples are touched, so opening a file costs only the
+    header walk however long the take is.
+    """
+    info = read_wav_info(filename)
+    dtype = (FLOAT_DTYPES if info.is_float else SAMPLE_DTYPES).get(info.sample_width)
+    if dtype is None:
+        raise ValueError(f"{filename}: {info.sample_width * 8}-bit samples cannot be mapped directly")
+    shape = (info.frames,) if info.channels == 1 else (info.frames, info.channels)
+    if info.frames == 0:
+        return np.zeros(shape, dtype=dtype), info
+    return np.memmap(filename, dtype=dtype, mode="r", offset=info.data_offset, shape=shape), info
+
+
+def read_pcm(filename: pathlib.Path) -> Tuple[np.ndarray, WavInfo]:
+    """
+    Decode any PCM or float WAV to float32 frames x channels in [-1, 1).
+
+    Handles 8-bit unsigned, 16/24/32-bit signed and 32/64-bit float samples.
+    """
+    info = read_wav_info(filename)
+    width = info.sample_width
+    if (info.is_float and width not in FLOAT_DTYPES) or (not info.is_float and width not in (1, 2, 3, 4)):
+        raise ValueError(f"{filename}: {width * 8}-bit {'float' if info.is_float else 'PCM'} is not supported")
+    count = info.frames * info.channels
+    if count == 0:
+        return np.zeros((0, info.channels), dtype=np.float32), info
+    raw = np.memmap(filename, dtype=np.uint8, mode="r", offset=info.data_offset, shape=(count * width,))
+
+    if info.is_float:
+        samples = raw.view(FLOAT_DTYPES[width]).astype(np.float32)
+    elif width == 1:
+        samples = (raw.astype(np.float32) - 128) / 128
+    elif width == 3:
+        # Little-endian 24-bit: place the three bytes at the top of an int32 to sign-extend
+        packed = raw.reshape(-1, 3).astype(np.int32)
+        samples = ((packed[:, 0] << 8) | (packed[:, 1] << 16) | (packed[:, 2] << 24)).astype(np.float32) / 2 ** 31
+    else:
+        samples = raw.view(SAMPLE_DTYPES[width]).astype(np.float32) / 2 ** (8 * width - 1)
+    return samples.reshape(info.frames, info.channels), info
@@ -0,0 +1,162 @@
+"""
+Multi-resolution waveform peaks for drawing takes.
+
+A take's pyramid holds min, max and RMS per block of BLOCK_FRAMES frames, then
+per LEVEL_FACTOR blocks of that, and so on up to a few dozen blocks. Drawing
+at any zoom picks the coarsest level that still has at least one block per
+pixel and reduces only that level's slice, so the cost follows the width in
+pixels rather than the length of the take. The pyramid is computed once after
+recording and kept next to the WAV as `<name>.peaks.npz`.
+"""
+import os
+import pathlib
+from typing import Callable, List, NamedTuple, Optional
+import numpy as np
+from wav_io import memmap_wav
+
+BLOCK_FRAMES = 256
+LEVEL_FACTOR = 4
+MIN_LEVEL_BLOCKS = 32
+
+
+class WaveformColumns(NamedTuple):
+    mins: np.ndarray
+    maxs: np.ndarray
+    rms: np.ndarray
+
+
+class WaveformPeaks:
+    """
+    The peak pyramid of one take.
+
+    Level k has blocks of BLOCK_FRAMES * LEVEL_FACTOR**k frames; the last
+    block of each level may be short.
+    """
+
+    def __init__(self, frames: int, mins: List[np.ndarray], maxs: List[np.ndarray], rms: List[np.ndarray]):
+        self.frames = frames
+        self.mins = mins
+        self.maxs = maxs
+        self.rms = rms
+
+    @classmethod
+    def compute(cls, samples: np.ndarray) -> "WaveformPeaks":
+        """Build the pyramid in one pass over `samples` (int16 mono) and cheap reductions above it."""
+        samples = np.asarray(samples)
+        frames = len(samples)
+        if not frames:
+            empty = np.zeros(0, dtype=np.int16)
+            return cls(0, [empty], [empty], [empty])
+        full = frames // BLOCK_FRAMES * BLOCK_FRAMES
+        blocks = samples[:full].reshape(-1, BLOCK_FRAMES)
+        mins = [blocks.min(axis=1)]
+        maxs = [blocks.max(axis=1)]
+        squares = [np.einsum("ij,ij->i", blocks, blocks, dtype=np.float64)]
+        counts = np.full(len(blocks), BLOCK_FRAMES, dtype=np.int64)
+        if full < frames:
+            tail = samples[full:].astype(np.float64)
+            mins[0] = np.append(mins[0], samples[full:].min())
+            maxs[0] = np.append(maxs[0], samples[full:].max())
+            squares[0] = np.append(squares[0], np.dot(tail, tail))
+            counts = np.append(counts, frames - full)
+
+        rms = [_rms(squares[0], counts)]
+        while len(mins[-1]) > MIN_LEVEL_BLOCKS:
+            padding = -len(mins[-1]) % LEVEL_FACTOR
+            mins.append(np.pad(mins[-1], (0, padding), mode="edge").reshape(-1, LEVEL_FACTOR).min(axis=1))
+            maxs.append(np.pad(maxs[-1], (0, padding), mode="edge").reshape(-1, LEVEL_FACTOR).max(axis=1))
+            squares.append(np.pad(squares[-1], (0, padding)).reshape(-1, LEVEL_FACTOR).sum(axis=1))
+            counts = np.pad(counts, (0, padding)).reshape(-1, LEVEL_FACTOR).sum(axis=1)
+            rms.append(_rms(squares[-1], counts))
+        return cls(frames, mins, maxs, rms)
+
+    @property
+    def levels(self) -> int:
+        return len(self.mins)
+
+    def block_frames(self, level: int) -> int:
+        return BLOCK_FRAMES * LEVEL_FACTOR ** level
+
+    def columns(self, width: int, start: int = 0, stop: Optional[int] = None) -> WaveformColumns:
+        """
+        Min, max and RMS for each of `width` pixel columns spanning frames [start, stop).
+
+        Zoomed in past one block per pixel, neighbouring columns share a block.
+        """
+        stop = self.frames if stop is None else min(stop, self.frames)
+        if width <= 0 or stop <= start:
+            empty = np.zeros(0, dtype=np.int16)
+            return WaveformColumns(empty, empty, empty)
+        frames_per_pixel = (stop - start) / width
+        level = 0
+        while level + 1 < self.levels and self.block_frames(level + 1) <= frames_per_pixel:
+            level += 1
+
+        block = self.block_frames(level)
+        edges = (start + np.arange(width) * frames_per_pixel) // block
+        edges = np.minimum(edges.astype(np.int64), len(self.mins[level]) - 1)
+        last = min(-(-stop // block), len(self.mins[level]))
+        mins = self.mins[level][:last]
+        maxs = self.maxs[level][:last]
+        squares = self.rms[level][:last].astype(np.float64) ** 2
+        # Mean of the blocks' mean squares: exact except for a short last block
+        sizes = np.diff(np.append(edges, last)).clip(min=1)
+        rms = np.sqrt(np.add.reduceat(squares, edges) / sizes)
+        return WaveformColumns(np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges),
+                               rms.round().astype(np.int16))
+
+
+def _rms(squares: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.sqrt(squares / np.maximum(counts, 1)).round().clip(max=32767).astype(np.int16)
+
+
+def peaks_path(wav_path: pathlib.Path) -> pathlib.Path:
+    return pathlib.Path(wav_path).with_suffix(".peaks.npz")
+
+
+def save_peaks(wav_path: pathlib.Path, peaks: WaveformPeaks):
+    """Write the sidecar, stamped with the WAV's size and mtime so a rewritten take is not drawn stale."""
+    stat = os.stat(wav_path)
+    arrays = {"source": np.array([stat.st_size, stat.st_mtime_ns, peaks.frames], dtype=np.int64)}
+    for level in range(peaks.levels):
+        arrays[f"min{level}"] = peaks.mins[level]
+        arrays[f"max{level}"] = peaks.maxs[level]
+        arrays[f"rms{level}"] = peaks.rms[level]
+    path = peaks_path(wav_path)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, path)
+
+
+def load_peaks(wav_path: pathlib.Path) -> Optional[WaveformPeaks]:
+    """The sidecar's pyramid, or None if it is missing, unreadable or older than the WAV."""
+    try:
+        stat = os.stat(wav_path)
+        with np.load(peaks_path(wav_path)) as data:
+            size, mtime_ns, frames = data["source"]
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                return None
+            levels = sum(1 for name in data.files if name.startswith("min"))
+            return WaveformPeaks(int(frames), [data[f"min{level}"] for level in range(levels)],
+                                 [data[f"max{level}"] for level in range(levels)],
+                                 [data[f"rms{level}"] for level in range(levels)])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def ensure_peaks(wav_path: pathlib.Path, samples: Optional[np.ndarray] = None,
+                 loader: Callable[[pathlib.Path], np.ndarray] = lambda path: memmap_wav(path)[0]) -> WaveformPeaks:
+    """
+    Load the take's sidecar, or compute and write it if there is no current one.
+
+    The take is read with `loader` unless its `samples` are already at hand.
+    """
+    peaks = load_peaks(wav_path)
+    if peaks is None:
+        peaks = WaveformPeaks.compute(loader(wav_path) if samples is None else samples)
+        try:
+            save_peaks(wav_path, peaks)
+        except OSError:
+            pass  # Still drawable; it will be recomputed next time
+    return peaks
@@ -0,0 +1,68 @@
+import os
+import wave
+import numpy as np
+import pytest
+from waveform_peaks import BLOCK_FRAMES, WaveformPeaks, ensure_peaks, load_peaks, peaks_path
+
+
+def _take(frames: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    envelope = np.linspace(0.1, 1.0, frames)
+    return (rng.standard_normal(frames) * 6000 * envelope).clip(-32768, 32767).astype(np.int16)
+
+
+def _brute_force(samples: np.ndarray, width: int, start: int, stop: int, block: int):
+    # Each column covers the whole blocks its first and next column's first frame fall in
+    edges = (start + np.arange(width + 1) * (stop - start) / width) // block * block
+    edges[-1] = -(-stop // block) * block
+    columns = [samples[int(a):max(int(b), int(a) + block)] for a, b in zip(edges[:-1], edges[1:])]
+    return (np.array([c.min() for c in columns]), np.array([c.max() for c in columns]),
+            np.array([np.sqrt(np.mean(c.astype(np.float64) ** 2)) for c in columns]))
+
+
+@pytest.mark.parametrize("start, stop", [(0, None), (100_000, 180_000), (3000, 9000)])
+def test_columns_match_a_scan_of_the_samples(start, stop):
+    samples = _take(400_000 + 77)
+    peaks = WaveformPeaks.compute(samples)
+    assert peaks.levels > 3
+    stop = len(samples) if stop is None else stop
+
+    columns = peaks.columns(200, start, stop)
+    level = max(level for level in range(peaks.levels)
+                if level == 0 or peaks.block_frames(level) <= (stop - start) / 200)
+    mins, maxs, rms = _brute_force(samples, 200, start, stop, peaks.block_frames(level))
+    np.testing.assert_array_equal(columns.mins, mins)
+    np.testing.assert_array_equal(columns.maxs, maxs)
+    np.testing.assert_allclose(columns.rms, rms, rtol=0.02, atol=2)
+
+
+def test_short_and_empty_takes():
+    samples = np.array([5, -7, 3], dtype=np.int16)
+    columns = WaveformPeaks.compute(samples).columns(10)
+    assert columns.mins.min() == -7 and columns.maxs.max() == 5
+    assert len(WaveformPeaks.compute(samples[:0]).columns(10).maxs) == 0
+
+
+def test_sidecar_is_reused_until_the_take_changes(tmp_path):
+    wav_path = tmp_path / "output_0.wav"
+    samples = _take(10 * BLOCK_FRAMES + 5)
+    with wave.open(str(wav_path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(samples.tobytes())
+
+    peaks = ensure_peaks(wav_path)
+    assert peaks_path(wav_path).exists()
+    loaded = load_peaks(wav_path)
+    assert loaded.frames == len(samples)
+    for level in range(peaks.levels):
+        np.testing.assert_array_equal(loaded.maxs[level], peaks.maxs[level])
+
+    stat = os.stat(wav_path)
+    os.utime(wav_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_peaks(wav_path) is None
+
+
+if __name__ == "__main__":
+    pytest.main()